@@ -0,0 +1,79 @@
+"""
+Import-time budget check.
+
+Imports the application modules in fresh interpreters, reports the median wall time and fails when it
+exceeds the budget or when one of the heavy stacks that must load lazily shows up at import time.
+
+    python benchmarks/import_time.py [--budget 0.8] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# module imported by a fresh process -> its import-time budget in seconds
+BUDGETS = {
+    "src.config": 0.15,
+    "main": 0.8,
+}
+# stacks that must only be imported on first use
+LAZY_MODULES = ("geopandas", "matplotlib", "seaborn", "scipy.interpolate")
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module: str, repeat: int) -> dict:
+    env = dict(os.environ)
+    # ApiSettings needs these when there is no .env file
+    for name, value in (("PROJECT_NAME", "benchmark"), ("PROJECT_VERSION", "0"), ("PROJECT_HOST", "127.0.0.1"), ("PROJECT_PORT", "8000")):
+        env.setdefault(name, value)
+
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, lazy=LAZY_MODULES)],
+            cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True,
+        )
+        runs.append(json.loads(output.stdout.strip().splitlines()[-1]))
+    return {
+        "median_seconds": statistics.median(run["seconds"] for run in runs),
+        "loaded": sorted({m for run in runs for m in run["loaded"]}),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=None, help="Override the budget of 'main' in seconds")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of fresh interpreters per module")
+    args = parser.parse_args()
+
+    budgets = dict(BUDGETS)
+    if args.budget is not None:
+        budgets["main"] = args.budget
+
+    failed = False
+    for module, budget in budgets.items():
+        result = measure(module, args.repeat)
+        ok = result["median_seconds"] <= budget and not result["loaded"]
+        failed |= not ok
+        print(
+            f"{'OK  ' if ok else 'FAIL'} import {module}: {result['median_seconds']:.3f} s (budget {budget:.3f} s)"
+            + (f", eagerly loaded: {', '.join(result['loaded'])}" if result["loaded"] else "")
+        )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
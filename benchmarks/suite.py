@@ -0,0 +1,339 @@
+"""
+Micro and macro benchmark suite.
+
+Times the physics and likelihood functions across dataset sizes, the MCMC samplers (iterations/s and
+ESS/s) and the MAP search, the three data generators and plot rendering, and writes the results as JSON
+together with the machine and commit metadata so runs can be compared across commits.
+
+    python benchmarks/suite.py [--quick] [--only likelihood] [--output results.json]
+    python benchmarks/suite.py --compare benchmarks/results/<baseline>.json [--threshold 0.1]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = BASE_DIR / "benchmarks" / "results"
+sys.path.insert(0, str(BASE_DIR))
+
+# measurement points per dataset: full run / --quick
+SIZES = (100, 1_000, 10_000, 100_000, 1_000_000)
+QUICK_SIZES = (100, 1_000, 10_000)
+MCMC_SIZES = (101, 1_001, 10_001)
+QUICK_MCMC_SIZES = (101, 1_001)
+MCMC_ITERATIONS = 10_000
+QUICK_MCMC_ITERATIONS = 2_000
+ENSEMBLE_STEPS = 1_000
+QUICK_ENSEMBLE_STEPS = 300
+NUTS_ITERATIONS = 2_000
+QUICK_NUTS_ITERATIONS = 500
+BATCH = 64  # parameter vectors per batched likelihood call
+MIN_SECONDS = 0.2  # time budget per timing repeat of a micro benchmark
+
+
+def measure(func: Callable[[], object], repeat: int = 5, min_seconds: float = MIN_SECONDS) -> dict:
+    """
+    Time ``func`` like ``timeit``: calls per repeat are scaled until a repeat lasts ``min_seconds``.
+    :return: per-call statistics in seconds
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds or number >= 10 ** 6:
+            break
+        number *= 10 if elapsed < min_seconds / 10 else 2
+
+    runs = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        runs.append((time.perf_counter() - start) / number)
+    return {
+        "seconds": statistics.median(runs),
+        "min_seconds": min(runs),
+        "stdev_seconds": statistics.stdev(runs) if len(runs) > 1 else 0.0,
+        "repeat": repeat,
+        "number": number,
+    }
+
+
+def track(points: int, seed: int = 0):
+    """
+    Synthetic measurement track along the road with Poisson counts of the default source.
+    """
+    from src.analytics.distributions import PoissonLikelihood
+    from src.config import SRC_X, SRC_Y, BKG_COUNT_RATE
+    from src.utils import mean_count_rate
+
+    x = np.linspace(-points / 2, points / 2, points)
+    y = np.zeros(points)
+    rate = mean_count_rate(x, y, SRC_X, SRC_Y, 100, BKG_COUNT_RATE)
+    counts = np.random.default_rng(seed).poisson(rate).astype(np.float64)
+    return PoissonLikelihood(x, y, counts)
+
+
+def bench_physics(sizes: tuple[int, ...], **_) -> list[dict]:
+    from src.utils import mean_count_rate, source_count_rate
+
+    results = []
+    for points in sizes:
+        x = np.linspace(-points / 2, points / 2, points)
+        y = np.zeros(points)
+        dist = np.sqrt(x ** 2 + 60 ** 2)
+        for name, func in (
+                ("physics.mean_count_rate", lambda: mean_count_rate(x, y, 0, 60, 100, 10)),
+                ("physics.source_count_rate", lambda: source_count_rate(dist, 100)),
+        ):
+            stats = measure(func)
+            results.append({"name": name, "params": {"points": points}, **stats,
+                            "points_per_second": points / stats["seconds"]})
+    return results
+
+
+def bench_likelihood(sizes: tuple[int, ...], **_) -> list[dict]:
+    from src.analytics.distributions import PoissonLikelihood, calculate_likelihood_log, posterior_log_batch, posterior_log_gradient
+
+    params = np.array([0.0, 60.0, 100.0, 10.0])
+    batch = params + np.random.default_rng(1).normal(0, 1, (BATCH, 4))
+    results = []
+    for points in sizes:
+        likelihood = track(points)
+        full = PoissonLikelihood(likelihood.x, likelihood.y, likelihood.counts, cutoff=0)
+        for name, extra, func in (
+                ("likelihood.log_likelihood", {}, lambda: likelihood.log_likelihood(params)),
+                ("likelihood.log_likelihood", {"cutoff": 0}, lambda: full.log_likelihood(params)),
+                ("likelihood.calculate_likelihood_log", {},
+                 lambda: asyncio.run(calculate_likelihood_log(params, likelihood))),
+                ("likelihood.posterior_log_batch", {"batch": BATCH}, lambda: posterior_log_batch(likelihood, batch)),
+                ("likelihood.posterior_log_gradient", {}, lambda: posterior_log_gradient(likelihood, params)),
+        ):
+            stats = measure(func)
+            results.append({"name": name, "params": {"points": points, **extra}, **stats})
+    return results
+
+
+def bench_mcmc(mcmc_sizes: tuple[int, ...], iterations: int, ensemble_steps: int, nuts_iterations: int, **_) -> list[dict]:
+    from src.analytics.diagnostics import effective_sample_size
+    from src.analytics.laplace import laplace_approximation
+    from src.analytics.samplers import MetropolisSampler, EnsembleSampler, NutsSampler, initial_params
+
+    results = []
+    for points in mcmc_sizes:
+        likelihood = track(points)
+        start_params = initial_params(likelihood)
+
+        sampler = MetropolisSampler(likelihood, init_params=start_params, seed=0)
+        start = time.perf_counter()
+        chain = sampler.run(iterations)
+        elapsed = time.perf_counter() - start
+        ess = effective_sample_size(chain[np.newaxis, iterations // 2:])
+        results.append({
+            "name": "mcmc.metropolis",
+            "params": {"points": points, "iterations": iterations},
+            "seconds": elapsed,
+            "iterations_per_second": iterations / elapsed,
+            "min_ess_per_second": float(ess.min()) / elapsed,
+            "acceptance_rate": sampler.acceptance_rate,
+        })
+
+        ensemble = EnsembleSampler(likelihood, init_params=start_params, seed=0, tune=ensemble_steps // 2)
+        start = time.perf_counter()
+        positions = ensemble.run(ensemble_steps)
+        elapsed = time.perf_counter() - start
+        ess = effective_sample_size(positions[ensemble_steps // 2:].transpose(1, 0, 2))
+        results.append({
+            "name": "mcmc.ensemble",
+            "params": {"points": points, "steps": ensemble_steps, "walkers": ensemble.walkers},
+            "seconds": elapsed,
+            "iterations_per_second": ensemble_steps / elapsed,
+            "min_ess_per_second": float(ess.min()) / elapsed,
+            "acceptance_rate": ensemble.acceptance_rate,
+        })
+
+        nuts = NutsSampler(likelihood, init_params=start_params, seed=0, tune=nuts_iterations // 2)
+        start = time.perf_counter()
+        chain = nuts.run(nuts_iterations)
+        elapsed = time.perf_counter() - start
+        ess = effective_sample_size(chain[np.newaxis, nuts_iterations // 2:])
+        results.append({
+            "name": "mcmc.nuts",
+            "params": {"points": points, "iterations": nuts_iterations},
+            "seconds": elapsed,
+            "iterations_per_second": nuts_iterations / elapsed,
+            "min_ess_per_second": float(ess.min()) / elapsed,
+            "acceptance_rate": nuts.acceptance_rate,
+        })
+
+        start = time.perf_counter()
+        laplace = laplace_approximation(likelihood)
+        results.append({
+            "name": "mcmc.laplace_approximation",
+            "params": {"points": points},
+            "seconds": time.perf_counter() - start,
+            "modes": len(laplace.weights),
+        })
+    return results
+
+
+def bench_generators(sizes: tuple[int, ...], **_) -> list[dict]:
+    from src.data_generators.angular_data_generator import AngularDataGenerator
+    from src.data_generators.regular_data_generator import RegularDataGenerator
+    from src.data_generators.velocity_data_generator import VelocityDataGenerator
+
+    results = []
+    for points in sizes:
+        half = points // 2
+        coordinates = (np.arange(-half, points - half, dtype=np.float64), np.zeros(points))
+        kwargs = {
+            "coordinates": coordinates, "activity": 100, "seed": 0,
+            "speed": 13.9, "time": 1, "road_span": -half, "num_points": points,
+        }
+        for name, generator in (
+                ("generators.regular", RegularDataGenerator),
+                ("generators.velocity", VelocityDataGenerator),
+                ("generators.angular", AngularDataGenerator),
+        ):
+            stats = measure(lambda: asyncio.run(generator(**kwargs).generate_data()), repeat=3)
+            results.append({"name": name, "params": {"points": points}, **stats,
+                            "points_per_second": points / stats["seconds"]})
+    return results
+
+
+def bench_rendering(**_) -> list[dict]:
+    import pandas as pd
+    from src.presentation.renderer import render_figure
+
+    likelihood = track(601)
+    data = pd.DataFrame({"x": likelihood.x, "y": likelihood.y, "pois_data": likelihood.counts})
+    draws = np.random.default_rng(0).normal([0, 60, 100, 10], [5, 5, 10, 1], (9_000, 4))
+    results = []
+    for method, kwargs in (
+            ("plot_poisson", {"speed": None, "time": None}),
+            ("plot_mcmc_sequence", {"burnin_data": draws}),
+            ("plot_activity_density", {"burnin_data": draws, "activity": 100}),
+            ("plot_points", {"points": draws[:, :2]}),
+    ):
+        render_figure(data, method, kwargs)  # the first figure pays for importing the plotting stack
+        stats = measure(lambda: render_figure(data, method, kwargs), repeat=3, min_seconds=0)
+        results.append({"name": f"rendering.{method}", "params": {}, **stats})
+    return results
+
+
+BENCHMARKS = {
+    "physics": bench_physics,
+    "likelihood": bench_likelihood,
+    "mcmc": bench_mcmc,
+    "generators": bench_generators,
+    "rendering": bench_rendering,
+}
+
+
+def _git(*args: str) -> str | None:
+    try:
+        output = subprocess.run(["git", *args], cwd=BASE_DIR, capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip()
+
+
+def machine_metadata() -> dict:
+    import pandas as pd
+    import scipy
+
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "scipy": scipy.__version__,
+    }
+
+
+def _key(result: dict) -> str:
+    return f"{result['name']} {json.dumps(result['params'], sort_keys=True)}"
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> bool:
+    """
+    Print the time ratio of every benchmark present in both runs.
+    :return: True if a benchmark got slower by more than ``threshold``
+    """
+    previous = {_key(result): result for result in baseline["results"]}
+    regressed = False
+    print(f"\nBaseline {baseline['metadata'].get('commit')} ({baseline['metadata'].get('timestamp')})")
+    for result in current["results"]:
+        old = previous.get(_key(result))
+        if old is None:
+            continue
+        ratio = result["seconds"] / old["seconds"]
+        slower = ratio > 1 + threshold
+        regressed |= slower
+        print(f"{'SLOWER' if slower else '      '} {_key(result)}: {ratio:.2f}x")
+    return regressed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="Smaller datasets and shorter chains")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, help="Run only these groups")
+    parser.add_argument("--output", type=Path, default=None, help="Result file (default: benchmarks/results/)")
+    parser.add_argument("--compare", type=Path, default=None, help="Baseline result file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative slowdown reported as regression")
+    args = parser.parse_args()
+
+    for name, value in (("PROJECT_NAME", "benchmark"), ("PROJECT_VERSION", "0"), ("PROJECT_HOST", "127.0.0.1"), ("PROJECT_PORT", "8000")):
+        os.environ.setdefault(name, value)
+
+    options = {
+        "sizes": QUICK_SIZES if args.quick else SIZES,
+        "mcmc_sizes": QUICK_MCMC_SIZES if args.quick else MCMC_SIZES,
+        "iterations": QUICK_MCMC_ITERATIONS if args.quick else MCMC_ITERATIONS,
+        "ensemble_steps": QUICK_ENSEMBLE_STEPS if args.quick else ENSEMBLE_STEPS,
+        "nuts_iterations": QUICK_NUTS_ITERATIONS if args.quick else NUTS_ITERATIONS,
+    }
+    results = []
+    for group in args.only or BENCHMARKS:
+        for result in BENCHMARKS[group](**options):
+            print(f"{_key(result)}: {result['seconds'] * 1e3:.3f} ms")
+            results.append(result)
+
+    report = {"metadata": {**machine_metadata(), "quick": args.quick}, "results": results}
+    output = args.output
+    if output is None:
+        commit = (report["metadata"]["commit"] or "unknown")[:10]
+        output = RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}-{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Results written to {output}")
+
+    if args.compare is not None:
+        return 1 if compare(json.loads(args.compare.read_text()), report, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,29 @@
+import os
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 
-from src.config import ApiSettings
+from src.config import ApiSettings, OUTPUT_DIR
 from src.api.api import analytics_router
+from src.analytics.chains import shutdown_chain_pool
+from src.api.jobs import job_manager
+from src.presentation.renderer import plot_renderer
+
+
+@asynccontextmanager
+async def lifespan(application: FastAPI):
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    plot_renderer.start()
+    yield
+    job_manager.shutdown()
+    shutdown_chain_pool()
+    plot_renderer.shutdown()
 
 
 def start_application(config: ApiSettings):
     application = FastAPI(
         debug=True,
+        lifespan=lifespan,
         title=config.PROJECT_NAME,
         version=config.PROJECT_VERSION,
         description="Bayesian simulator for gamma-radiation measurements",
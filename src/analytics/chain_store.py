@@ -0,0 +1,300 @@
+import os
+import tempfile
+import weakref
+
+import numpy as np
+
+from typing import Iterator
+from src.config import CHAIN_DIR, CHAIN_MEMORY_MB, CHAIN_READ_DRAWS
+
+MOMENT_BLOCK = 4096  # stored draws folded into the running moments at once
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class ChainStore:
+    """
+    Append-only store of the post burn-in states of one chain (or one ensemble).
+
+    Burn-in states are dropped and the rest thinned as they are appended, so only
+    ``ceil((total - burn_in) / thin)`` states are kept. Stores larger than ``max_memory_mb`` live in a
+    disk-backed ``np.memmap`` instead of RAM. Mean, variance, minimum and maximum are folded in block by
+    block while the draws are still in cache, so summaries need no second pass over the chain.
+
+    A pickled store that spilled to disk carries its file path rather than the draws, and the file then
+    belongs to the unpickled copy: this is how pool workers hand long chains back to the parent process.
+    ``stopping`` holds the convergence monitor report of the run that filled the store, if any.
+    """
+
+    def __init__(
+            self,
+            total: int,
+            burn_in: int = 0,
+            thin: int = 1,
+            shape: tuple[int, ...] = (4,),
+            max_memory_mb: float = CHAIN_MEMORY_MB,
+            directory: str = CHAIN_DIR,
+    ):
+        if thin < 1:
+            raise ValueError("thin must be a positive integer")
+        self.burn_in = burn_in
+        self.thin = thin
+        self.shape = tuple(shape)
+        self.capacity = max(0, -(-(total - burn_in) // thin))
+        self.seen = 0
+        self.size = 0
+        self.stopping: dict | None = None
+
+        self.path: str | None = None
+        self._finalizer = None
+        nbytes = self.capacity * int(np.prod(self.shape)) * 8
+        if nbytes > max_memory_mb * 2 ** 20:
+            os.makedirs(directory, exist_ok=True)
+            fd, self.path = tempfile.mkstemp(dir=directory, suffix=".chain")
+            os.close(fd)
+            self._finalizer = weakref.finalize(self, _remove, self.path)
+            self.data = np.memmap(self.path, dtype=np.float64, mode="w+", shape=(self.capacity, *self.shape))
+        else:
+            self.data = np.empty((self.capacity, *self.shape))
+
+        self._folded = 0
+        self._mean = np.zeros(self.shape)
+        self._m2 = np.zeros(self.shape)
+        self._minimum = np.full(self.shape, np.inf)
+        self._maximum = np.full(self.shape, -np.inf)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getstate__(self) -> dict:
+        self._fold()
+        state = dict(self.__dict__)
+        state.pop("_finalizer")
+        if self.path is not None:
+            if isinstance(self.data, np.memmap):
+                self.data.flush()
+            state.pop("data")
+            # the file now belongs to the unpickled copy
+            self._finalizer.detach()
+        else:
+            state["data"] = self.data[:self.size]
+            state["capacity"] = self.size
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._finalizer = None
+        if self.path is not None:
+            self.data = np.memmap(self.path, dtype=np.float64, mode="r+", shape=(self.capacity, *self.shape))
+            self._finalizer = weakref.finalize(self, _remove, self.path)
+
+    def append(self, state: np.ndarray) -> None:
+        self.seen += 1
+        kept = self.seen - self.burn_in
+        if kept <= 0 or (kept - 1) % self.thin:
+            return
+        self.data[self.size] = state
+        self.size += 1
+        if self.size - self._folded >= MOMENT_BLOCK:
+            self._fold()
+
+    def extend(self, states: np.ndarray) -> None:
+        """
+        Append a block of consecutive states, applying the burn-in and thinning like ``append``.
+        """
+        first = self.seen
+        self.seen += len(states)
+        start = max(0, self.burn_in - first)
+        offset = (first + start - self.burn_in) % self.thin
+        if offset:
+            start += self.thin - offset
+        selected = states[start::self.thin]
+        self.data[self.size:self.size + len(selected)] = selected
+        self.size += len(selected)
+        if self.size - self._folded >= MOMENT_BLOCK:
+            self._fold()
+
+    def _fold(self) -> None:
+        """
+        Merge the draws stored since the last call into the running moments (Chan et al. pairwise update).
+        """
+        if self._folded == self.size:
+            return
+        block = np.asarray(self.data[self._folded:self.size])
+        n_a, n_b = self._folded, block.shape[0]
+        block_mean = block.mean(axis=0)
+        delta = block_mean - self._mean
+        n = n_a + n_b
+        self._mean = self._mean + delta * n_b / n
+        self._m2 = self._m2 + ((block - block_mean) ** 2).sum(axis=0) + delta ** 2 * n_a * n_b / n
+        self._minimum = np.minimum(self._minimum, block.min(axis=0))
+        self._maximum = np.maximum(self._maximum, block.max(axis=0))
+        self._folded = n
+
+    @property
+    def mean(self) -> np.ndarray:
+        self._fold()
+        return self._mean
+
+    @property
+    def variance(self) -> np.ndarray:
+        """
+        Unbiased variance of the stored draws.
+        """
+        self._fold()
+        return self._m2 / max(self.size - 1, 1)
+
+    @property
+    def minimum(self) -> np.ndarray:
+        self._fold()
+        return self._minimum
+
+    @property
+    def maximum(self) -> np.ndarray:
+        self._fold()
+        return self._maximum
+
+    @property
+    def draws(self) -> np.ndarray:
+        """
+        The stored draws; a memory-mapped view if the store spilled to disk.
+        """
+        return self.data[:self.size]
+
+    def chunks(self, size: int = CHAIN_READ_DRAWS) -> Iterator[np.ndarray]:
+        for start in range(0, self.size, size):
+            yield np.asarray(self.data[start:min(start + size, self.size)])
+
+    def subsample(self, max_draws: int | None = CHAIN_READ_DRAWS) -> np.ndarray:
+        """
+        Every k-th stored draw so that at most ``max_draws`` are read; all of them if ``max_draws`` is None.
+        """
+        step = 1 if max_draws is None else max(1, -(-self.size // max_draws))
+        return np.array(self.data[:self.size:step])
+
+    def close(self) -> None:
+        """
+        Release the draws and remove the backing file, if any.
+        """
+        self.data = np.empty((0, *self.shape))
+        if self._finalizer is not None:
+            self._finalizer()
+
+
+class PosteriorDraws:
+    """
+    Post burn-in draws of a run as a list of chain stores. A store of ensemble states, shaped
+    (walkers, 4) per step, counts as one chain per walker.
+    """
+
+    def __init__(self, stores: list[ChainStore]):
+        self.stores = stores
+
+    @classmethod
+    def from_array(cls, chain_draws: np.ndarray) -> "PosteriorDraws":
+        """
+        Wrap in-memory draws of shape (n_chains, n_draws, 4).
+        """
+        stores = []
+        for draws in chain_draws:
+            store = ChainStore(len(draws), shape=draws.shape[1:])
+            store.extend(draws)
+            stores.append(store)
+        return cls(stores)
+
+    def __len__(self) -> int:
+        return sum(self._chains(store) * len(store) for store in self.stores)
+
+    @staticmethod
+    def _chains(store: ChainStore) -> int:
+        return store.shape[0] if len(store.shape) == 2 else 1
+
+    @property
+    def n_chains(self) -> int:
+        return sum(self._chains(store) for store in self.stores)
+
+    @property
+    def draws_per_chain(self) -> int:
+        return min(len(store) for store in self.stores)
+
+    @property
+    def stopping(self) -> list[dict]:
+        """
+        Why and when every chain (or ensemble) stopped.
+        """
+        return [store.stopping for store in self.stores if store.stopping is not None]
+
+    def _pooled(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Count, mean and sum of squared deviations per parameter pooled over all chains.
+        """
+        counts, means, m2s = [], [], []
+        for store in self.stores:
+            mean, m2 = store.mean, store.variance * max(len(store) - 1, 1)
+            if mean.ndim == 2:
+                counts += [len(store)] * mean.shape[0]
+                means += list(mean)
+                m2s += list(m2)
+            else:
+                counts.append(len(store))
+                means.append(mean)
+                m2s.append(m2)
+        counts, means, m2s = np.array(counts, dtype=np.float64)[:, np.newaxis], np.array(means), np.array(m2s)
+        total = counts.sum()
+        mean = (counts * means).sum(axis=0) / total
+        m2 = m2s.sum(axis=0) + (counts * (means - mean) ** 2).sum(axis=0)
+        return total, mean, m2
+
+    @property
+    def mean(self) -> np.ndarray:
+        return self._pooled()[1]
+
+    @property
+    def variance(self) -> np.ndarray:
+        total, _, m2 = self._pooled()
+        return m2 / max(total - 1, 1)
+
+    @property
+    def minimum(self) -> np.ndarray:
+        return np.min([store.minimum.reshape(-1, 4).min(axis=0) for store in self.stores], axis=0)
+
+    @property
+    def maximum(self) -> np.ndarray:
+        return np.max([store.maximum.reshape(-1, 4).max(axis=0) for store in self.stores], axis=0)
+
+    def chain_array(self, max_draws: int | None = CHAIN_READ_DRAWS) -> np.ndarray:
+        """
+        Thinned draws of every chain, at most ``max_draws`` per chain.
+        :return: array of shape (n_chains, n_draws, 4)
+        """
+        arrays = []
+        for store in self.stores:
+            draws = store.subsample(max_draws)
+            arrays += list(draws.transpose(1, 0, 2)) if draws.ndim == 3 else [draws]
+        length = min(len(draws) for draws in arrays)
+        return np.stack([draws[:length] for draws in arrays])
+
+    def flat(self, max_draws: int | None = CHAIN_READ_DRAWS) -> np.ndarray:
+        """
+        Thinned draws of all chains pooled, at most about ``max_draws`` in total.
+        :return: array of shape (n_draws, 4)
+        """
+        per_store = None if max_draws is None else max(1, max_draws // len(self.stores))
+        return np.concatenate([store.subsample(per_store).reshape(-1, 4) for store in self.stores])
+
+    def chunks(self, size: int = CHAIN_READ_DRAWS) -> Iterator[np.ndarray]:
+        """
+        All draws, pooled, in blocks of shape (at most ``size``, 4).
+        """
+        for store in self.stores:
+            for chunk in store.chunks(max(1, size // self._chains(store))):
+                yield chunk.reshape(-1, 4)
+
+    def close(self) -> None:
+        for store in self.stores:
+            store.close()
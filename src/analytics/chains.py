@@ -0,0 +1,141 @@
+import asyncio
+import multiprocessing
+import os
+
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+from src.analytics.chain_store import ChainStore, PosteriorDraws
+from src.analytics.convergence import StoppingRule
+from src.analytics.distributions import PoissonLikelihood
+from src.analytics.laplace import LaplaceApproximation
+from src.analytics.samplers import MetropolisSampler, NutsSampler
+from src.tools.metrics import observe_sampler
+
+
+def dispersed_starts(init_params: np.ndarray, chains: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Starting points for independent chains scattered around ``init_params``.
+    The first chain keeps ``init_params``; the others are shifted along the road, alternate sides
+    of the road and get activity and background perturbed on a log scale.
+    :return: array of shape (chains, 4)
+    """
+    starts = np.tile(np.asarray(init_params, dtype=np.float64), (chains, 1))
+    if chains == 1:
+        return starts
+
+    others = chains - 1
+    side = np.where(np.arange(others) % 2 == 0, -1.0, 1.0)
+    starts[1:, 0] += rng.normal(0, 50, others)
+    starts[1:, 1] = side * np.abs(starts[1:, 1] + rng.uniform(20, 100, others))
+    starts[1:, 2] *= rng.lognormal(0, 0.5, others)
+    starts[1:, 3] = np.abs(starts[1:, 3]) * rng.lognormal(0, 0.2, others)
+    return starts
+
+
+def chain_sampler(
+        sampler: str,
+        likelihood: PoissonLikelihood,
+        init_params: np.ndarray,
+        seed: int | np.random.SeedSequence | None,
+        burn_in: int,
+        laplace: LaplaceApproximation | None = None,
+) -> MetropolisSampler | NutsSampler:
+    """
+    Single-chain sampler of the given kind; NUTS adapts its step size and mass matrix during the burn-in.
+    A Laplace approximation seeds the Metropolis proposal covariance or the NUTS mass matrix.
+    """
+    if sampler == "nuts":
+        inverse_mass = laplace.inverse_mass if laplace is not None else None
+        return NutsSampler(likelihood, init_params=init_params, seed=seed, tune=burn_in, inverse_mass=inverse_mass)
+    proposal_covariance = laplace.proposal_covariance if laplace is not None else None
+    return MetropolisSampler(likelihood, init_params=init_params, seed=seed, proposal_covariance=proposal_covariance)
+
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def chain_pool() -> ProcessPoolExecutor:
+    """
+    Process pool shared by the multi-chain runs of all requests, one worker per CPU, started on first use.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+    return _pool
+
+
+def shutdown_chain_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+
+def run_chain(
+        likelihood: PoissonLikelihood,
+        init_params: np.ndarray,
+        seed: np.random.SeedSequence,
+        simnum: int,
+        burn_in: int,
+        callback: Callable | None = None,
+        thin: int = 1,
+        stopping: StoppingRule = StoppingRule(),
+        sampler: str = "metropolis",
+        laplace: LaplaceApproximation | None = None,
+) -> tuple[ChainStore, dict[str, float]]:
+    """
+    Run a single chain and return the store of its post burn-in draws and the sampler health.
+    Executed inside pool workers, so ``callback`` must be picklable; a store that spilled to disk
+    travels back to the parent as its file path.
+    :param stopping: convergence criteria of this chain; ``simnum`` is the iteration cap
+    """
+    chain = chain_sampler(sampler, likelihood, init_params, seed, burn_in, laplace)
+    store = ChainStore(simnum, burn_in=burn_in, thin=thin)
+    monitor = stopping.monitor(store)
+    chain.run(simnum, callback=callback, store=store, monitor=monitor)
+    store.stopping = monitor.report()
+    return store, chain.health
+
+
+async def run_chains(
+        likelihood: PoissonLikelihood,
+        init_params: np.ndarray,
+        chains: int,
+        simnum: int,
+        burn_in: int,
+        seed: int | None = None,
+        callbacks: list[Callable] | None = None,
+        thin: int = 1,
+        stopping: StoppingRule = StoppingRule(),
+        sampler: str = "metropolis",
+        laplace: LaplaceApproximation | None = None,
+) -> tuple[PosteriorDraws, np.ndarray]:
+    """
+    Run independent chains in the shared chain pool. Each chain gets its own RNG stream spawned
+    from a single ``SeedSequence``, so a fixed seed reproduces every chain.
+    Inside a pool worker, e.g. a background simulation job, the chains run one after another in the
+    worker itself instead of oversubscribing the CPUs with a nested pool.
+    The ESS target of ``stopping`` is shared evenly between the chains, each of which stops on its own.
+    :return: post burn-in draws of every chain and the acceptance rate of every chain
+    """
+    seed_sequence = np.random.SeedSequence(seed)
+    start_seed, *chain_seeds = seed_sequence.spawn(chains + 1)
+    starts = dispersed_starts(init_params, chains, np.random.default_rng(start_seed))
+
+    callbacks = callbacks or [None] * chains
+
+    args = [
+        (likelihood, starts[i], chain_seeds[i], simnum, burn_in, callbacks[i], thin, stopping.split(chains), sampler, laplace)
+        for i in range(chains)
+    ]
+    if multiprocessing.parent_process() is not None:
+        results = [run_chain(*chain_args) for chain_args in args]
+    else:
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*(loop.run_in_executor(chain_pool(), run_chain, *chain_args) for chain_args in args))
+    stores, health = zip(*results)
+    for chain_health in health:
+        observe_sampler(sampler, **chain_health)
+    return PosteriorDraws(list(stores)), np.array([chain_health["acceptance_rate"] for chain_health in health])
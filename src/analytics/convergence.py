@@ -0,0 +1,238 @@
+import math
+
+import numpy as np
+
+from dataclasses import dataclass
+from time import perf_counter
+from src.analytics.chain_store import ChainStore
+from src.analytics.diagnostics import PARAM_NAMES
+from src.config import CONVERGENCE_CHECK_INTERVAL, CONVERGENCE_MAX_BATCHES, CONVERGENCE_MIN_BATCHES, CONVERGENCE_SEGMENTS
+
+
+class BatchMeans:
+    """
+    Incremental batch-means estimator of the effective sample size and of a segment R-hat.
+
+    Draws are summed into at most ``max_batches`` consecutive batches; when they are all full, neighbouring
+    batches are merged and the batch size doubles, so memory stays constant however long the chain runs.
+    States of shape (m, 4), e.g. an ensemble of m walkers, are treated as m chains.
+    """
+
+    def __init__(self, shape: tuple[int, ...] = (4,), max_batches: int = CONVERGENCE_MAX_BATCHES):
+        if max_batches % 2:
+            raise ValueError("max_batches must be even")
+        self.max_batches = max_batches
+        self.batch_size = 1
+        self.batches = 0
+        self._sums = np.zeros((max_batches, *shape))
+        self._squares = np.zeros((max_batches, *shape))
+        self._partial_sum = np.zeros(shape)
+        self._partial_squares = np.zeros(shape)
+        self._partial_count = 0
+
+    @property
+    def count(self) -> int:
+        """
+        Draws in the completed batches, the ones the estimates are based on.
+        """
+        return self.batches * self.batch_size
+
+    def _push(self, sums: np.ndarray, squares: np.ndarray) -> None:
+        k = len(sums)
+        self._sums[self.batches:self.batches + k] = sums
+        self._squares[self.batches:self.batches + k] = squares
+        self.batches += k
+        if self.batches == self.max_batches:
+            half = self.max_batches // 2
+            self._sums[:half] = self._sums[0::2] + self._sums[1::2]
+            self._squares[:half] = self._squares[0::2] + self._squares[1::2]
+            self._sums[half:] = 0
+            self._squares[half:] = 0
+            self.batches = half
+            self.batch_size *= 2
+
+    def extend(self, block: np.ndarray) -> None:
+        """
+        Add consecutive draws of shape (n, *shape).
+        """
+        block = np.asarray(block, dtype=np.float64)
+        while len(block):
+            if self._partial_count or len(block) < self.batch_size:
+                take = min(len(block), self.batch_size - self._partial_count)
+                self._partial_sum += block[:take].sum(axis=0)
+                self._partial_squares += (block[:take] ** 2).sum(axis=0)
+                self._partial_count += take
+                block = block[take:]
+                if self._partial_count == self.batch_size:
+                    self._push(self._partial_sum[np.newaxis], self._partial_squares[np.newaxis])
+                    self._partial_sum = np.zeros_like(self._partial_sum)
+                    self._partial_squares = np.zeros_like(self._partial_squares)
+                    self._partial_count = 0
+                continue
+            full = min(len(block) // self.batch_size, self.max_batches - self.batches)
+            used = full * self.batch_size
+            batches = block[:used].reshape(full, self.batch_size, *block.shape[1:])
+            # a push may merge the batches and double batch_size, so the consumed length is taken before
+            self._push(batches.sum(axis=1), (batches ** 2).sum(axis=1))
+            block = block[used:]
+
+    def _chains(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Batch sums and sums of squares as (batches, chains, 4) arrays.
+        """
+        sums = self._sums[:self.batches].reshape(self.batches, -1, 4)
+        squares = self._squares[:self.batches].reshape(self.batches, -1, 4)
+        return sums, squares
+
+    def ess(self) -> np.ndarray:
+        """
+        Effective sample size per parameter of all chains together. Batch means are taken around the grand
+        mean, so chains that have not mixed yet lower the estimate, and their variance is inflated by the
+        lag-1 correlation of consecutive batch means, which is large while batches are shorter than the
+        autocorrelation time of the chain.
+        """
+        sums, squares = self._chains()
+        chains = sums.shape[1]
+        n = self.count * chains
+        mean = sums.sum(axis=(0, 1)) / n
+        variance = (squares.sum(axis=(0, 1)) / n - mean ** 2) * n / (n - 1)
+        deviations = sums / self.batch_size - mean
+        batch_variance = (deviations ** 2).sum(axis=(0, 1)) / (self.batches * chains - 1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            lag_one = (deviations[1:] * deviations[:-1]).sum(axis=(0, 1)) / (deviations ** 2).sum(axis=(0, 1))
+            lag_one = np.clip(np.nan_to_num(lag_one), 0.0, 0.99)
+            batch_variance = batch_variance * self.batch_size * (1 + lag_one) / (1 - lag_one)
+            ess = np.where(batch_variance > 0, n * variance / batch_variance, n)
+        return np.minimum(ess, n)
+
+    def rhat(self, segments: int = CONVERGENCE_SEGMENTS) -> np.ndarray:
+        """
+        Potential scale reduction per parameter over ``segments`` consecutive segments of every chain.
+        """
+        sums, squares = self._chains()
+        per_segment = self.batches // segments
+        used = per_segment * segments
+        n = per_segment * self.batch_size
+        segment_sums = sums[self.batches - used:].reshape(segments, per_segment, -1, 4).sum(axis=1)
+        segment_squares = squares[self.batches - used:].reshape(segments, per_segment, -1, 4).sum(axis=1)
+        means = (segment_sums / n).reshape(-1, 4)
+        variances = ((segment_squares / n).reshape(-1, 4) - means ** 2) * n / (n - 1)
+        within = variances.mean(axis=0)
+        between = n * means.var(axis=0, ddof=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.sqrt(((n - 1) / n * within + between / n) / within)
+
+
+@dataclass(frozen=True)
+class StoppingRule:
+    """
+    Convergence criteria of a run; the iteration count passed to the sampler stays the hard cap.
+    :param target_ess: stop once the smallest batch-means ESS of the run reaches this value
+    :param max_rhat: stop once the largest segment R-hat is at most this value (together with ``target_ess``
+    if both are given)
+    :param max_seconds: stop after this much sampling time
+    """
+    target_ess: float | None = None
+    max_rhat: float | None = None
+    max_seconds: float | None = None
+    interval: int = CONVERGENCE_CHECK_INTERVAL
+
+    def split(self, chains: int) -> "StoppingRule":
+        """
+        Rule of one of ``chains`` independent chains sharing the ESS target.
+        """
+        if self.target_ess is None or chains == 1:
+            return self
+        return StoppingRule(self.target_ess / chains, self.max_rhat, self.max_seconds, self.interval)
+
+    def monitor(self, store: ChainStore) -> "ConvergenceMonitor":
+        return ConvergenceMonitor(store, self.target_ess, self.max_rhat, self.max_seconds, self.interval)
+
+
+class ConvergenceMonitor:
+    """
+    Stopping rule of a chain: every ``interval`` iterations the draws stored since the previous check are
+    folded into a ``BatchMeans`` estimator, and the run stops once the smallest ESS reaches ``target_ess``
+    and, if given, the largest segment R-hat is below ``max_rhat``, or once ``max_seconds`` have elapsed.
+    Without any criterion the chain runs to its iteration cap.
+    """
+
+    def __init__(
+            self,
+            store: ChainStore,
+            target_ess: float | None = None,
+            max_rhat: float | None = None,
+            max_seconds: float | None = None,
+            interval: int = CONVERGENCE_CHECK_INTERVAL,
+            min_batches: int = CONVERGENCE_MIN_BATCHES,
+    ):
+        self.store = store
+        self.target_ess = target_ess
+        self.max_rhat = max_rhat
+        self.max_seconds = max_seconds
+        self.interval = interval
+        self.min_batches = min_batches
+        self.estimator = BatchMeans(store.shape)
+        self.started = perf_counter()
+        self.reason: str | None = None
+        self.iterations = 0
+        self._read = 0
+
+    def _estimates(self) -> tuple[np.ndarray, np.ndarray] | None:
+        if self._read < self.store.size:
+            self.estimator.extend(self.store.data[self._read:self.store.size])
+            self._read = self.store.size
+        if self.estimator.batches < self.min_batches:
+            return None
+        return self.estimator.ess(), self.estimator.rhat()
+
+    def should_stop(self, iterations: int) -> bool:
+        """
+        :param iterations: iterations run so far
+        :return: True if the chain can stop; ``reason`` then says why
+        """
+        self.iterations = iterations
+        if self.max_seconds is not None and perf_counter() - self.started >= self.max_seconds:
+            self.reason = "max_seconds"
+            return True
+        if self.target_ess is None and self.max_rhat is None:
+            return False
+
+        estimates = self._estimates()
+        if estimates is None:
+            return False
+        ess, rhat = estimates
+        ess_reached = self.target_ess is None or ess.min() >= self.target_ess
+        rhat_reached = self.max_rhat is None or rhat.max() <= self.max_rhat
+        if ess_reached and rhat_reached:
+            self.reason = "target_ess" if self.target_ess is not None else "max_rhat"
+            return True
+        return False
+
+    def finish(self, iterations: int) -> None:
+        """
+        Record the end of a run that was not stopped early.
+        """
+        if self.reason is None:
+            self.iterations = iterations
+            self.reason = "max_iterations"
+
+    def report(self) -> dict:
+        """
+        Why and when the chain stopped, with the last batch-means estimates if an ESS or R-hat
+        criterion was given.
+        """
+        estimates = None if self.target_ess is None and self.max_rhat is None else self._estimates()
+        report = {
+            "reason": self.reason,
+            "iterations": self.iterations,
+            "seconds": perf_counter() - self.started,
+            "target_ess": self.target_ess,
+            "max_rhat": self.max_rhat,
+            "max_seconds": self.max_seconds,
+        }
+        if estimates is not None:
+            ess, rhat = estimates
+            report["ess"] = {name: float(ess[i]) for i, name in enumerate(PARAM_NAMES)}
+            report["r_hat"] = {name: (float(rhat[i]) if math.isfinite(rhat[i]) else None) for i, name in enumerate(PARAM_NAMES)}
+        return report
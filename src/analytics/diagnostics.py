@@ -0,0 +1,85 @@
+import numpy as np
+
+
+PARAM_NAMES = ("x", "y", "activity", "background")
+
+
+def _split_chains(chains: np.ndarray) -> np.ndarray:
+    """
+    Split every chain in two halves, dropping the middle draw for odd lengths.
+    :param chains: array of shape (n_chains, n_draws, n_params)
+    :return: array of shape (2 * n_chains, n_draws // 2, n_params)
+    """
+    half = chains.shape[1] // 2
+    return np.concatenate([chains[:, :half], chains[:, -half:]], axis=0)
+
+
+def split_rhat(chains: np.ndarray) -> np.ndarray:
+    """
+    Split-R-hat (Gelman et al.) for each parameter.
+    :param chains: array of shape (n_chains, n_draws, n_params)
+    :return: array of R-hat values, one per parameter
+    """
+    split = _split_chains(np.asarray(chains, dtype=np.float64))
+    n = split.shape[1]
+    chain_means = split.mean(axis=1)
+    within = split.var(axis=1, ddof=1).mean(axis=0)
+    between = n * chain_means.var(axis=0, ddof=1)
+    var_plus = (n - 1) / n * within + between / n
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.sqrt(var_plus / within)
+
+
+def _autocovariance(draws: np.ndarray) -> np.ndarray:
+    """
+    FFT autocovariance along axis 1 of an array of shape (n_chains, n_draws, n_params).
+    """
+    n = draws.shape[1]
+    centered = draws - draws.mean(axis=1, keepdims=True)
+    size = 2 ** int(np.ceil(np.log2(2 * n)))
+    spectrum = np.fft.rfft(centered, n=size, axis=1)
+    return np.fft.irfft(spectrum * np.conjugate(spectrum), n=size, axis=1)[:, :n] / n
+
+
+def effective_sample_size(chains: np.ndarray) -> np.ndarray:
+    """
+    Bulk effective sample size of split chains using Geyer's initial monotone sequence estimator.
+    :param chains: array of shape (n_chains, n_draws, n_params)
+    :return: array of ESS values, one per parameter
+    """
+    split = _split_chains(np.asarray(chains, dtype=np.float64))
+    m, n, n_params = split.shape
+    autocov = _autocovariance(split)
+    within = autocov[:, 0].mean(axis=0) * n / (n - 1)
+    var_plus = within * (n - 1) / n
+    if m > 1:
+        var_plus = var_plus + split.mean(axis=1).var(axis=0, ddof=1)
+
+    ess = np.empty(n_params)
+    for p in range(n_params):
+        if var_plus[p] <= 0:
+            ess[p] = m * n
+            continue
+        rho = 1 - (within[p] - autocov[:, :, p].mean(axis=0)) / var_plus[p]
+        rho[0] = 1.0
+        # Geyer: sum consecutive pairs while they stay positive, enforcing monotonicity
+        pairs = rho[:n - n % 2].reshape(-1, 2).sum(axis=1)
+        non_positive = np.flatnonzero(pairs <= 0)
+        pairs = pairs[:non_positive[0]] if non_positive.size else pairs
+        pairs = np.minimum.accumulate(pairs)
+        tau = -1 + 2 * np.sum(pairs)
+        ess[p] = m * n / max(tau, 1 / np.log10(m * n))
+    return ess
+
+
+def chain_diagnostics(chains: np.ndarray) -> dict[str, dict[str, float]]:
+    """
+    Split-R-hat and effective sample size per parameter, keyed by parameter name.
+    :param chains: post burn-in draws of shape (n_chains, n_draws, 4)
+    """
+    rhat = split_rhat(chains)
+    ess = effective_sample_size(chains)
+    return {
+        name: {"r_hat": float(rhat[i]), "ess": float(ess[i])}
+        for i, name in enumerate(PARAM_NAMES)
+    }
@@ -1,41 +1,392 @@
+import math
+
 import numpy as np
 import pandas as pd
 
-from scipy.stats import gamma, norm, poisson
-from src.config import SCALE, BKG_COUNT_RATE
-from src.utils import mean_count_rate
+from functools import cached_property
+from scipy.special import gammaln, lambertw
+from src.config import (
+    SCALE,
+    BKG_COUNT_RATE,
+    BRANCH_RATIO,
+    EFFICIENCY,
+    LIKELIHOOD_CUTOFF,
+    LIKELIHOOD_INDEX_MIN_POINTS,
+    get_mu_air,
+)
+from src.utils import source_count_rate
 
 
-async def calculate_prior_log(act, mu_bkg) -> float:
-    if min(act, mu_bkg) < 0:
-        return -np.inf
+MAX_SOURCE_DISTANCE = 2000  # in meters from the origin
+NEAR_CHUNK_POINTS = 2 ** 16  # measurements per flattened block of the batched near-set evaluation
 
-    log_prior = 0
+# Prior hyperparameters: Gamma(a, scale) on activity / SCALE and Normal(loc, scale) on background
+ACTIVITY_PRIOR_SHAPE = 1.2
+ACTIVITY_PRIOR_SCALE = 1 / 0.0001
+BKG_PRIOR_LOC = 10
+BKG_PRIOR_SCALE = 10
 
-    log_prior += gamma.logpdf(act / SCALE, a=1.2, scale=1/0.0001)
-    log_prior += norm.logpdf(mu_bkg, loc=10, scale=10)
+_ACTIVITY_PRIOR_NORM = -math.lgamma(ACTIVITY_PRIOR_SHAPE) - ACTIVITY_PRIOR_SHAPE * math.log(ACTIVITY_PRIOR_SCALE)
+_BKG_PRIOR_NORM = -math.log(BKG_PRIOR_SCALE) - 0.5 * math.log(2 * math.pi)
 
-    return log_prior
 
-async def calculate_likelihood_log(lambda_params: np.ndarray, data: pd.DataFrame) -> float:
-    x, y, act, mu_bkg = lambda_params
+class PoissonLikelihood:
+    """
+    Poisson log-likelihood of a measurement track.
+    The object is built once per dataset: coordinates and counts are kept as contiguous arrays
+    and the ``log(k!)`` term is precomputed, so each evaluation works directly in log space
+    without pandas indexing or pmf underflow.
+
+    On tracks of at least ``index_min_points`` measurements a KD-tree over the positions restricts the
+    source term to the measurements within ``cutoff_radius`` of the proposed source. With the rate
+    ``r_i = act * s_i + bkg`` the log-likelihood is ``K log(bkg) - N bkg + sum (k_i log(1 + act s_i / bkg) - act s_i)``
+    up to ``log(k!)``, with K the total counts: the background-only part is updated in closed form and the
+    sum only runs over the nearby measurements, where the source adds at least ``cutoff`` times the
+    background. The cost per evaluation then scales with the local density of the track, not its length.
+    """
+
+    def __init__(
+            self,
+            x_position,
+            y_position,
+            counts,
+            cutoff: float = LIKELIHOOD_CUTOFF,
+            index_min_points: int = LIKELIHOOD_INDEX_MIN_POINTS,
+    ):
+        self.x = np.ascontiguousarray(x_position, dtype=np.float64)
+        self.y = np.ascontiguousarray(y_position, dtype=np.float64)
+        self.counts = np.ascontiguousarray(counts, dtype=np.float64)
+        self.log_factorial = gammaln(self.counts + 1)
+        self.log_factorial_sum = float(np.sum(self.log_factorial))
+        self.counts_sum = float(np.sum(self.counts))
+        self.cutoff = cutoff
+        self.indexed = cutoff > 0 and self.counts.size >= index_min_points
+
+    @classmethod
+    def from_dataframe(cls, data) -> "PoissonLikelihood":
+        """
+        :param data: dataframe or stored survey with ``x``, ``y`` and ``pois_data`` columns
+        """
+        return cls(data["x"], data["y"], data["pois_data"])
+
+    def __len__(self) -> int:
+        return self.counts.size
+
+    @cached_property
+    def tree(self):
+        """
+        KD-tree over the measurement positions, built on first use.
+        """
+        from scipy.spatial import cKDTree
+
+        return cKDTree(np.column_stack([self.x, self.y]))
+
+    @cached_property
+    def sweep(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, int]:
+        """
+        Measurements sorted along the longer side of the bounding box of the track, built on first use:
+        the measurements within a distance r of a source then lie in one contiguous range of this order.
+        :return: sorted x, y, counts and coordinates along the axis, and the axis (0 for x, 1 for y)
+        """
+        axis = int(np.ptp(self.y) > np.ptp(self.x))
+        order = np.argsort(self.y if axis else self.x, kind="stable")
+        x, y = self.x[order], self.y[order]
+        return x, y, self.counts[order], y if axis else x, axis
+
+    def closest(self, x, y) -> np.ndarray:
+        """
+        Index of the measurement point closest to every given position.
+        """
+        return self.tree.query(np.column_stack([np.atleast_1d(x), np.atleast_1d(y)]))[1]
+
+    def cutoff_radius(self, act: float, mu_bkg: float) -> float:
+        """
+        Distance beyond which the source adds less than ``cutoff`` times the background to the count rate:
+        ``act K exp(-mu d) / (4 pi d^2) = cutoff * bkg`` solved for d with the Lambert W function.
+        """
+        if self.cutoff <= 0 or mu_bkg <= 0:
+            return np.inf
+        ratio = act * SCALE * BRANCH_RATIO * EFFICIENCY / (4 * np.pi * self.cutoff * mu_bkg)
+        if ratio <= 0:
+            return 0.0
+        mu = get_mu_air()
+        return float(2 / mu * lambertw(mu / 2 * math.sqrt(ratio)).real)
+
+    def _cutoff_radii(self, act: np.ndarray, mu_bkg: np.ndarray) -> np.ndarray:
+        """
+        ``cutoff_radius`` of many sources at once, for non-negative activities.
+        """
+        radii = np.full(act.shape, np.inf)
+        if self.cutoff <= 0:
+            return radii
+        positive = mu_bkg > 0
+        ratio = act[positive] * SCALE * BRANCH_RATIO * EFFICIENCY / (4 * np.pi * self.cutoff * mu_bkg[positive])
+        mu = get_mu_air()
+        radii[positive] = 2 / mu * lambertw(mu / 2 * np.sqrt(ratio)).real
+        return radii
+
+    def _near(self, x: float, y: float, act: float, mu_bkg: float) -> np.ndarray | None:
+        """
+        Indices of the measurements within the cutoff radius of the source, or None if the whole track
+        has to be evaluated: the index is not used, or the radius covers the bounding box of the track.
+        """
+        if not self.indexed:
+            return None
+        radius = self.cutoff_radius(act, mu_bkg)
+        farthest = max(abs(x - self.tree.mins[0]), abs(x - self.tree.maxes[0])) ** 2 + max(abs(y - self.tree.mins[1]), abs(y - self.tree.maxes[1])) ** 2
+        if radius ** 2 >= farthest:
+            return None
+        return np.asarray(self.tree.query_ball_point((x, y), radius, return_sorted=False), dtype=np.intp)
+
+    def _near_log_likelihood(self, near: np.ndarray, lambda_params: np.ndarray) -> float:
+        x, y, act, mu_bkg = lambda_params
+        counts = self.counts[near]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            dist = np.sqrt((self.x[near] - x) ** 2 + (self.y[near] - y) ** 2)
+            source_rate = source_count_rate(dist, act)
+            likelihood_log = (self.counts_sum * math.log(mu_bkg) - self.counts.size * mu_bkg
+                              + np.dot(counts, np.log1p(source_rate / mu_bkg)) - np.sum(source_rate) - self.log_factorial_sum)
+        if np.isnan(likelihood_log):
+            return -np.inf
+        return float(likelihood_log)
+
+    def _near_log_likelihood_batch(self, lambda_params: np.ndarray, radii: np.ndarray) -> np.ndarray:
+        """
+        ``_near_log_likelihood`` of many sources at once. The near-set of every source is found by a binary
+        search in the ``sweep`` order, and the near-sets of all sources are evaluated as flattened arrays of
+        about ``NEAR_CHUNK_POINTS`` measurements, keeping the terms within the cutoff radius.
+        :param lambda_params: array of shape (W, 4)
+        :param radii: cutoff radius of every source
+        :return: array of shape (W,)
+        """
+        x, y, act, mu_bkg = lambda_params.T
+        sorted_x, sorted_y, sorted_counts, along, axis = self.sweep
+        centre = y if axis else x
+        first = np.searchsorted(along, centre - radii, side="left")
+        sizes = np.searchsorted(along, centre + radii, side="right") - first
+        ends = np.cumsum(sizes)
+
+        near_sum = np.empty(len(lambda_params))
+        start = 0
+        while start < len(lambda_params):
+            offset = ends[start - 1] if start else 0
+            stop = max(start + 1, int(np.searchsorted(ends, offset + NEAR_CHUNK_POINTS, side="right")))
+            rows = slice(start, stop)
+            owner = np.repeat(np.arange(stop - start), sizes[rows])
+            index = np.arange(owner.size) + np.repeat(first[rows] - (ends[rows] - sizes[rows] - offset), sizes[rows])
+            with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+                squared = (sorted_x[index] - x[rows][owner]) ** 2 + (sorted_y[index] - y[rows][owner]) ** 2
+                source_rate = source_count_rate(np.sqrt(squared), act[rows][owner])
+                terms = sorted_counts[index] * np.log1p(source_rate / mu_bkg[rows][owner]) - source_rate
+            near_sum[rows] = np.bincount(owner, weights=np.where(squared <= radii[rows][owner] ** 2, terms, 0.0),
+                                         minlength=stop - start)
+            start = stop
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            likelihood_log = (self.counts_sum * np.log(mu_bkg) - self.counts.size * mu_bkg + near_sum
+                              - self.log_factorial_sum)
+        return np.where(np.isnan(likelihood_log), -np.inf, likelihood_log)
+
+    def log_likelihood(self, lambda_params: np.ndarray) -> float:
+        x, y, act, mu_bkg = lambda_params
+
+        if min(act, mu_bkg) < 0:
+            return -np.inf
+
+        if np.sqrt(x ** 2 + y ** 2) > MAX_SOURCE_DISTANCE:
+            return -np.inf
+
+        near = self._near(x, y, act, mu_bkg)
+        if near is not None:
+            return self._near_log_likelihood(near, lambda_params)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            dist = np.sqrt((self.x - x) ** 2 + (self.y - y) ** 2)
+            count_rate = source_count_rate(dist, act) + mu_bkg
+            likelihood_log = np.dot(self.counts, np.log(count_rate)) - np.sum(count_rate) - self.log_factorial_sum
+
+        if np.isnan(likelihood_log):
+            return -np.inf
+        return float(likelihood_log)
 
-    if min(act, mu_bkg) < 0:
+    def log_likelihood_batch(self, lambda_params: np.ndarray) -> np.ndarray:
+        """
+        Log-likelihood of many parameter vectors at once.
+        The expected count rates form a (W x N) matrix computed in one broadcast and reduced
+        with a single matrix-vector product; out-of-bounds parameters are masked to -inf.
+        With the spatial index, rows whose cutoff radius leaves part of the track out are evaluated
+        together on their nearby measurements instead, by ``_near_log_likelihood_batch``.
+        :param lambda_params: array of shape (W, 4)
+        :return: array of shape (W,)
+        """
+        lambda_params = np.asarray(lambda_params, dtype=np.float64)
+        x, y, act, mu_bkg = lambda_params.T
+        valid = (act >= 0) & (mu_bkg >= 0) & (np.sqrt(x ** 2 + y ** 2) <= MAX_SOURCE_DISTANCE)
+        likelihood_log = np.full(x.shape, -np.inf)
+        if self.indexed and valid.any():
+            # as in ``_near``: rows whose cutoff disc leaves part of the bounding box of the track out
+            rows = np.flatnonzero(valid)
+            radii = self._cutoff_radii(act[rows], mu_bkg[rows])
+            mins, maxes = self.tree.mins, self.tree.maxes
+            farthest = (np.maximum(np.abs(x[rows] - mins[0]), np.abs(x[rows] - maxes[0])) ** 2
+                        + np.maximum(np.abs(y[rows] - mins[1]), np.abs(y[rows] - maxes[1])) ** 2)
+            near = radii ** 2 < farthest
+            rows = rows[near]
+            likelihood_log[rows] = self._near_log_likelihood_batch(lambda_params[rows], radii[near])
+            valid[rows] = False
+        if not valid.any():
+            return likelihood_log
+
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            dist = np.sqrt((self.x - x[valid, np.newaxis]) ** 2 + (self.y - y[valid, np.newaxis]) ** 2)
+            count_rate = source_count_rate(dist, act[valid, np.newaxis]) + mu_bkg[valid, np.newaxis]
+            valid_log = np.log(count_rate) @ self.counts - count_rate.sum(axis=1) - self.log_factorial_sum
+
+        likelihood_log[valid] = np.where(np.isnan(valid_log), -np.inf, valid_log)
+        return likelihood_log
+
+    def log_likelihood_gradient(self, lambda_params: np.ndarray) -> tuple[float, np.ndarray]:
+        """
+        Log-likelihood and its analytic gradient with respect to (x, y, activity, background).
+        With the rate ``r_i = act * s(d_i) + bkg`` and ``s(d) = K exp(-mu d) / (4 pi d^2)``,
+        ``dL/dact = sum (k_i / r_i - 1) s_i``, ``dL/dbkg = sum (k_i / r_i - 1)`` and
+        ``dL/dx = sum (k_i / r_i - 1) act s_i (-mu - 2 / d_i) (x - x_i) / d_i`` (likewise for y).
+        :return: log-likelihood and gradient; -inf and a zero gradient outside the support
+        """
+        x, y, act, mu_bkg = lambda_params
+        if min(act, mu_bkg) < 0 or np.sqrt(x ** 2 + y ** 2) > MAX_SOURCE_DISTANCE:
+            return -np.inf, np.zeros(4)
+
+        near = self._near(x, y, act, mu_bkg)
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            if near is None:
+                dx, dy, counts = x - self.x, y - self.y, self.counts
+            else:
+                dx, dy, counts = x - self.x[near], y - self.y[near], self.counts[near]
+            dist = np.sqrt(dx ** 2 + dy ** 2)
+            unit_rate = source_count_rate(dist, 1.0)
+            count_rate = act * unit_rate + mu_bkg
+            residual = counts / count_rate - 1
+            radial = residual * act * unit_rate * (-get_mu_air() - 2 / dist) / dist
+            gradient = np.array([radial @ dx, radial @ dy, residual @ unit_rate, residual.sum()])
+            if near is None:
+                likelihood_log = np.dot(counts, np.log(count_rate)) - np.sum(count_rate) - self.log_factorial_sum
+            else:
+                # the measurements beyond the cutoff only see the background: sum (k_i / bkg - 1) over them
+                likelihood_log = self._near_log_likelihood(near, lambda_params)
+                gradient[3] += (self.counts_sum - counts.sum()) / mu_bkg - (self.counts.size - near.size)
+
+        if not np.isfinite(likelihood_log) or not np.isfinite(gradient).all():
+            return -np.inf, np.zeros(4)
+        return float(likelihood_log), gradient
+
+
+def prior_log(act, mu_bkg) -> float:
+    """
+    Closed-form log-density of the activity (Gamma) and background (Normal) priors.
+    Equivalent to ``gamma.logpdf`` + ``norm.logpdf`` without the scipy.stats call overhead.
+    """
+    if act <= 0 or mu_bkg < 0:
         return -np.inf
 
-    if np.sqrt(x ** 2 + y ** 2) > 2000:
+    scaled_act = act / SCALE
+    log_prior = (ACTIVITY_PRIOR_SHAPE - 1) * math.log(scaled_act) - scaled_act / ACTIVITY_PRIOR_SCALE + _ACTIVITY_PRIOR_NORM
+    log_prior += -0.5 * ((mu_bkg - BKG_PRIOR_LOC) / BKG_PRIOR_SCALE) ** 2 + _BKG_PRIOR_NORM
+
+    return log_prior
+
+
+def prior_log_batch(act: np.ndarray, mu_bkg: np.ndarray | float) -> np.ndarray:
+    """
+    Vectorised ``prior_log``: invalid activity or background values are masked to -inf.
+    """
+    act, mu_bkg = np.broadcast_arrays(np.asarray(act, dtype=np.float64), np.asarray(mu_bkg, dtype=np.float64))
+    valid = (act > 0) & (mu_bkg >= 0)
+    scaled_act = np.where(valid, act, 1.0) / SCALE
+    log_prior = (ACTIVITY_PRIOR_SHAPE - 1) * np.log(scaled_act) - scaled_act / ACTIVITY_PRIOR_SCALE + _ACTIVITY_PRIOR_NORM
+    log_prior += -0.5 * ((mu_bkg - BKG_PRIOR_LOC) / BKG_PRIOR_SCALE) ** 2 + _BKG_PRIOR_NORM
+    return np.where(valid, log_prior, -np.inf)
+
+
+def posterior_log(likelihood: PoissonLikelihood, lambda_params: np.ndarray) -> float:
+    """
+    Synchronous log-posterior used inside the samplers' hot loops.
+    """
+    prior = prior_log(act=lambda_params[2], mu_bkg=BKG_COUNT_RATE)
+    if prior == -np.inf:
         return -np.inf
+    return prior + likelihood.log_likelihood(lambda_params)
+
+
+def posterior_log_gradient(likelihood: PoissonLikelihood, lambda_params: np.ndarray) -> tuple[float, np.ndarray]:
+    """
+    ``posterior_log`` and its gradient with respect to (x, y, activity, background).
+    """
+    act = lambda_params[2]
+    prior = prior_log(act=act, mu_bkg=BKG_COUNT_RATE)
+    if prior == -np.inf:
+        return -np.inf, np.zeros(4)
+    likelihood_log, gradient = likelihood.log_likelihood_gradient(lambda_params)
+    gradient[2] += (ACTIVITY_PRIOR_SHAPE - 1) / act - 1 / (SCALE * ACTIVITY_PRIOR_SCALE)
+    return prior + likelihood_log, gradient
+
+
+def to_unconstrained(lambda_params: np.ndarray) -> np.ndarray:
+    """
+    Map (x, y, activity, background) to (x, y, log activity, log background); non-positive activity
+    and background are clipped to 1e-3 first.
+    """
+    lambda_params = np.asarray(lambda_params, dtype=np.float64)
+    return np.concatenate([lambda_params[..., :2], np.log(np.maximum(lambda_params[..., 2:], 1e-3))], axis=-1)
+
 
-    count_rate = mean_count_rate(data["x"], data["y"], x, y, act, mu_bkg)
+def to_constrained(position: np.ndarray) -> np.ndarray:
+    """
+    Inverse of ``to_unconstrained``.
+    """
+    position = np.asarray(position, dtype=np.float64)
+    return np.concatenate([position[..., :2], np.exp(position[..., 2:])], axis=-1)
 
-    distro = poisson.pmf(data['pois_data'], mu=count_rate)
-    distro = np.nan_to_num(distro)
-    likelihood_log = np.sum(np.log(np.maximum(distro, 1e-323)))
 
-    return likelihood_log
+def unconstrained_posterior_log_gradient(likelihood: PoissonLikelihood, position: np.ndarray) -> tuple[float, np.ndarray]:
+    """
+    Log-density and gradient of (x, y, log activity, log background) under the posterior, the log-Jacobian
+    of the transform included; -inf and a zero gradient outside the support.
+    """
+    if not np.isfinite(position).all() or np.abs(position[2:]).max() > 600:
+        return -np.inf, np.zeros(4)
+    activity, background = math.exp(position[2]), math.exp(position[3])
+    log_posterior, gradient = posterior_log_gradient(likelihood, np.array([position[0], position[1], activity, background]))
+    if not math.isfinite(log_posterior):
+        return -np.inf, np.zeros(4)
+    gradient[2] = gradient[2] * activity + 1
+    gradient[3] = gradient[3] * background + 1
+    return log_posterior + position[2] + position[3], gradient
+
+
+def posterior_log_batch(likelihood: PoissonLikelihood, lambda_params: np.ndarray) -> np.ndarray:
+    """
+    Log-posterior of an array of parameter vectors of shape (W, 4).
+    """
+    lambda_params = np.asarray(lambda_params, dtype=np.float64)
+    prior = prior_log_batch(lambda_params[:, 2], BKG_COUNT_RATE)
+    posterior = np.full(prior.shape, -np.inf)
+    finite = np.isfinite(prior)
+    if finite.any():
+        posterior[finite] = prior[finite] + likelihood.log_likelihood_batch(lambda_params[finite])
+    return posterior
+
+
+async def calculate_prior_log(act, mu_bkg) -> float:
+    return prior_log(act, mu_bkg)
+
+async def calculate_likelihood_log(lambda_params: np.ndarray, data: pd.DataFrame | PoissonLikelihood) -> float:
+    if not isinstance(data, PoissonLikelihood):
+        data = PoissonLikelihood.from_dataframe(data)
+    return data.log_likelihood(lambda_params)
 
 
-async def calculate_posterior_log(data: pd.DataFrame, lambda_params: np.ndarray) -> float:
+async def calculate_posterior_log(data: pd.DataFrame | PoissonLikelihood, lambda_params: np.ndarray) -> float:
     activity = lambda_params[2]
     prior = await calculate_prior_log(act=activity, mu_bkg=BKG_COUNT_RATE)
     likelihood = await calculate_likelihood_log(lambda_params, data=data)
@@ -0,0 +1,227 @@
+import numpy as np
+
+from scipy.optimize import minimize
+from scipy.special import logsumexp
+from src.analytics.diagnostics import PARAM_NAMES
+from src.analytics.distributions import (
+    PoissonLikelihood,
+    posterior_log_batch,
+    to_constrained,
+    to_unconstrained,
+    unconstrained_posterior_log_gradient,
+)
+from src.config import MAP_PEAKS, MAP_DISTANCES, MAP_ACTIVITIES, MAP_STARTS
+
+SCREEN_MEMORY_MB = 64  # peak size of the candidate screening rate matrix
+
+
+def candidate_starts(
+        likelihood: PoissonLikelihood,
+        peaks: int = MAP_PEAKS,
+        distances: tuple[float, ...] = MAP_DISTANCES,
+        activities: tuple[float, ...] = MAP_ACTIVITIES,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Candidate source parameters on both sides of the track: around each of the ``peaks`` highest-count
+    measurement points (at least 20 m apart), at every distance along the local normal of the track
+    and with every activity; the background is the median count rate.
+    :return: candidates of shape (C, 4) and the side of the track (-1 or 1) of every candidate
+    """
+    spaced = []
+    for index in np.argsort(likelihood.counts)[::-1][:50 * peaks]:
+        if all((likelihood.x[index] - likelihood.x[i]) ** 2 + (likelihood.y[index] - likelihood.y[i]) ** 2 >= 400 for i in spaced):
+            spaced.append(index)
+            if len(spaced) == peaks:
+                break
+    spaced = np.array(spaced)
+
+    previous, following = np.maximum(spaced - 1, 0), np.minimum(spaced + 1, len(likelihood) - 1)
+    tangent = np.stack([likelihood.x[following] - likelihood.x[previous], likelihood.y[following] - likelihood.y[previous]], axis=1)
+    length = np.linalg.norm(tangent, axis=1, keepdims=True)
+    normal = np.where(length > 0, np.stack([-tangent[:, 1], tangent[:, 0]], axis=1) / np.where(length > 0, length, 1), [0.0, 1.0])
+
+    side = np.array([-1.0, 1.0])
+    peak_grid, side_grid, distance_grid, activity_grid = np.meshgrid(
+        np.arange(len(spaced)), side, np.asarray(distances, dtype=np.float64), np.asarray(activities, dtype=np.float64),
+        indexing="ij",
+    )
+    peak_grid, side_grid, distance_grid, activity_grid = (a.ravel() for a in (peak_grid, side_grid, distance_grid, activity_grid))
+    offset = (side_grid * distance_grid)[:, np.newaxis] * normal[peak_grid]
+    candidates = np.empty((peak_grid.size, 4))
+    candidates[:, 0] = likelihood.x[spaced[peak_grid]] + offset[:, 0]
+    candidates[:, 1] = likelihood.y[spaced[peak_grid]] + offset[:, 1]
+    candidates[:, 2] = activity_grid
+    candidates[:, 3] = max(float(np.median(likelihood.counts)), 0.1)
+    return candidates, side_grid
+
+
+def screen(likelihood: PoissonLikelihood, candidates: np.ndarray, max_memory_mb: float = SCREEN_MEMORY_MB) -> np.ndarray:
+    """
+    Log-posterior of every candidate, evaluated in batches whose rate matrix stays within ``max_memory_mb``.
+    """
+    rows = max(1, int(max_memory_mb * 2 ** 20 / (8 * 3 * max(len(likelihood), 1))))
+    return np.concatenate([posterior_log_batch(likelihood, candidates[i:i + rows]) for i in range(0, len(candidates), rows)])
+
+
+def _objective(position: np.ndarray, likelihood: PoissonLikelihood) -> tuple[float, np.ndarray]:
+    log_posterior, gradient = unconstrained_posterior_log_gradient(likelihood, position)
+    if not np.isfinite(log_posterior):
+        return 1e300, np.zeros(4)
+    return -log_posterior, -gradient
+
+
+def hessian(likelihood: PoissonLikelihood, position: np.ndarray, step: float = 1e-4) -> np.ndarray:
+    """
+    Hessian of the unconstrained log-posterior by central differences of the analytic gradient.
+    """
+    columns = []
+    for j in range(4):
+        h = step * max(1.0, abs(position[j]))
+        shift = np.zeros(4)
+        shift[j] = h
+        columns.append((unconstrained_posterior_log_gradient(likelihood, position + shift)[1]
+                        - unconstrained_posterior_log_gradient(likelihood, position - shift)[1]) / (2 * h))
+    matrix = np.stack(columns, axis=1)
+    return 0.5 * (matrix + matrix.T)
+
+
+def _covariance(negative_hessian: np.ndarray) -> np.ndarray:
+    """
+    Inverse of the negative Hessian; eigenvalues that are not clearly positive (a saddle or flat direction)
+    are raised so that the covariance stays positive definite.
+    """
+    eigenvalues, eigenvectors = np.linalg.eigh(negative_hessian)
+    eigenvalues = np.maximum(eigenvalues, 1e-6 * max(eigenvalues.max(), 1e-6))
+    return (eigenvectors / eigenvalues) @ eigenvectors.T
+
+
+class LaplaceApproximation:
+    """
+    Mixture of Gaussians in (x, y, log activity, log background) centred on the posterior modes found by
+    ``laplace_approximation``, each with the inverse negative Hessian as covariance and a weight
+    proportional to its Laplace estimate of the posterior mass.
+    """
+
+    def __init__(self, modes: np.ndarray, covariances: np.ndarray, log_posteriors: np.ndarray):
+        order = np.argsort(log_posteriors)[::-1]
+        self.modes = modes[order]
+        self.covariances = covariances[order]
+        self.log_posteriors = log_posteriors[order]
+        log_mass = self.log_posteriors + 0.5 * np.linalg.slogdet(self.covariances)[1]
+        self.weights = np.exp(log_mass - logsumexp(log_mass))
+
+    @property
+    def map_params(self) -> np.ndarray:
+        """
+        Highest mode as (x, y, activity, background).
+        """
+        return to_constrained(self.modes[0])
+
+    @property
+    def proposal_covariance(self) -> np.ndarray:
+        """
+        Covariance of the highest mode in (x, y, activity, background), through the Jacobian of the log transform.
+        """
+        jacobian = np.concatenate([[1.0, 1.0], np.exp(self.modes[0, 2:])])
+        return self.covariances[0] * np.outer(jacobian, jacobian)
+
+    @property
+    def inverse_mass(self) -> np.ndarray:
+        """
+        Variances of the highest mode in the unconstrained space, a starting mass matrix for NUTS.
+        """
+        return np.diag(self.covariances[0]).copy()
+
+    def sample(self, n: int, rng: np.random.Generator) -> np.ndarray:
+        """
+        Independent draws from the mixture as (x, y, activity, background).
+        :return: array of shape (n, 4)
+        """
+        components = rng.choice(len(self.weights), size=n, p=self.weights)
+        draws = np.empty((n, 4))
+        for k in range(len(self.weights)):
+            chosen = components == k
+            draws[chosen] = rng.multivariate_normal(self.modes[k], self.covariances[k], size=int(chosen.sum()))
+        return to_constrained(draws)
+
+    def summary(self) -> list[dict]:
+        """
+        Weight, MAP and Laplace standard deviations (on the log scale for activity and background) of every mode.
+        """
+        return [
+            {
+                "weight": float(weight),
+                "log_posterior": float(log_posterior),
+                "map": {name: float(value) for name, value in zip(PARAM_NAMES, to_constrained(mode))},
+                "sd": {name: float(value) for name, value in zip(
+                    ("x", "y", "log_activity", "log_background"), np.sqrt(np.diag(covariance))
+                )},
+            }
+            for weight, log_posterior, mode, covariance in zip(self.weights, self.log_posteriors, self.modes, self.covariances)
+        ]
+
+
+def _newton(likelihood: PoissonLikelihood, position: np.ndarray, log_posterior: float, steps: int = 20) -> tuple[np.ndarray, float, np.ndarray]:
+    """
+    Polish an optimum with backtracking Newton steps, which converge where L-BFGS stalls on the
+    activity-distance ridge or because the parameter scales differ by orders of magnitude (metres against
+    log background), and return its Laplace covariance.
+    """
+    covariance = _covariance(-hessian(likelihood, position))
+    for _ in range(steps):
+        direction = covariance @ unconstrained_posterior_log_gradient(likelihood, position)[1]
+        for shrink in 0.5 ** np.arange(10):
+            candidate = position + shrink * direction
+            candidate_log = unconstrained_posterior_log_gradient(likelihood, candidate)[0]
+            if candidate_log > log_posterior:
+                break
+        else:
+            break
+        improvement = candidate_log - log_posterior
+        position, log_posterior = candidate, candidate_log
+        covariance = _covariance(-hessian(likelihood, position))
+        if improvement < 1e-8:
+            break
+    return position, log_posterior, covariance
+
+
+class MapSearchFailed(ValueError):
+    """
+    No start of the multi-start MAP search reached a finite optimum.
+    """
+
+
+def laplace_approximation(likelihood: PoissonLikelihood, starts: int = MAP_STARTS) -> LaplaceApproximation:
+    """
+    Multi-start MAP search: the candidates of ``candidate_starts`` are screened in vectorised batches,
+    the best ``starts / 2`` on each side of the track are refined by L-BFGS with the analytic gradient in the
+    unconstrained space and polished by Newton steps, and optima more than one standard deviation
+    (Mahalanobis) apart become the modes of the Laplace approximation.
+    :raises MapSearchFailed: if no candidate has a finite posterior or no optimisation converges
+    """
+    candidates, side = candidate_starts(likelihood)
+    screened = screen(likelihood, candidates)
+    chosen = []
+    for s in (-1.0, 1.0):
+        on_side = np.flatnonzero((side == s) & np.isfinite(screened))
+        chosen += list(on_side[np.argsort(screened[on_side])[::-1][:max(1, starts // 2)]])
+    if not chosen:
+        raise MapSearchFailed("No candidate source position has a finite posterior")
+
+    optima = []
+    for start in to_unconstrained(candidates[chosen]):
+        result = minimize(_objective, start, args=(likelihood,), jac=True, method="L-BFGS-B")
+        if result.fun < 1e300:
+            optima.append(_newton(likelihood, result.x, -result.fun))
+    if not optima:
+        raise MapSearchFailed("The MAP optimisation did not converge from any start")
+
+    modes, log_posteriors, covariances = [], [], []
+    for position, log_posterior, covariance in sorted(optima, key=lambda optimum: -optimum[1]):
+        precision = np.linalg.inv(covariance)
+        if any((position - mode) @ precision @ (position - mode) < 1.0 for mode in modes):
+            continue
+        modes.append(position)
+        log_posteriors.append(log_posterior)
+        covariances.append(covariance)
+    return LaplaceApproximation(np.stack(modes), np.stack(covariances), np.array(log_posteriors))
@@ -0,0 +1,419 @@
+import numpy as np
+
+from dataclasses import dataclass
+from scipy.spatial import cKDTree
+from scipy.special import gammaln, logsumexp
+from src.analytics.diagnostics import PARAM_NAMES
+from src.analytics.distributions import MAX_SOURCE_DISTANCE, prior_log_batch
+from src.config import BKG_COUNT_RATE, PF_CELL_SIZE, PF_MAX_MEMORY_MB, PF_OPENING, PF_PARTICLES, get_mu_air
+from src.utils import source_count_rate
+
+
+def _row_chunk(columns: int, max_memory_mb: float, arrays: int = 4) -> int:
+    """
+    Number of rows of a (rows x columns) float64 evaluation that keeps ``arrays`` work arrays under ``max_memory_mb``.
+    """
+    return max(1, int(max_memory_mb * 2 ** 20 // (arrays * 8 * max(columns, 1))))
+
+
+def _ess(log_weights: np.ndarray) -> float:
+    log_weights = log_weights - logsumexp(log_weights)
+    return float(1 / np.sum(np.exp(2 * log_weights)))
+
+
+@dataclass(frozen=True)
+class CellLevel:
+    """
+    Cells of one level of ``MeasurementCells`` with the sufficient statistics of their measurements.
+    """
+    size: float  # side of the cells in meters
+    n: np.ndarray  # weighted number of measurements
+    k: np.ndarray  # weighted total counts
+    centroids: np.ndarray  # weighted centroids, of shape (2, cells)
+    k_first: np.ndarray  # count-weighted first moments around the centroid, of shape (2, cells)
+    n_second: np.ndarray  # weighted second moments (xx, xy, yy) around the centroid, of shape (3, cells)
+    k_second: np.ndarray  # count-weighted second moments (xx, xy, yy) around the centroid, of shape (3, cells)
+    children: np.ndarray  # index of the first sub-cell, or of the first measurement on the finest level
+    child_counts: np.ndarray  # number of sub-cells, or of measurements on the finest level
+
+    def __len__(self) -> int:
+        return self.n.size
+
+
+class MeasurementCells:
+    """
+    Measurements of the stream aggregated on nested square grids for the rejuvenation moves.
+
+    The finest cells have a side of ``cell_size``; every coarser level doubles it, up to at most ``top_cells`` cells.
+    Every cell keeps the sufficient statistics of its measurements: their (weighted) number ``n`` and total
+    counts ``K``, their centroid ``c`` and their first and second moments around it. The count rate only
+    depends on the distance to the source, so a cell far enough from the source contributes its second-order
+    Taylor expansion around the centroid, ``K log r(c) + grad(log r) . m_K + H(log r) : S_K / 2 - n r(c) - H(r) : S_n / 2``,
+    with ``m_K`` the count-weighted first moment and ``S_K``, ``S_n`` the count- and number-weighted second moments.
+    Starting from the coarsest level, a cell closer to the source than ``opening`` times its side is split into its
+    sub-cells, and a finest cell into its measurements, which are evaluated exactly. All particles are evaluated
+    at once on flat arrays of (particle, cell) pairs, and the number of pairs per particle grows with the
+    logarithm of the length of the stream and its local density only.
+    Measurement weights are the likelihood exponents, e.g. the tempering exponent of a batch being assimilated;
+    the ``log(k!)`` terms are left out.
+    """
+
+    def __init__(
+            self,
+            x: np.ndarray,
+            y: np.ndarray,
+            counts: np.ndarray,
+            weights: np.ndarray,
+            cell_size: float = PF_CELL_SIZE,
+            opening: float = PF_OPENING,
+            top_cells: int = 16,
+            max_memory_mb: float = PF_MAX_MEMORY_MB,
+    ):
+        keys = [np.floor(np.column_stack([x, y]) / cell_size).astype(np.int64)]
+        while np.prod(keys[-1].max(axis=0) - keys[-1].min(axis=0) + 1) > top_cells:
+            keys.append(keys[-1] // 2)
+        # sorted by the cells of every level, coarsest first, so the measurements and sub-cells of a cell are contiguous
+        order = np.lexsort([key[:, axis] for key in keys for axis in (1, 0)])
+        self.x, self.y, self.counts, self.weights = x[order], y[order], counts[order], weights[order]
+        self.opening = opening
+        self.max_memory_mb = max_memory_mb
+
+        self.levels = []
+        finer_starts = None
+        for level, key in enumerate(keys):
+            key = key[order]
+            new = np.ones(len(key), dtype=bool)
+            new[1:] = (key[1:] != key[:-1]).any(axis=1)
+            starts = np.flatnonzero(new)
+            ends = np.append(starts[1:], len(key))
+            if finer_starts is None:
+                children, child_counts = starts, ends - starts
+            else:
+                children = np.searchsorted(finer_starts, starts)
+                child_counts = np.searchsorted(finer_starts, ends) - children
+            self.levels.append(self._level(np.cumsum(new) - 1, cell_size * 2 ** level, children, child_counts))
+            finer_starts = starts
+        self.tree = cKDTree(self.centroids)
+
+    def _level(self, cell: np.ndarray, size: float, children: np.ndarray, child_counts: np.ndarray) -> CellLevel:
+        weighted_counts = self.weights * self.counts
+        n = np.bincount(cell, weights=self.weights)
+        centroids = np.vstack([
+            np.bincount(cell, weights=self.weights * self.x),
+            np.bincount(cell, weights=self.weights * self.y),
+        ]) / np.where(n > 0, n, 1)
+        dx, dy = self.x - centroids[0, cell], self.y - centroids[1, cell]
+        return CellLevel(
+            size=size,
+            n=n,
+            k=np.bincount(cell, weights=weighted_counts),
+            centroids=centroids,
+            k_first=np.vstack([np.bincount(cell, weights=weighted_counts * d) for d in (dx, dy)]),
+            n_second=np.vstack([np.bincount(cell, weights=self.weights * d) for d in (dx * dx, dx * dy, dy * dy)]),
+            k_second=np.vstack([np.bincount(cell, weights=weighted_counts * d) for d in (dx * dx, dx * dy, dy * dy)]),
+            children=children,
+            child_counts=child_counts,
+        )
+
+    @property
+    def centroids(self) -> np.ndarray:
+        """
+        Centroids of the finest cells, of shape (cells, 2).
+        """
+        return self.levels[0].centroids.T
+
+    def log_likelihood(self, params: np.ndarray) -> np.ndarray:
+        """
+        :param params: array of shape (P, 4) with valid parameters
+        :return: weighted log-likelihood of every parameter vector, without the ``log(k!)`` terms
+        """
+        out = np.empty(len(params))
+        # about 4 * opening cells per level are evaluated around every particle
+        step = _row_chunk(len(self.levels[-1]) + int(4 * self.opening) * len(self.levels), self.max_memory_mb, arrays=16)
+        for start in range(0, len(params), step):
+            out[start:start + step] = self._evaluate(params[start:start + step])
+        return out
+
+    @staticmethod
+    def _split(rows: np.ndarray, cells: np.ndarray, children: np.ndarray, child_counts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Replace every (particle, cell) pair by the pairs of the particle with the children of the cell.
+        """
+        counts = child_counts[cells]
+        first = np.repeat(children[cells] - np.cumsum(counts) + counts, counts)
+        return np.repeat(rows, counts), first + np.arange(counts.sum())
+
+    @staticmethod
+    def _expansion(level: CellLevel, cells: np.ndarray, dx: np.ndarray, dy: np.ndarray, dist: np.ndarray, act: np.ndarray, bkg: np.ndarray) -> np.ndarray:
+        """
+        Second-order expansion of the log-likelihood of the cells around their centroids.
+        With ``s(d) = act K exp(-mu d) / (4 pi d^2)``, ``s' = -s (mu + 2 / d)`` and ``s'' = s ((mu + 2 / d)^2 + 2 / d^2)``;
+        the Hessian of a function ``f(d)`` of the distance is ``f'' u u^T + f' / d (I - u u^T)``.
+        """
+        ux, uy = dx / dist, dy / dist
+        source_rate = source_count_rate(dist, act)
+        decay = get_mu_air() + 2 / dist
+        rate = source_rate + bkg
+        rate_first = -source_rate * decay
+        rate_second = source_rate * (decay ** 2 + 2 / dist ** 2)
+        log_first = rate_first / rate
+        log_second = rate_second / rate - log_first ** 2
+
+        def contract(second: np.ndarray, radial: np.ndarray, tangential: np.ndarray) -> np.ndarray:
+            xx, xy, yy = second[0, cells], second[1, cells], second[2, cells]
+            along = ux * ux * xx + 2 * ux * uy * xy + uy * uy * yy
+            return radial * along + tangential * (xx + yy - along)
+
+        return (
+            level.k[cells] * np.log(rate) - level.n[cells] * rate
+            + log_first * (ux * level.k_first[0, cells] + uy * level.k_first[1, cells])
+            + 0.5 * contract(level.k_second, log_second, log_first / dist)
+            - 0.5 * contract(level.n_second, rate_second, rate_first / dist)
+        )
+
+    def _evaluate(self, params: np.ndarray) -> np.ndarray:
+        x, y, act, bkg = np.ascontiguousarray(params.T)
+        log_likelihood = np.zeros(len(params))
+        top = len(self.levels[-1])
+        rows, cells = np.repeat(np.arange(len(params)), top), np.tile(np.arange(top), len(params))
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            for level in reversed(self.levels):
+                dx = level.centroids[0, cells] - x[rows]
+                dy = level.centroids[1, cells] - y[rows]
+                dist = np.hypot(dx, dy)
+                near = dist < self.opening * level.size
+                far = ~near
+                far_rows = rows[far]
+                terms = self._expansion(level, cells[far], dx[far], dy[far], dist[far], act[far_rows], bkg[far_rows])
+                log_likelihood += np.bincount(far_rows, weights=terms, minlength=len(params))
+                rows, cells = self._split(rows[near], cells[near], level.children, level.child_counts)
+
+            # the measurements of the finest cells close to the source
+            dist = np.hypot(self.x[cells] - x[rows], self.y[cells] - y[rows])
+            rate = source_count_rate(dist, act[rows]) + bkg[rows]
+            terms = self.weights[cells] * (self.counts[cells] * np.log(rate) - rate)
+            log_likelihood += np.bincount(rows, weights=terms, minlength=len(params))
+        log_likelihood[np.isnan(log_likelihood)] = -np.inf
+        return log_likelihood
+
+
+class ParticleFilter:
+    """
+    Sequential Monte Carlo estimate of the source parameters for measurements arriving one by one.
+
+    Particles are drawn from a wide proposal (uniform position around the road, log-uniform activity,
+    uniform background) with importance weights correcting to the model prior. Each message reweights all
+    particles in one broadcast. A message that would drop the effective sample size below ``ess_threshold``
+    of its current value, e.g. a long batch, is assimilated in tempered stages: its likelihood exponent is
+    raised as far as the ESS allows, and the population is resampled and rejuvenated between the stages.
+    After the last stage the population is resampled when the ESS drops below ``ess_threshold * particles``.
+
+    The rejuvenation moves (random walk and mirror jumps) target the posterior of every measurement so far,
+    evaluated on the ``MeasurementCells`` aggregates. The random-walk covariance follows the particles but
+    never shrinks below ``min_scale`` times the width of the initial proposal.
+    """
+
+    def __init__(
+            self,
+            particles: int = PF_PARTICLES,
+            x_range: tuple[float, float] = (-300, 300),
+            y_extent: float = 200,
+            activity_range: tuple[float, float] = (1, 10000),
+            bkg_max: float = 50,
+            ess_threshold: float = 0.5,
+            rejuvenation_steps: int = 2,
+            min_scale: float = 1e-3,
+            seed: int | None = None,
+    ):
+        self.rng = np.random.default_rng(seed)
+        self.particles = particles
+        self.ess_threshold = ess_threshold
+        self.rejuvenation_steps = rejuvenation_steps
+        self.min_step = min_scale * np.array([x_range[1] - x_range[0], 2 * y_extent, activity_range[1] - activity_range[0], bkg_max])
+
+        log_act_min, log_act_max = np.log(activity_range)
+        activity = np.exp(self.rng.uniform(log_act_min, log_act_max, particles))
+        self.state = np.column_stack([
+            self.rng.uniform(*x_range, particles),
+            self.rng.uniform(-y_extent, y_extent, particles),
+            activity,
+            self.rng.uniform(0, bkg_max, particles),
+        ])
+        # importance correction from the log-uniform activity proposal to the activity prior
+        self.log_weights = prior_log_batch(activity, BKG_COUNT_RATE) + np.log(activity)
+        self.log_weights -= logsumexp(self.log_weights)
+
+        self._x = np.empty(1024)
+        self._y = np.empty(1024)
+        self._counts = np.empty(1024)
+        self.n_points = 0
+
+    @property
+    def ess(self) -> float:
+        return float(1 / np.sum(np.exp(2 * self.log_weights)))
+
+    def _append(self, x: np.ndarray, y: np.ndarray, counts: np.ndarray) -> None:
+        end = self.n_points + x.size
+        if end > self._x.size:
+            capacity = max(2 * self._x.size, end)
+            self._x, self._y, self._counts = (np.resize(a, capacity) for a in (self._x, self._y, self._counts))
+        self._x[self.n_points:end] = x
+        self._y[self.n_points:end] = y
+        self._counts[self.n_points:end] = counts
+        self.n_points = end
+
+    def _log_likelihood(self, x: np.ndarray, y: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        """
+        Exact log-likelihood of the measurements for every particle, broadcast in chunks of particles.
+        """
+        out = np.empty(self.particles)
+        step = _row_chunk(x.size, PF_MAX_MEMORY_MB)
+        log_factorial = gammaln(counts + 1).sum()
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            for start in range(0, self.particles, step):
+                state = self.state[start:start + step]
+                dist = np.sqrt((x - state[:, 0, np.newaxis]) ** 2 + (y - state[:, 1, np.newaxis]) ** 2)
+                rate = source_count_rate(dist, state[:, 2, np.newaxis]) + state[:, 3, np.newaxis]
+                out[start:start + step] = np.log(rate) @ counts - rate.sum(axis=1) - log_factorial
+        out[np.isnan(out)] = -np.inf
+        return out
+
+    def _temper(self, increment: np.ndarray, remaining: float) -> float:
+        """
+        Largest share of the ``remaining`` likelihood exponent that keeps the ESS at ``ess_threshold`` of its
+        current value among the particles that can explain the message, found by bisection.
+        """
+        def ess(exponent: float) -> float:
+            return _ess(self.log_weights + exponent * increment)
+
+        target = self.ess_threshold * _ess(np.where(np.isfinite(increment), self.log_weights, -np.inf))
+        if ess(remaining) >= target:
+            return remaining
+        low, high = 0.0, remaining
+        for _ in range(50):
+            middle = (low + high) / 2
+            if ess(middle) >= target:
+                low = middle
+            else:
+                high = middle
+        return low if low > 0 else high
+
+    def _reweight(self, increment: np.ndarray) -> None:
+        log_weights = self.log_weights + increment
+        self.log_weights = log_weights - logsumexp(log_weights)
+
+    def _resample(self) -> None:
+        """
+        Systematic resampling.
+        """
+        positions = (self.rng.random() + np.arange(self.particles)) / self.particles
+        cumulative = np.cumsum(np.exp(self.log_weights))
+        cumulative[-1] = 1.0
+        self.state = self.state[np.searchsorted(cumulative, positions)]
+        self.log_weights = np.full(self.particles, -np.log(self.particles))
+
+    def _cells(self, x: np.ndarray, y: np.ndarray, counts: np.ndarray, temperature: float) -> MeasurementCells:
+        """
+        Cell aggregates of the stored measurements and of the message being assimilated at ``temperature``.
+        """
+        stored = slice(0, self.n_points)
+        return MeasurementCells(
+            np.concatenate([self._x[stored], x]),
+            np.concatenate([self._y[stored], y]),
+            np.concatenate([self._counts[stored], counts]),
+            np.concatenate([np.ones(self.n_points), np.full(x.size, temperature)]),
+        )
+
+    def _log_target(self, cells: MeasurementCells, params: np.ndarray) -> np.ndarray:
+        log_target = prior_log_batch(params[:, 2], BKG_COUNT_RATE)
+        log_target[(params[:, 3] < 0) | (np.hypot(params[:, 0], params[:, 1]) > MAX_SOURCE_DISTANCE)] = -np.inf
+        finite = np.isfinite(log_target)
+        log_target[finite] += cells.log_likelihood(params[finite])
+        return log_target
+
+    def _mirror(self, cells: MeasurementCells, state: np.ndarray) -> np.ndarray:
+        """
+        Positions mirrored through their closest cell, i.e. to the other side of the road.
+        """
+        closest = cells.tree.query(state[:, :2])[1]
+        return 2 * cells.centroids[closest] - state[:, :2]
+
+    def _rejuvenate(self, cells: MeasurementCells) -> None:
+        # resampling leaves many copies of the same particles
+        unique, inverse = np.unique(self.state, axis=0, return_inverse=True)
+        log_target = self._log_target(cells, unique)[inverse.ravel()]
+
+        # the spread is estimated with every position on the side of the road of the best particle,
+        # otherwise the two mirror modes of the position make the random walk far too wide
+        folded = self.state.copy()
+        mirrored = self._mirror(cells, self.state)
+        best = self.state[np.argmax(log_target), :2]
+        other_side = np.sum((mirrored - best) ** 2, axis=1) < np.sum((folded[:, :2] - best) ** 2, axis=1)
+        folded[other_side, :2] = mirrored[other_side]
+        scale = 2.38 ** 2 / 4 * np.cov(folded, rowvar=False) + np.diag(self.min_step ** 2)
+        cholesky = np.linalg.cholesky(scale)
+        for _ in range(self.rejuvenation_steps):
+            proposal = self.state + self.rng.standard_normal((self.particles, 4)) @ cholesky.T
+            log_target = self._metropolis_move(cells, proposal, log_target)
+
+        # mirror jumps keep both sides of the road populated
+        proposal = self.state.copy()
+        proposal[:, :2] = self._mirror(cells, self.state)
+        self._metropolis_move(cells, proposal, log_target)
+
+    def _metropolis_move(self, cells: MeasurementCells, proposal: np.ndarray, log_target: np.ndarray) -> np.ndarray:
+        proposal_log = self._log_target(cells, proposal)
+        with np.errstate(invalid="ignore"):
+            accept = np.log(self.rng.random(self.particles)) < proposal_log - log_target
+        self.state[accept] = proposal[accept]
+        log_target[accept] = proposal_log[accept]
+        return log_target
+
+    def update(self, x, y, counts) -> dict:
+        """
+        Assimilate one or several new measurements.
+        :param x: x coordinate(s) of the measurement(s)
+        :param y: y coordinate(s) of the measurement(s)
+        :param counts: measured counts
+        :raise ValueError: if the measurements are malformed or no particle explains them; the filter
+        is then left unchanged
+        :return: posterior summary after the update
+        """
+        x, y, counts = (np.atleast_1d(np.asarray(a, dtype=np.float64)) for a in (x, y, counts))
+        if x.ndim != 1 or not x.shape == y.shape == counts.shape:
+            raise ValueError("x, y and counts must be scalars or equally long lists")
+        if not x.size:
+            raise ValueError("x, y and counts must not be empty")
+        if not (np.isfinite(x).all() and np.isfinite(y).all() and np.isfinite(counts).all()):
+            raise ValueError("x, y and counts must be finite numbers")
+        if (counts < 0).any():
+            raise ValueError("counts must be non-negative")
+        increment = self._log_likelihood(x, y, counts)
+        if not np.isfinite(self.log_weights + increment).any():
+            raise ValueError("All particles have zero weight")
+
+        temperature, resampled = 0.0, False
+        while temperature < 1:
+            step = self._temper(increment, 1 - temperature)
+            self._reweight(step * increment)
+            temperature = 1.0 if step == 1 - temperature else temperature + step
+            if temperature < 1 or self.ess < self.ess_threshold * self.particles:
+                self._resample()
+                self._rejuvenate(self._cells(x, y, counts, temperature))
+                resampled = True
+                if temperature < 1:
+                    increment = self._log_likelihood(x, y, counts)
+        self._append(x, y, counts)
+        return self.summary(resampled=resampled)
+
+    def summary(self, resampled: bool = False) -> dict:
+        weights = np.exp(self.log_weights)
+        mean = weights @ self.state
+        std = np.sqrt(weights @ (self.state - mean) ** 2)
+        return {
+            "n_points": self.n_points,
+            "ess": self.ess,
+            "resampled": resampled,
+            "mean": dict(zip(PARAM_NAMES, mean.tolist())),
+            "std": dict(zip(PARAM_NAMES, std.tolist())),
+        }
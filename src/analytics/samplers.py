@@ -0,0 +1,632 @@
+import math
+
+import numpy as np
+
+from abc import ABC, abstractmethod
+from time import perf_counter
+from typing import Callable
+from src.analytics.chain_store import ChainStore
+from src.analytics.convergence import ConvergenceMonitor
+from src.analytics.distributions import (
+    PoissonLikelihood,
+    posterior_log,
+    posterior_log_batch,
+    to_constrained,
+    to_unconstrained,
+    unconstrained_posterior_log_gradient,
+)
+from src.config import MCMC_BLOCK_SIZE, ENSEMBLE_WALKERS, NUTS_MAX_TREE_DEPTH, NUTS_TARGET_ACCEPTANCE
+from src.tools.logs import logger
+
+
+def initial_params(likelihood: PoissonLikelihood) -> np.ndarray:
+    """
+    Default starting point of a chain: the position of the highest count,
+    activity of 100 MBq and the mean count rate as background.
+    """
+    index = np.argmax(likelihood.counts)
+    return np.array([likelihood.x[index], likelihood.y[index], 100, np.mean(likelihood.counts)])
+
+
+class DenseChain:
+    """
+    Preallocated array of every visited state, the default destination of ``run``.
+    """
+
+    def __init__(self, shape: tuple[int, ...]):
+        self.data = np.empty(shape)
+        self.size = 0
+
+    def append(self, state: np.ndarray) -> None:
+        self.data[self.size] = state
+        self.size += 1
+
+
+class BaseSampler(ABC):
+    """
+    Common driver of the samplers: ``run`` advances the chain with ``step`` and handles the iteration cap,
+    the chain store, the convergence monitor, the progress callback and the sampling time.
+    """
+    state_shape: tuple[int, ...] = (4,)  # shape of the state returned by ``step``
+
+    @abstractmethod
+    def step(self) -> np.ndarray:
+        """
+        Advance the chain by one iteration.
+        :return: the new state, of shape ``state_shape``
+        """
+
+    def run(
+            self,
+            simnum: int,
+            callback: Callable[["BaseSampler", int], None] | None = None,
+            store: ChainStore | None = None,
+            monitor: ConvergenceMonitor | None = None,
+    ) -> np.ndarray | ChainStore:
+        """
+        Advance the chain by ``simnum`` iterations.
+        :param simnum: number of iterations
+        :param callback: optional hook called every 1000 iterations with the sampler and the number of
+        iterations done in this run
+        :param store: optional chain store the states are appended to instead of a dense array
+        :param monitor: optional convergence monitor of ``store``, checked every ``monitor.interval``
+        iterations; ``simnum`` is then only the upper bound of the run
+        :return: array of shape (simnum, *state_shape) with the visited states, or ``store``
+        """
+        start = perf_counter()
+        chain = store if store is not None else DenseChain((simnum, *self.state_shape))
+        done = 0
+        while done < simnum:
+            chain.append(self.step())
+            done += 1
+            if callback is not None and done % 1000 == 0:
+                callback(self, done)
+            if monitor is not None and done % monitor.interval == 0 and monitor.should_stop(done):
+                break
+        if monitor is not None:
+            monitor.finish(done)
+        self.seconds += perf_counter() - start
+        return store if store is not None else chain.data
+
+
+class MetropolisSampler(BaseSampler):
+    """
+    Adaptive random-walk Metropolis sampler for the source parameters (x, y, activity, background).
+
+    The log-posterior of the current state is carried between iterations and recomputed only for proposals.
+    Proposal noise and acceptance uniforms are drawn in blocks from a seeded ``np.random.Generator``,
+    and the Cholesky factor of the proposal covariance is refreshed only when the covariance adapts.
+    A ``proposal_covariance``, e.g. the Laplace covariance at the MAP, replaces the adaptive diagonal
+    covariance; only the scale ``sigma_mh`` then adapts. Calling ``run`` several times continues the same chain.
+    """
+
+    def __init__(
+            self,
+            likelihood: PoissonLikelihood,
+            init_params: np.ndarray,
+            seed: int | np.random.SeedSequence | None = None,
+            block_size: int = MCMC_BLOCK_SIZE,
+            sigma_mh: float = 0.01,
+            beta_sigma: float = 1e-4,
+            initial_sigma: float = 1000,
+            adapt_interval: int = 100,
+            reflect_interval: int = 1000,
+            target_acceptance: float = 0.24,
+            proposal_covariance: np.ndarray | None = None,
+    ):
+        self.likelihood = likelihood
+        self.rng = np.random.default_rng(seed)
+        self.block_size = block_size
+        self.sigma_mh = sigma_mh
+        self.beta_sigma = beta_sigma
+        self.adapt_interval = adapt_interval
+        self.reflect_interval = reflect_interval
+        self.target_acceptance = target_acceptance
+
+        self.state = np.array(init_params, dtype=np.float64)
+        self.log_posterior = posterior_log(likelihood, self.state)
+        self.adapt_covariance = proposal_covariance is None
+        if self.adapt_covariance:
+            self.sigma = np.diag(np.ones(4) * initial_sigma ** 2)
+        else:
+            self.sigma = np.array(proposal_covariance, dtype=np.float64)
+            self.sigma_mh = 2.38 / 2  # optimal random-walk scale 2.38 / sqrt(d) for d = 4
+        self.cholesky = np.linalg.cholesky(self.sigma)
+        self.estimated_mean = np.zeros(4)
+        self.estimated_var = np.zeros(4)
+
+        self.iteration = 0
+        self.accepted = 0
+        self.seconds = 0.0
+        self._window_accepted = 0
+        self._window_count = 0
+        self._noise = np.empty((block_size, 4))
+        self._log_uniforms = np.empty(block_size)
+        self._cursor = block_size
+
+    @property
+    def acceptance_rate(self) -> float:
+        return self.accepted / self.iteration if self.iteration else 0.0
+
+    @property
+    def health(self) -> dict[str, float]:
+        """
+        Iterations, sampling time, acceptance rate and adapted proposal scale of the chain so far.
+        """
+        return {
+            "iterations": self.iteration,
+            "seconds": self.seconds,
+            "acceptance_rate": self.acceptance_rate,
+            "sigma_mh": self.sigma_mh,
+        }
+
+    def _draw_block(self) -> None:
+        self._noise = self.rng.standard_normal((self.block_size, 4))
+        self._log_uniforms = np.log(self.rng.random(self.block_size))
+        self._cursor = 0
+
+    def _reflect(self, proposal: np.ndarray) -> None:
+        """
+        Mirror the proposal through the closest measurement point to let the chain jump
+        to the other side of the road.
+        """
+        closest = self.likelihood.closest(proposal[0], proposal[1])[0]
+        proposal[0] = 2 * self.likelihood.x[closest] - proposal[0]
+        proposal[1] = 2 * self.likelihood.y[closest] - proposal[1]
+
+    def _adapt(self) -> None:
+        i = self.iteration
+        if self.adapt_covariance:
+            self.sigma = np.diag(self.estimated_var) + np.eye(4) * self.beta_sigma
+            self.cholesky = np.linalg.cholesky(self.sigma)
+
+        if self._window_accepted / self._window_count < self.target_acceptance:
+            self.sigma_mh = max(0.95, (1 - 5 / math.sqrt(i))) * self.sigma_mh
+        else:
+            self.sigma_mh = min(1.05, 1 + 5 / math.sqrt(i)) * self.sigma_mh
+        self._window_accepted = 0
+        self._window_count = 0
+
+    def step(self) -> np.ndarray:
+        if self._cursor == self.block_size:
+            self._draw_block()
+
+        self.iteration += 1
+        self._window_count += 1
+        i = self.iteration
+
+        proposal = self.state + self.sigma_mh * (self.cholesky @ self._noise[self._cursor])
+        if i % self.reflect_interval == 0:
+            self._reflect(proposal)
+
+        proposal_log = posterior_log(self.likelihood, proposal)
+        if self._log_uniforms[self._cursor] < proposal_log - self.log_posterior:
+            self.state = proposal
+            self.log_posterior = proposal_log
+            self.accepted += 1
+            self._window_accepted += 1
+        self._cursor += 1
+
+        w = 1 / i
+        self.estimated_mean = (1 - w) * self.estimated_mean + w * self.state
+        self.estimated_var = (1 - w) * self.estimated_var + w * (self.state - self.estimated_mean) ** 2
+
+        if i % self.adapt_interval == 0:
+            self._adapt()
+
+        return self.state
+
+
+class EnsembleSampler(BaseSampler):
+    """
+    Affine-invariant ensemble sampler (Goodman & Weare stretch moves) with W walkers.
+
+    Walkers are split in two halves that are updated in turn, so every step evaluates the
+    posterior of half the ensemble in a single NumPy broadcast. Every ``reflect_interval`` steps
+    all walkers also propose a mirror jump through the closest measurement point, which lets
+    the ensemble reach the other side of the road. During the first ``tune`` steps walkers stuck
+    far below the best log-posterior are moved onto randomly chosen well-placed walkers.
+    """
+
+    def __init__(
+            self,
+            likelihood: PoissonLikelihood,
+            init_params: np.ndarray,
+            walkers: int = ENSEMBLE_WALKERS,
+            seed: int | np.random.SeedSequence | None = None,
+            stretch: float = 2.0,
+            reflect_interval: int = 100,
+            tune: int = 0,
+            straggler_threshold: float = 50.0,
+    ):
+        if walkers < 8 or walkers % 2:
+            raise ValueError("The number of walkers must be an even number of at least 8")
+
+        self.likelihood = likelihood
+        self.walkers = walkers
+        self.rng = np.random.default_rng(seed)
+        self.stretch = stretch
+        self.reflect_interval = reflect_interval
+        self.tune = tune
+        self.straggler_threshold = straggler_threshold
+
+        self.state = self._initial_ensemble(np.asarray(init_params, dtype=np.float64))
+        self.log_posterior = posterior_log_batch(likelihood, self.state)
+        self.iteration = 0
+        self.seconds = 0.0
+        self.accepted = np.zeros(walkers, dtype=np.int64)
+
+    @property
+    def state_shape(self) -> tuple[int, ...]:
+        return self.walkers, 4
+
+    @property
+    def acceptance_rate(self) -> float:
+        return float(self.accepted.mean() / self.iteration) if self.iteration else 0.0
+
+    @property
+    def health(self) -> dict[str, float]:
+        """
+        Steps, sampling time and mean acceptance rate of the walkers so far.
+        """
+        return {"iterations": self.iteration, "seconds": self.seconds, "acceptance_rate": self.acceptance_rate}
+
+    def _initial_ensemble(self, init_params: np.ndarray) -> np.ndarray:
+        """
+        Small ball of walkers around the starting point; walkers outside the support are redrawn.
+        """
+        scale = np.array([10.0, 30.0, 0.3, 0.1])
+        ensemble = np.empty((self.walkers, 4))
+        missing = np.arange(self.walkers)
+        for _ in range(100):
+            noise = self.rng.standard_normal((missing.size, 4)) * scale
+            candidates = np.empty((missing.size, 4))
+            candidates[:, :2] = init_params[:2] + noise[:, :2]
+            candidates[:, 2:] = init_params[2:] * np.exp(noise[:, 2:])
+            ensemble[missing] = candidates
+            missing = missing[~np.isfinite(posterior_log_batch(self.likelihood, candidates))]
+            if not missing.size:
+                break
+        return ensemble
+
+    def _stretch_move(self, active: np.ndarray, complement: np.ndarray) -> None:
+        n = active.size
+        z = ((self.stretch - 1) * self.rng.random(n) + 1) ** 2 / self.stretch
+        partners = self.state[complement[self.rng.integers(0, complement.size, n)]]
+        proposal = partners + z[:, np.newaxis] * (self.state[active] - partners)
+        proposal_log = posterior_log_batch(self.likelihood, proposal)
+        with np.errstate(invalid="ignore"):
+            log_ratio = 3 * np.log(z) + proposal_log - self.log_posterior[active]
+        accept = np.log(self.rng.random(n)) < log_ratio
+        self.state[active[accept]] = proposal[accept]
+        self.log_posterior[active[accept]] = proposal_log[accept]
+        self.accepted[active[accept]] += 1
+
+    def _reflect_move(self) -> None:
+        x, y = self.likelihood.x, self.likelihood.y
+        closest = self.likelihood.closest(self.state[:, 0], self.state[:, 1])
+        proposal = self.state.copy()
+        proposal[:, 0] = 2 * x[closest] - proposal[:, 0]
+        proposal[:, 1] = 2 * y[closest] - proposal[:, 1]
+        proposal_log = posterior_log_batch(self.likelihood, proposal)
+        with np.errstate(invalid="ignore"):
+            accept = np.log(self.rng.random(self.walkers)) < proposal_log - self.log_posterior
+        self.state[accept] = proposal[accept]
+        self.log_posterior[accept] = proposal_log[accept]
+
+    def _replace_stragglers(self) -> None:
+        stragglers = self.log_posterior < self.log_posterior.max() - self.straggler_threshold
+        if not stragglers.any():
+            return
+        donors = np.flatnonzero(~stragglers)
+        chosen = donors[self.rng.integers(0, donors.size, stragglers.sum())]
+        self.state[stragglers] = self.state[chosen]
+        self.log_posterior[stragglers] = self.log_posterior[chosen]
+
+    def step(self) -> np.ndarray:
+        self.iteration += 1
+        half = self.walkers // 2
+        first, second = np.arange(half), np.arange(half, self.walkers)
+        self._stretch_move(first, second)
+        self._stretch_move(second, first)
+        if self.iteration % self.reflect_interval == 0:
+            self._reflect_move()
+            if self.iteration <= self.tune:
+                self._replace_stragglers()
+        return self.state
+
+
+def adaptation_windows(tune: int, initial: int = 75, final: int = 50, base: int = 25) -> list[int]:
+    """
+    Iterations at which the mass matrix is re-estimated during ``tune`` warm-up iterations: after a fast
+    initial phase, slow windows of doubling length end with an update, followed by a final fast phase
+    (Stan's warm-up schedule; short warm-ups are split 15% / 75% / 10%).
+    """
+    if tune < 20:
+        return []
+    if tune < initial + final + base:
+        initial, final = int(0.15 * tune), int(0.1 * tune)
+        base = tune - initial - final
+    ends = []
+    start, size = initial, base
+    while start + size <= tune - final:
+        # a window that would leave less than twice its length before the final phase absorbs the rest
+        end = start + size if start + 3 * size <= tune - final else tune - final
+        ends.append(end)
+        start, size = end, 2 * size
+    return ends
+
+
+class NutsSampler(BaseSampler):
+    """
+    No-U-Turn Hamiltonian sampler (Hoffman & Gelman 2014) with analytic gradients of the log-posterior.
+
+    Activity and background are sampled as logarithms, so the positivity constraints hold by construction
+    (the log-Jacobian is added to the target). During the first ``tune`` iterations the step size is tuned
+    by dual averaging towards ``target_acceptance`` and a diagonal mass matrix is estimated from the
+    unconstrained draws in windows of doubling length. After the warm-up, every ``reflect_interval``
+    iterations a Metropolis mirror jump through the closest measurement point lets the chain reach the
+    other side of the road, which the gradient moves alone cannot cross; it is held back during the
+    warm-up so that the mass matrix reflects the width of a single mode. An ``inverse_mass``, e.g. the
+    Laplace variances at the MAP, replaces the identity as the starting mass matrix.
+    """
+
+    def __init__(
+            self,
+            likelihood: PoissonLikelihood,
+            init_params: np.ndarray,
+            seed: int | np.random.SeedSequence | None = None,
+            tune: int = 0,
+            target_acceptance: float = NUTS_TARGET_ACCEPTANCE,
+            max_tree_depth: int = NUTS_MAX_TREE_DEPTH,
+            reflect_interval: int = 1,
+            max_energy_error: float = 1000.0,
+            inverse_mass: np.ndarray | None = None,
+    ):
+        self.likelihood = likelihood
+        self.rng = np.random.default_rng(seed)
+        self.tune = tune
+        self.target_acceptance = target_acceptance
+        self.max_tree_depth = max_tree_depth
+        self.reflect_interval = reflect_interval
+        self.max_energy_error = max_energy_error
+
+        self.position = to_unconstrained(init_params)
+        self.log_posterior, self.gradient = self._evaluate(self.position)
+        self.inverse_mass = np.ones(4) if inverse_mass is None else np.array(inverse_mass, dtype=np.float64)
+
+        self.iteration = 0
+        self.seconds = 0.0
+        self.acceptance_sum = 0.0
+        self.divergences = 0
+        self.leapfrog_steps = 0
+
+        self.step_size = self._initial_step_size()
+        self._restart_dual_averaging()
+        self._windows = adaptation_windows(tune)
+        self._window_count = 0
+        self._window_mean = np.zeros(4)
+        self._window_m2 = np.zeros(4)
+
+    @property
+    def state(self) -> np.ndarray:
+        """
+        Current position in the constrained (x, y, activity, background) space.
+        """
+        return to_constrained(self.position)
+
+    @property
+    def acceptance_rate(self) -> float:
+        """
+        Mean acceptance statistic of the trajectories so far.
+        """
+        return self.acceptance_sum / self.iteration if self.iteration else 0.0
+
+    @property
+    def health(self) -> dict[str, float]:
+        """
+        Iterations, sampling time, acceptance statistic, adapted step size and divergent trajectories so far.
+        """
+        return {
+            "iterations": self.iteration,
+            "seconds": self.seconds,
+            "acceptance_rate": self.acceptance_rate,
+            "step_size": self.step_size,
+            "divergences": self.divergences,
+        }
+
+    def _evaluate(self, position: np.ndarray) -> tuple[float, np.ndarray]:
+        return unconstrained_posterior_log_gradient(self.likelihood, position)
+
+    def _leapfrog(self, position, momentum, gradient, step_size):
+        momentum = momentum + 0.5 * step_size * gradient
+        position = position + step_size * self.inverse_mass * momentum
+        log_posterior, gradient = self._evaluate(position)
+        momentum = momentum + 0.5 * step_size * gradient
+        self.leapfrog_steps += 1
+        return position, momentum, log_posterior, gradient
+
+    def _joint(self, log_posterior: float, momentum: np.ndarray) -> float:
+        return log_posterior - 0.5 * float(np.dot(self.inverse_mass * momentum, momentum))
+
+    def _draw_momentum(self) -> np.ndarray:
+        return self.rng.standard_normal(4) / np.sqrt(self.inverse_mass)
+
+    def _initial_step_size(self) -> float:
+        """
+        Double or halve the step size until a single leapfrog step crosses an acceptance probability of 1/2.
+        """
+        step_size = 1.0
+        momentum = self._draw_momentum()
+        joint = self._joint(self.log_posterior, momentum)
+        _, new_momentum, log_posterior, _ = self._leapfrog(self.position, momentum, self.gradient, step_size)
+        log_ratio = self._joint(log_posterior, new_momentum) - joint
+        direction = 1 if log_ratio > math.log(0.5) else -1
+        for _ in range(50):
+            _, new_momentum, log_posterior, _ = self._leapfrog(self.position, momentum, self.gradient, step_size)
+            log_ratio = self._joint(log_posterior, new_momentum) - joint
+            if not math.isfinite(log_ratio) and direction == 1:
+                break
+            if (direction == 1 and log_ratio <= math.log(0.5)) or (direction == -1 and log_ratio > math.log(0.5)):
+                break
+            step_size *= 2.0 ** direction
+        return step_size
+
+    def _restart_dual_averaging(self) -> None:
+        self._mu = math.log(10 * self.step_size)
+        self._log_step_bar = 0.0
+        self._h_bar = 0.0
+        self._adapt_count = 0
+
+    def _adapt_step_size(self, acceptance: float) -> None:
+        """
+        Dual-averaging update of the step size (Hoffman & Gelman 2014, algorithm 5).
+        """
+        gamma, t0, kappa = 0.05, 10, 0.75
+        self._adapt_count += 1
+        m = self._adapt_count
+        weight = 1 / (m + t0)
+        self._h_bar = (1 - weight) * self._h_bar + weight * (self.target_acceptance - acceptance)
+        log_step = self._mu - math.sqrt(m) / gamma * self._h_bar
+        eta = m ** -kappa
+        self._log_step_bar = eta * log_step + (1 - eta) * self._log_step_bar
+        self.step_size = math.exp(log_step)
+
+    def _adapt_mass(self) -> None:
+        """
+        Fold the current draw into the window variance; at the end of a window, regularise it towards
+        a small multiple of the identity, make it the inverse mass matrix and restart the step size tuning.
+        """
+        self._window_count += 1
+        delta = self.position - self._window_mean
+        self._window_mean += delta / self._window_count
+        self._window_m2 += delta * (self.position - self._window_mean)
+        if self._windows and self.iteration == self._windows[0]:
+            self._windows.pop(0)
+            n = self._window_count
+            variance = self._window_m2 / max(n - 1, 1)
+            self.inverse_mass = n / (n + 5) * variance + 1e-3 * 5 / (n + 5)
+            self._window_count = 0
+            self._window_mean = np.zeros(4)
+            self._window_m2 = np.zeros(4)
+            self.step_size = self._initial_step_size()
+            self._restart_dual_averaging()
+
+    def _no_u_turn(self, position_minus, position_plus, momentum_minus, momentum_plus) -> bool:
+        span = position_plus - position_minus
+        return (
+            float(np.dot(span, self.inverse_mass * momentum_minus)) >= 0
+            and float(np.dot(span, self.inverse_mass * momentum_plus)) >= 0
+        )
+
+    def _build_tree(self, position, momentum, gradient, log_slice, direction, depth, step_size, joint_start):
+        """
+        Recursively build a balanced binary tree of ``2 ** depth`` leapfrog steps in ``direction``.
+        :return: both edges of the subtree (position, momentum, gradient), the proposal (position, log-posterior,
+        gradient), the number of valid states, whether to continue, and the summed acceptance statistic
+        with the number of states it was summed over
+        """
+        if depth == 0:
+            position, momentum, log_posterior, gradient = self._leapfrog(position, momentum, gradient, direction * step_size)
+            joint = self._joint(log_posterior, momentum)
+            valid = int(log_slice <= joint)
+            divergent = not (log_slice < joint + self.max_energy_error)
+            if divergent:
+                self.divergences += 1
+            acceptance = math.exp(min(0.0, joint - joint_start)) if math.isfinite(joint) else 0.0
+            edge = (position, momentum, gradient)
+            return edge, edge, (position, log_posterior, gradient), valid, not divergent, acceptance, 1
+
+        minus, plus, proposal, valid, proceed, acceptance, count = self._build_tree(
+            position, momentum, gradient, log_slice, direction, depth - 1, step_size, joint_start
+        )
+        if proceed:
+            start = minus if direction == -1 else plus
+            new_minus, new_plus, new_proposal, new_valid, new_proceed, new_acceptance, new_count = self._build_tree(
+                *start, log_slice, direction, depth - 1, step_size, joint_start
+            )
+            if direction == -1:
+                minus = new_minus
+            else:
+                plus = new_plus
+            if new_valid and self.rng.random() < new_valid / (valid + new_valid):
+                proposal = new_proposal
+            valid += new_valid
+            acceptance += new_acceptance
+            count += new_count
+            proceed = new_proceed and self._no_u_turn(minus[0], plus[0], minus[1], plus[1])
+        return minus, plus, proposal, valid, proceed, acceptance, count
+
+    def _reflect(self) -> None:
+        """
+        Metropolis mirror jump of the source position through the closest measurement point.
+        """
+        closest = self.likelihood.closest(self.position[0], self.position[1])[0]
+        proposal = self.position.copy()
+        proposal[0] = 2 * self.likelihood.x[closest] - proposal[0]
+        proposal[1] = 2 * self.likelihood.y[closest] - proposal[1]
+        log_posterior, gradient = self._evaluate(proposal)
+        if math.log(self.rng.random()) < log_posterior - self.log_posterior:
+            self.position, self.log_posterior, self.gradient = proposal, log_posterior, gradient
+
+    def step(self) -> np.ndarray:
+        self.iteration += 1
+        momentum = self._draw_momentum()
+        joint_start = self._joint(self.log_posterior, momentum)
+        log_slice = joint_start - self.rng.exponential()
+
+        minus = plus = (self.position, momentum, self.gradient)
+        proposal = (self.position, self.log_posterior, self.gradient)
+        valid, proceed, depth = 1, True, 0
+        acceptance, count = 0.0, 0
+        while proceed and depth < self.max_tree_depth:
+            direction = 1 if self.rng.random() < 0.5 else -1
+            start = minus if direction == -1 else plus
+            new_minus, new_plus, new_proposal, new_valid, new_proceed, new_acceptance, new_count = self._build_tree(
+                *start, log_slice, direction, depth, self.step_size, joint_start
+            )
+            if direction == -1:
+                minus = new_minus
+            else:
+                plus = new_plus
+            if new_proceed and self.rng.random() < new_valid / valid:
+                proposal = new_proposal
+            valid += new_valid
+            acceptance += new_acceptance
+            count += new_count
+            proceed = new_proceed and self._no_u_turn(minus[0], plus[0], minus[1], plus[1])
+            depth += 1
+
+        self.position, self.log_posterior, self.gradient = proposal
+        acceptance = acceptance / max(count, 1)
+        self.acceptance_sum += acceptance
+
+        if self.iteration <= self.tune:
+            self._adapt_step_size(acceptance)
+            self._adapt_mass()
+            if self.iteration == self.tune:
+                self.step_size = math.exp(self._log_step_bar)
+        if self.iteration > self.tune and self.iteration % self.reflect_interval == 0:
+            self._reflect()
+        return self.state
+
+
+def print_progress(simnum: int) -> Callable[[BaseSampler, int], None]:
+    """
+    Build a sampler callback that logs the progress and ETA of the run every 1000 iterations.
+    """
+    segment = {"start": perf_counter()}
+
+    def callback(sampler: BaseSampler, done: int) -> None:
+        time_difference = perf_counter() - segment["start"]
+        logger.info("mcmc progress", extra={
+            "done": done,
+            "total": simnum,
+            "percent": round(100 * done / simnum, 2),
+            "iterations_per_second": round(1000 / max(time_difference, 1e-9), 1),
+            "acceptance_rate": round(sampler.acceptance_rate, 4),
+            "eta_s": round((simnum - done) / 1000 * time_difference, 2),
+        })
+        segment["start"] = perf_counter()
+
+    return callback
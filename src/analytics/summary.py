@@ -0,0 +1,52 @@
+import numpy as np
+
+from src.analytics.chain_store import PosteriorDraws
+from src.analytics.diagnostics import PARAM_NAMES, chain_diagnostics
+from src.config import POSTERIOR_HPD_LEVELS, SUMMARY_QUANTILES
+
+
+def hpd_intervals(draws: np.ndarray, level: float) -> np.ndarray:
+    """
+    Shortest interval holding ``level`` of the draws, for every parameter at once.
+    :param draws: array of shape (n_draws, n_params)
+    :return: array of shape (n_params, 2) with the lower and upper bounds
+    """
+    ordered = np.sort(draws, axis=0)
+    n = ordered.shape[0]
+    width = max(1, min(n - 1, int(np.ceil(level * n)) - 1))
+    widths = ordered[width:] - ordered[:n - width]
+    start = np.argmin(widths, axis=0)
+    columns = np.arange(ordered.shape[1])
+    return np.stack([ordered[start, columns], ordered[start + width, columns]], axis=1)
+
+
+def posterior_summary(
+        posterior: PosteriorDraws,
+        quantiles: tuple[float, ...] = SUMMARY_QUANTILES,
+        levels: tuple[float, ...] = POSTERIOR_HPD_LEVELS,
+) -> dict[str, dict]:
+    """
+    Mean, median, standard deviation, quantiles, HPD intervals, split-R-hat and ESS per parameter.
+    Mean and standard deviation come from the running moments of the chain stores; the order statistics
+    and diagnostics are computed on at most ``CHAIN_READ_DRAWS`` evenly thinned draws per chain.
+    :param posterior: post burn-in draws of the run
+    :return: statistics keyed by parameter name
+    """
+    draws = posterior.flat()
+    mean = posterior.mean
+    sd = np.sqrt(posterior.variance)
+    median, *quantile_values = np.quantile(draws, (0.5, *quantiles), axis=0)
+    intervals = {level: hpd_intervals(draws, level) for level in levels}
+    diagnostics = chain_diagnostics(posterior.chain_array())
+
+    return {
+        name: {
+            "mean": float(mean[i]),
+            "median": float(median[i]),
+            "sd": float(sd[i]),
+            "quantiles": {str(q): float(values[i]) for q, values in zip(quantiles, quantile_values)},
+            "hpd": {str(level): intervals[level][i].tolist() for level in levels},
+            **diagnostics[name],
+        }
+        for i, name in enumerate(PARAM_NAMES)
+    }
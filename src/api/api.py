@@ -1,13 +1,37 @@
+import asyncio
+import json
 import os
+import shutil
 import pandas as pd
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import FileResponse
+from functools import partial
+from pathlib import Path
+from time import perf_counter
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
 
-from src.config import OUTPUT_DIR, CACHE
-from src.utils import zip_files, generate_coordinates
-from src.api.run_generation import run_data_generation
-from src.api.run_simulation import run_mcmc
-from .models import GenerationQueryParams, SimulationQueryParams
+from src.analytics.convergence import StoppingRule
+from src.analytics.laplace import MapSearchFailed
+from src.analytics.particle_filter import ParticleFilter
+from src.config import OUTPUT_DIR, CACHE, SWEEP_MAX_SCENARIOS, SWEEP_MAX_VALUES
+from src.tools.metrics import metrics, timed_iter
+from src.tools.result_cache import result_cache
+from src.tools.archive import Artifact, archive_members, archive_name, discard_artifacts, stream_zip, write_artifacts
+from src.tools.datasets import SurveyDataset, SurveySchema, dataset_store
+from src.utils import generate_coordinates
+from src.api.run_generation import run_data_generation, run_sweep
+from src.api.run_simulation import run_mcmc, run_summary
+from src.api.run_posterior import run_grid_posterior
+from src.api.jobs import job_manager, JobStatus
+from .models import (
+    GenerationQueryParams,
+    SweepQueryParams,
+    SimulationQueryParams,
+    GridQueryParams,
+    StreamQueryParams,
+    DatasetQueryParams,
+    SurveyFormat,
+)
 
 
 analytics_router = APIRouter(tags=["analytics"])
@@ -16,8 +40,20 @@ analytics_router = APIRouter(tags=["analytics"])
 @analytics_router.get('/generate')
 async def run_generation(params: GenerationQueryParams = Depends()):
     csv_filename = os.path.join(OUTPUT_DIR, "generated_data.csv")
-    x_coord, y_coord = await generate_coordinates(distance=params.dist)
     CACHE["activity"] = params.act
+    loop = asyncio.get_running_loop()
+    cache_key = result_cache.key("generate", cache_params(params))
+    if params.use_cache and is_cacheable(params):
+        cached = result_cache.get(cache_key, pin=True)
+        if cached is not None:
+            try:
+                await loop.run_in_executor(None, shutil.copyfile, cached["data"], csv_filename)
+            except BaseException:
+                result_cache.release(cache_key)
+                raise
+            return zip_response(cached, background=BackgroundTask(result_cache.release, cache_key))
+
+    x_coord, y_coord = await generate_coordinates(distance=params.dist)
     try:
         if params.make_plot:
             result = await run_data_generation(
@@ -27,15 +63,16 @@ async def run_generation(params: GenerationQueryParams = Depends()):
                 add_speed=params.add_speed,
                 road_span=params.dist,
                 num_points = params.num_points,
+                seed=params.seed,
+                replicates=params.replicates,
                 speed=params.speed,
                 time=params.acq_time,
                 make_plot=True
             )
-            result["data"].to_csv(csv_filename, index=False)
-            result["data"] = csv_filename
-            result_files = list(result.values())
-            zip_file = zip_files(result_files)
-            return FileResponse(path=zip_file, filename=os.path.basename(zip_file), media_type="application/zip")
+            artifacts = {
+                "figure": result["figure"],
+                "data": (os.path.basename(csv_filename), result["data"].to_csv(index=False).encode()),
+            }
         else:
             result = await run_data_generation(
                 activity=params.act,
@@ -44,48 +81,379 @@ async def run_generation(params: GenerationQueryParams = Depends()):
                 add_speed=params.add_speed,
                 road_span=params.dist,
                 num_points=params.num_points,
+                seed=params.seed,
+                replicates=params.replicates,
                 speed=params.speed,
                 time=params.acq_time,
                 make_plot=False
             )
-            result["data"].to_csv(csv_filename, index=False)
-            zip_file = zip_files([csv_filename])
-            return FileResponse(path=zip_file, filename=os.path.basename(zip_file), media_type="application/zip")
+            artifacts = {"data": (os.path.basename(csv_filename), result["data"].to_csv(index=False).encode())}
     except AttributeError as e:
         return HTTPException(status_code=500, detail=str(e))
+    else:
+        await loop.run_in_executor(None, Path(csv_filename).write_bytes, artifacts["data"][1])
+        if is_cacheable(params):
+            result_cache.put(cache_key, artifacts)
+        return zip_response(artifacts)
 
 @analytics_router.get('/simulate')
 async def run_simulation(sim_params: SimulationQueryParams = Depends()):
-    if sim_params.is_generic:
-        try:
-            generated_data = pd.read_csv(os.path.join(OUTPUT_DIR, "generated_data.csv"))
-        except FileNotFoundError as e:
-            return HTTPException(status_code=500, detail=str(e))
-        else:
-            if sim_params.is_specified:
+    """
+    Sample the posterior of the source parameters and return figures, diagnostics and the posterior export.
+    Without initial parameters the chains start from the MAP of a multi-start search by default
+    (``warm_start``); set ``warm_start=false`` for the former highest-count starting point.
+    """
+    data, dataset_file = await load_data(sim_params.dataset_id, sim_params.is_generic)
+    cache_key = await request_cache_key("simulate", sim_params, dataset_file)
+    use_cache = sim_params.use_cache and is_cacheable(sim_params)
+
+    if sim_params.is_specified:
+        files = result_cache.get(cache_key) if use_cache else None
+        if files is None:
+            try:
                 res = await run_mcmc(
-                    generated_data,
+                    data,
                     simnum=sim_params.sim_number,
                     burn_in=sim_params.burn_in,
-                    init_params=(sim_params.init_x_pos, sim_params.init_y_pos, sim_params.init_activity, sim_params.init_bkg)
+                    init_params=(sim_params.init_x_pos, sim_params.init_y_pos, sim_params.init_activity, sim_params.init_bkg),
+                    seed=sim_params.seed,
+                    chains=sim_params.chains,
+                    sampler=sim_params.sampler,
+                    walkers=sim_params.walkers,
+                    thin=sim_params.thin,
+                    stopping=stopping_rule(sim_params),
+                    warm_start=sim_params.warm_start,
+                    export=sim_params.export,
+                    output_dir=None
                 )
+            except ImportError as e:
+                raise HTTPException(status_code=400, detail=f"Parquet export is not available: {e}")
+            except MapSearchFailed as e:
+                raise HTTPException(status_code=422, detail=f"Laplace approximation failed: {e}")
+            try:
+                files = result_cache.put(cache_key, res) if is_cacheable(sim_params) else write_artifacts(res, OUTPUT_DIR)
+            finally:
+                discard_artifacts(res)
+
+        return {"result": files}
+    else:
+        cached = result_cache.get(cache_key, pin=True) if use_cache else None
+        if cached is not None:
+            return zip_response(cached, background=BackgroundTask(result_cache.release, cache_key))
+        try:
+            res = await run_mcmc(
+                data,
+                simnum=sim_params.sim_number,
+                burn_in=sim_params.burn_in,
+                seed=sim_params.seed,
+                chains=sim_params.chains,
+                sampler=sim_params.sampler,
+                walkers=sim_params.walkers,
+                thin=sim_params.thin,
+                stopping=stopping_rule(sim_params),
+                warm_start=sim_params.warm_start,
+                export=sim_params.export,
+                output_dir=None
+            )
+        except KeyError as e:
+            return HTTPException(status_code=500, detail=str(e))
+        except ImportError as e:
+            raise HTTPException(status_code=400, detail=f"Parquet export is not available: {e}")
+        except MapSearchFailed as e:
+            raise HTTPException(status_code=422, detail=f"Laplace approximation failed: {e}")
+        try:
+            if is_cacheable(sim_params):
+                result_cache.put(cache_key, res)
+        except BaseException:
+            discard_artifacts(res)
+            raise
+        return zip_response(res, background=BackgroundTask(discard_artifacts, res))
+
+
+@analytics_router.get('/simulate/summary')
+async def run_simulation_summary(sim_params: SimulationQueryParams = Depends()):
+    """
+    Posterior summary of the generated data or of an uploaded survey as JSON: no figures, posterior export
+    or archive are produced.
+    """
+    data, dataset_file = await load_data(sim_params.dataset_id, sim_params.is_generic)
+    cache_key = await request_cache_key("simulate/summary", sim_params, dataset_file)
+    if sim_params.use_cache and is_cacheable(sim_params):
+        start = perf_counter()
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            loop = asyncio.get_running_loop()
+            summary = json.loads(await loop.run_in_executor(None, Path(cached["summary"]).read_bytes))
+            lookup = perf_counter() - start
+            return {**summary, "runtime": {"sampling_s": 0.0, "summary_s": 0.0, "total_s": lookup}}
+
+    init_params = (sim_params.init_x_pos, sim_params.init_y_pos, sim_params.init_activity, sim_params.init_bkg)
+    try:
+        summary = await run_summary(
+            data,
+            simnum=sim_params.sim_number,
+            burn_in=sim_params.burn_in,
+            init_params=init_params if sim_params.is_specified else None,
+            seed=sim_params.seed,
+            chains=sim_params.chains,
+            sampler=sim_params.sampler,
+            walkers=sim_params.walkers,
+            thin=sim_params.thin,
+            stopping=stopping_rule(sim_params),
+            warm_start=sim_params.warm_start
+        )
+    except MapSearchFailed as e:
+        raise HTTPException(status_code=422, detail=f"Laplace approximation failed: {e}")
+    if is_cacheable(sim_params):
+        # the runtime belongs to this run, a hit reports the time of its own lookup
+        stored = {k: v for k, v in summary.items() if k != "runtime"}
+        result_cache.put(cache_key, {"summary": ("posterior_summary.json", json.dumps(stored).encode())})
+    return summary
+
+
+@analytics_router.get('/metrics', response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Stage latencies, sampler health, cache and job counters in the Prometheus text format.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@analytics_router.get('/cache/stats')
+async def get_cache_stats():
+    return result_cache.stats()
+
+
+def zip_response(artifacts: dict[str, Artifact | str], background: BackgroundTask | None = None) -> StreamingResponse:
+    """
+    Stream the artifacts, in-memory or files, as a zip archive built on the fly.
+    :param background: task run once the archive is sent, e.g. removing spilled artifact files
+    """
+    return StreamingResponse(
+        timed_iter("archiving", stream_zip(archive_members(artifacts))),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{archive_name(artifacts)}"'},
+        background=background,
+    )
+
+
+async def load_data(dataset_id: str | None, is_generic: bool = True) -> tuple[pd.DataFrame | SurveyDataset, str | None]:
+    """
+    Input of an inference request: the uploaded survey ``dataset_id`` if given, else the generated data,
+    read in the default executor.
+    :return: the data and the file whose content keys the result cache; None for a survey, whose id
+    is part of the request parameters
+    """
+    loop = asyncio.get_running_loop()
+    if dataset_id is not None:
+        try:
+            return await loop.run_in_executor(None, dataset_store.open, dataset_id), None
+        except KeyError:
+            raise HTTPException(status_code=404, detail=f"Dataset {dataset_id} not found")
+    if not is_generic:
+        raise HTTPException(status_code=400, detail="A dataset_id is required when is_generic is False")
+    csv_filename = os.path.join(OUTPUT_DIR, "generated_data.csv")
+    try:
+        return await loop.run_in_executor(None, pd.read_csv, csv_filename), csv_filename
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def stopping_rule(params: SimulationQueryParams) -> StoppingRule:
+    return StoppingRule(target_ess=params.target_ess, max_rhat=params.max_rhat, max_seconds=params.max_seconds)
+
+
+def is_cacheable(params: GenerationQueryParams | SimulationQueryParams) -> bool:
+    """
+    Only a seeded request is reproducible; an unseeded one draws afresh and bypasses the result cache.
+    """
+    return params.seed is not None
+
+
+async def request_cache_key(namespace: str, params: SimulationQueryParams, dataset: str | None) -> str:
+    """
+    Result cache key of an inference request; hashing the dataset file reads it, so it runs in the default executor.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, partial(result_cache.key, namespace, cache_params(params), dataset=dataset))
+
 
-                return {"result": res}
+def cache_params(params: GenerationQueryParams | SimulationQueryParams) -> dict:
+    """
+    Query parameters that identify a result; ``use_cache`` only controls the lookup.
+    """
+    return {k: v for k, v in vars(params).items() if k != "use_cache"}
+
+
+@analytics_router.get('/generate/sweep')
+async def run_generation_sweep(params: SweepQueryParams = Depends()):
+    if params.scenario_count > SWEEP_MAX_SCENARIOS:
+        raise HTTPException(status_code=400, detail=f"At most {SWEEP_MAX_SCENARIOS} scenarios are allowed, got {params.scenario_count}")
+    if params.scenario_count * params.num_points > SWEEP_MAX_VALUES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {SWEEP_MAX_VALUES} scenario points are allowed, got {params.scenario_count * params.num_points}"
+        )
+    try:
+        filename = await run_sweep(
+            activity=params.act,
+            src_x=params.src_x,
+            src_y=params.src_y,
+            speed=params.speed,
+            time=params.acq_time,
+            efficiency=params.eff,
+            road_start=params.dist,
+            num_points=params.num_points,
+            include_angles=params.include_angles,
+            file_format=params.file_format.value,
+        )
+    except ImportError as e:
+        raise HTTPException(status_code=400, detail=f"Parquet output is not available: {e}")
+    return FileResponse(
+        path=filename,
+        filename=f"sweep.{params.file_format.value}",
+        media_type="application/octet-stream",
+        background=BackgroundTask(os.remove, filename),
+    )
+
+
+@analytics_router.get('/posterior/grid')
+async def run_posterior_grid(grid_params: GridQueryParams = Depends()):
+    data, _ = await load_data(grid_params.dataset_id)
+    res = await run_grid_posterior(
+        data,
+        step=grid_params.step,
+        y_extent=grid_params.y_extent,
+        profile=grid_params.profile,
+        max_memory_mb=grid_params.max_memory_mb
+    )
+    return {"result": res}
+
+
+@analytics_router.websocket('/stream')
+async def stream_measurements(websocket: WebSocket, stream_params: StreamQueryParams = Depends()):
+    """
+    Online source estimate. Every message is a JSON object with ``x``, ``y`` and ``counts``
+    (scalars or equally long lists); the reply is the updated posterior summary.
+    """
+    await websocket.accept()
+    particle_filter = ParticleFilter(
+        particles=stream_params.particles,
+        x_range=(stream_params.x_min, stream_params.x_max),
+        y_extent=stream_params.y_extent,
+        seed=stream_params.seed
+    )
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            message = await websocket.receive_json()
+            try:
+                summary = await loop.run_in_executor(None, particle_filter.update, message["x"], message["y"], message["counts"])
+            except (KeyError, TypeError, ValueError) as e:
+                await websocket.send_json({"error": str(e)})
             else:
-                try:
-                    res = await run_mcmc(
-                        generated_data,
-                        simnum=sim_params.sim_number,
-                        burn_in=sim_params.burn_in
-                    )
-                    result_files = list(res.values())
-                    zip_file = zip_files(result_files)
-                except KeyError as e:
-                    return HTTPException(status_code=500, detail=str(e))
-                else:
-                    return FileResponse(
-                        path=zip_file,
-                        filename=os.path.basename(zip_file),
-                        media_type="application/zip"
-                    )
+                await websocket.send_json(summary)
+    except WebSocketDisconnect:
+        pass
+
+
+@analytics_router.post('/jobs/simulate')
+async def submit_simulation_job(sim_params: SimulationQueryParams = Depends()):
+    data, _ = await load_data(sim_params.dataset_id, sim_params.is_generic)
+
+    params = {
+        "simnum": sim_params.sim_number,
+        "burn_in": sim_params.burn_in,
+        "seed": sim_params.seed,
+        "chains": sim_params.chains,
+        "sampler": sim_params.sampler,
+        "walkers": sim_params.walkers,
+        "thin": sim_params.thin,
+        "stopping": stopping_rule(sim_params),
+        "warm_start": sim_params.warm_start,
+        "export": sim_params.export,
+    }
+    if sim_params.is_specified:
+        params["init_params"] = (sim_params.init_x_pos, sim_params.init_y_pos, sim_params.init_activity, sim_params.init_bkg)
+    return {"job_id": job_manager.submit(data, params)}
+
+
+@analytics_router.get('/jobs/{job_id}')
+async def get_job_status(job_id: str):
+    try:
+        return job_manager.status(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+
+@analytics_router.get('/jobs/{job_id}/result')
+async def get_job_result(job_id: str):
+    try:
+        job = job_manager.get(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    if job.status != JobStatus.DONE:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is {job.status.value}")
 
+    return zip_response(job.result)
+
+
+@analytics_router.delete('/jobs/{job_id}')
+async def cancel_job(job_id: str):
+    try:
+        job_manager.cancel(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job_manager.status(job_id)
+
+
+@analytics_router.post('/datasets')
+async def upload_dataset(file: UploadFile, params: DatasetQueryParams = Depends()):
+    """
+    Ingest a mobile-survey log (CSV or Parquet) of timestamped GPS positions and counts. The log is parsed
+    in chunks, validated and projected to local meters, and stored as memory-mapped columns whose
+    ``dataset_id`` the inference endpoints accept.
+    """
+    file_format = params.file_format
+    if file_format is None:
+        suffix = os.path.splitext(file.filename or "")[1].lstrip(".").lower()
+        try:
+            file_format = SurveyFormat(suffix)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Cannot infer the survey format from {file.filename!r}, set file_format")
+    if (params.origin_lat is None) != (params.origin_lon is None):
+        raise HTTPException(status_code=400, detail="origin_lat and origin_lon must be given together")
+
+    schema = SurveySchema(params.time_column, params.lat_column, params.lon_column, params.counts_column)
+    origin = None if params.origin_lat is None else (params.origin_lat, params.origin_lon)
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(
+            None, dataset_store.ingest, file.file, file_format.value, schema, origin, file.filename
+        )
+    except ImportError as e:
+        raise HTTPException(status_code=400, detail=f"Parquet input is not available: {e}")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@analytics_router.get('/datasets')
+async def list_datasets():
+    return dataset_store.metadata()
+
+
+@analytics_router.get('/datasets/{dataset_id}')
+async def get_dataset(dataset_id: str):
+    try:
+        return dataset_store.open(dataset_id).metadata
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Dataset {dataset_id} not found")
+
+
+@analytics_router.delete('/datasets/{dataset_id}')
+async def delete_dataset(dataset_id: str):
+    try:
+        dataset_store.delete(dataset_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Dataset {dataset_id} not found")
+    return {"dataset_id": dataset_id, "deleted": True}
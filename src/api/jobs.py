@@ -0,0 +1,219 @@
+import asyncio
+import multiprocessing
+import os
+import shutil
+import uuid
+
+import pandas as pd
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum
+from time import time
+from typing import Any
+
+from src.config import CACHE, JOBS_DIR, JOB_HISTORY, JOB_WORKERS
+from src.tools.datasets import SurveyDataset
+from src.tools.logs import logger
+from src.tools.metrics import metrics, stage_seconds
+
+
+class JobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class SimulationCancelled(Exception):
+    pass
+
+
+class ChainProgress:
+    """
+    Picklable sampler callback that publishes the progress of one chain to a shared dictionary
+    and aborts the run once the job's cancel event is set.
+    """
+
+    def __init__(self, shared: dict, cancel_event, chain: int, total: int):
+        self.shared = shared
+        self.cancel_event = cancel_event
+        self.chain = chain
+        self.total = total
+        self.segment_start = time()
+
+    def __call__(self, sampler, done: int) -> None:
+        if self.cancel_event.is_set():
+            raise SimulationCancelled()
+        now = time()
+        self.shared[self.chain] = {
+            "done": done,
+            "total": self.total,
+            "iterations_per_second": 1000 / max(now - self.segment_start, 1e-9),
+            "acceptance_rate": sampler.acceptance_rate,
+        }
+        self.segment_start = now
+
+
+class JobProgress:
+    """
+    Factory of per-chain callbacks passed to ``run_mcmc``.
+    """
+
+    def __init__(self, shared: dict, cancel_event, total: int):
+        self.shared = shared
+        self.cancel_event = cancel_event
+        self.total = total
+
+    def __call__(self, chain: int) -> ChainProgress:
+        return ChainProgress(self.shared, self.cancel_event, chain, self.total)
+
+
+def run_simulation_job(
+        dataframe: pd.DataFrame | SurveyDataset,
+        params: dict[str, Any],
+        progress: JobProgress,
+        output_dir: str,
+        cache: dict[str, Any],
+) -> dict[str, str]:
+    """
+    Entry point of a simulation job inside a pool worker.
+    """
+    from src.api.run_simulation import run_mcmc
+
+    CACHE.update(cache)
+    os.makedirs(output_dir, exist_ok=True)
+    return asyncio.run(run_mcmc(dataframe, output_dir=output_dir, progress=progress, **params))
+
+
+@dataclass
+class Job:
+    job_id: str
+    total: int
+    progress: dict
+    cancel_event: Any
+    output_dir: str
+    future: Future | None = None
+    created: float = field(default_factory=time)
+    finished: float | None = None
+    status: JobStatus = JobStatus.PENDING
+    result: dict[str, str] | None = None
+    error: str | None = None
+
+
+class JobManager:
+    """
+    Runs simulations in a bounded process pool and keeps track of their state.
+    The pool and the shared-state manager are created on first use.
+    """
+
+    def __init__(self, max_workers: int = JOB_WORKERS, history: int = JOB_HISTORY, jobs_dir: str = JOBS_DIR):
+        self.max_workers = max_workers
+        self.history = history
+        self.jobs_dir = jobs_dir
+        self.jobs: dict[str, Job] = {}
+        self._pool: ProcessPoolExecutor | None = None
+        self._manager = None
+
+    def _ensure_started(self) -> None:
+        if self._pool is None:
+            self._manager = multiprocessing.Manager()
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+
+    def submit(self, dataframe: pd.DataFrame | SurveyDataset, params: dict[str, Any]) -> str:
+        self._ensure_started()
+        self._forget_old_jobs()
+
+        job_id = uuid.uuid4().hex
+        chains = params.get("chains", 1) if params.get("sampler", "metropolis") in ("metropolis", "nuts") else 1
+        job = Job(
+            job_id=job_id,
+            total=params["simnum"] * chains,
+            progress=self._manager.dict(),
+            cancel_event=self._manager.Event(),
+            output_dir=os.path.join(self.jobs_dir, job_id),
+        )
+        progress = JobProgress(job.progress, job.cancel_event, total=params["simnum"])
+        job.future = self._pool.submit(run_simulation_job, dataframe, params, progress, job.output_dir, dict(CACHE))
+        job.future.add_done_callback(lambda future: self._on_done(job, future))
+        self.jobs[job_id] = job
+        return job_id
+
+    @staticmethod
+    def _on_done(job: Job, future: Future) -> None:
+        job.finished = time()
+        if future.cancelled():
+            job.status = JobStatus.CANCELLED
+        else:
+            error = future.exception()
+            if isinstance(error, SimulationCancelled):
+                job.status = JobStatus.CANCELLED
+            elif error is not None:
+                job.status = JobStatus.FAILED
+                job.error = repr(error)
+            else:
+                job.status = JobStatus.DONE
+                job.result = future.result()
+        jobs_finished.inc(status=job.status.value)
+        stage_seconds.observe(job.finished - job.created, stage="job")
+        logger.info("job finished", extra={
+            "job_id": job.job_id,
+            "status": job.status.value,
+            "duration_s": round(job.finished - job.created, 3),
+            "error": job.error,
+        })
+
+    def _forget_old_jobs(self) -> None:
+        finished = [job for job in self.jobs.values() if job.finished is not None]
+        for job in sorted(finished, key=lambda j: j.finished)[:max(0, len(finished) - self.history)]:
+            shutil.rmtree(job.output_dir, ignore_errors=True)
+            del self.jobs[job.job_id]
+
+    def get(self, job_id: str) -> Job:
+        return self.jobs[job_id]
+
+    def status(self, job_id: str) -> dict[str, Any]:
+        job = self.jobs[job_id]
+        chains = dict(job.progress)
+        if job.status == JobStatus.PENDING and chains:
+            job.status = JobStatus.RUNNING
+
+        done = sum(chain["done"] for chain in chains.values())
+        return {
+            "job_id": job.job_id,
+            "status": job.status,
+            "percent_complete": 100.0 if job.status == JobStatus.DONE else round(100 * done / job.total, 2),
+            "iterations_per_second": sum(chain["iterations_per_second"] for chain in chains.values()),
+            "acceptance_rate": (
+                sum(chain["acceptance_rate"] for chain in chains.values()) / len(chains) if chains else None
+            ),
+            "runtime": (job.finished or time()) - job.created,
+            "error": job.error,
+        }
+
+    def cancel(self, job_id: str) -> None:
+        job = self.jobs[job_id]
+        if job.finished is not None:
+            return
+        job.cancel_event.set()
+        job.future.cancel()
+
+    def in_flight(self) -> int:
+        return sum(1 for job in self.jobs.values() if job.finished is None)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            for job in self.jobs.values():
+                if job.finished is None:
+                    job.cancel_event.set()
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._manager.shutdown()
+            self._pool = None
+            self._manager = None
+
+
+job_manager = JobManager()
+
+jobs_finished = metrics.counter("gamma_jobs_finished_total", "Background simulation jobs by final status", labels=("status",))
+metrics.callback("gamma_jobs_in_flight", "Background simulation jobs pending or running", "gauge", job_manager.in_flight)
@@ -1,4 +1,33 @@
-from fastapi import Query
+from enum import Enum
+
+from fastapi import HTTPException, Query
+
+from src.config import EFFICIENCY, ENSEMBLE_WALKERS, GRID_MAX_MEMORY_MB, PF_PARTICLES
+
+
+class SamplerType(str, Enum):
+    METROPOLIS = "metropolis"
+    NUTS = "nuts"
+    LAPLACE = "laplace"
+    ENSEMBLE = "ensemble"
+
+
+class PosteriorExport(str, Enum):
+    THINNED = "thinned"
+    HISTOGRAM = "histogram"
+    HPD = "hpd"
+    NPY = "npy"
+    PARQUET = "parquet"
+
+
+class SweepFormat(str, Enum):
+    PARQUET = "parquet"
+    NPZ = "npz"
+
+
+class SurveyFormat(str, Enum):
+    CSV = "csv"
+    PARQUET = "parquet"
 
 
 class GenerationQueryParams:
@@ -12,6 +41,9 @@ class GenerationQueryParams:
         speed: float = Query(default=13.9, description="Speed of the vehicle in m per sec"),
         acq_time: int = Query(default=1, description="Acquisition time of the detector in seconds"),
         num_points: int = Query(default=100, description="Number of points to generate"),
+        seed: int | None = Query(default=None, description="Seed of the Poisson noise RNG for reproducible data"),
+        replicates: int = Query(default=1, ge=1, description="Number of Poisson replicate tracks (pois_data, pois_data_1, ...)"),
+        use_cache: bool = Query(default=True, description="Switch to False to bypass the result cache; only seeded requests are cached"),
     ):
         self.make_plot = make_plot
         self.include_angles = include_angles
@@ -21,24 +53,154 @@ class GenerationQueryParams:
         self.speed = speed
         self.acq_time = acq_time
         self.num_points = num_points
+        self.seed = seed
+        self.replicates = replicates
+        self.use_cache = use_cache
+
+
+class SweepQueryParams:
+    """
+    Every swept parameter is given as ``<name>_min``, ``<name>_max`` and ``<name>_num`` evenly spaced values;
+    scenarios are all their combinations.
+    """
+    def __init__(
+            self,
+            act_min: float = Query(default=100.0, gt=0, description="Lowest activity performed in MBq"),
+            act_max: float = Query(default=100.0, gt=0, description="Highest activity performed in MBq"),
+            act_num: int = Query(default=1, ge=1, description="Number of activity values"),
+            src_x_min: float = Query(default=0.0, description="Lowest x position of the source"),
+            src_x_max: float = Query(default=0.0, description="Highest x position of the source"),
+            src_x_num: int = Query(default=1, ge=1, description="Number of source x positions"),
+            src_y_min: float = Query(default=60.0, description="Lowest y position of the source"),
+            src_y_max: float = Query(default=60.0, description="Highest y position of the source"),
+            src_y_num: int = Query(default=1, ge=1, description="Number of source y positions"),
+            speed_min: float = Query(default=13.9, gt=0, description="Lowest speed of the vehicle in m per sec"),
+            speed_max: float = Query(default=13.9, gt=0, description="Highest speed of the vehicle in m per sec"),
+            speed_num: int = Query(default=1, ge=1, description="Number of speed values"),
+            acq_time_min: float = Query(default=1.0, gt=0, description="Lowest acquisition time in seconds"),
+            acq_time_max: float = Query(default=1.0, gt=0, description="Highest acquisition time in seconds"),
+            acq_time_num: int = Query(default=1, ge=1, description="Number of acquisition times"),
+            eff_min: float = Query(default=EFFICIENCY, gt=0, description="Lowest detector efficiency"),
+            eff_max: float = Query(default=EFFICIENCY, gt=0, description="Highest detector efficiency"),
+            eff_num: int = Query(default=1, ge=1, description="Number of detector efficiencies"),
+            dist: float = Query(default=-300.0, description="Start point along x axis"),
+            num_points: int = Query(default=100, ge=2, description="Number of measurements per scenario"),
+            include_angles: bool = Query(default=False, description="Switch to True to include angles"),
+            file_format: SweepFormat = Query(default=SweepFormat.PARQUET, description="Output file format"),
+    ):
+        self.act = (act_min, act_max, act_num)
+        self.src_x = (src_x_min, src_x_max, src_x_num)
+        self.src_y = (src_y_min, src_y_max, src_y_num)
+        self.speed = (speed_min, speed_max, speed_num)
+        self.acq_time = (acq_time_min, acq_time_max, acq_time_num)
+        self.eff = (eff_min, eff_max, eff_num)
+        self.dist = dist
+        self.num_points = num_points
+        self.include_angles = include_angles
+        self.file_format = file_format
+
+    @property
+    def scenario_count(self) -> int:
+        return self.act[2] * self.src_x[2] * self.src_y[2] * self.speed[2] * self.acq_time[2] * self.eff[2]
+
 
 class SimulationQueryParams:
     def __init__(
             self,
-            sim_number: int = Query(default=10000, description="Number of simulations"),
-            burn_in: int = Query(default=1000, description="Number of burn-in iterations"),
-            is_generic: bool = Query(default=True, description="Switch to True to use generic data"),
+            sim_number: int = Query(default=10000, ge=1, description="Number of simulations; the upper bound of the run if a stopping criterion is given"),
+            burn_in: int = Query(default=1000, ge=0, description="Number of burn-in iterations, fewer than sim_number"),
+            is_generic: bool = Query(default=True, description="Switch to True to use generic data; False requires a dataset_id"),
+            dataset_id: str | None = Query(default=None, description="Id of an uploaded survey to use instead of the generated data"),
             is_specified: bool = Query(default=False, description="Switch to True to specify initial parameters"),
             init_x_pos: float = Query(default=0.0, description="Initial x position of the source"),
             init_y_pos: float = Query(default=50.0, description="Initial y position of the source"),
             init_activity: float = Query(default=100.0, description="Initial activity (MBq)"),
             init_bkg: float = Query(default=10.0, description="Initial background level (cps)"),
+            seed: int | None = Query(default=None, description="Seed of the sampler RNG for reproducible chains"),
+            chains: int = Query(default=1, ge=1, description="Number of independent chains run in parallel (metropolis and nuts); the ensemble sampler takes walkers instead and allows a single chain"),
+            sampler: SamplerType = Query(default=SamplerType.METROPOLIS, description="MCMC sampler; for 'ensemble' sim_number and burn_in count ensemble steps, for 'nuts' burn_in is also the step size and mass matrix warm-up; 'laplace' returns sim_number independent draws of the Laplace approximation without MCMC"),
+            walkers: int = Query(default=ENSEMBLE_WALKERS, ge=8, multiple_of=2, description="Number of walkers of the ensemble sampler (even number)"),
+            thin: int = Query(default=1, ge=1, description="Keep every thin-th post burn-in draw"),
+            target_ess: float | None = Query(default=None, gt=0, description="Stop once every parameter reaches this effective sample size"),
+            max_rhat: float | None = Query(default=None, gt=1, description="Stop once the R-hat of every parameter is at most this value (with target_ess if both are given)"),
+            max_seconds: float | None = Query(default=None, gt=0, description="Stop sampling after this many seconds"),
+            export: PosteriorExport = Query(default=PosteriorExport.THINNED, description="Export of the posterior samples: thinned, histogram or hpd GeoJSON, or raw float32 npy or parquet"),
+            warm_start: bool = Query(default=True, description="Without initial parameters, start from the MAP and seed the proposal with its Laplace covariance. On by default, which changes the former default start at the highest count; that start is still used if the MAP search fails or with warm_start=false"),
+            use_cache: bool = Query(default=True, description="Switch to False to bypass the result cache; only seeded requests are cached"),
     ):
+        if sampler == SamplerType.ENSEMBLE and chains > 1:
+            raise HTTPException(status_code=400, detail="The ensemble sampler runs a single chain of walkers, set walkers instead of chains")
+        if sampler != SamplerType.LAPLACE and burn_in >= sim_number:
+            raise HTTPException(status_code=400, detail=f"burn_in ({burn_in}) must be smaller than sim_number ({sim_number})")
         self.sim_number = sim_number
         self.burn_in = burn_in
         self.is_generic = is_generic
+        self.dataset_id = dataset_id
         self.is_specified = is_specified
         self.init_x_pos = init_x_pos
         self.init_y_pos = init_y_pos
         self.init_activity = init_activity
         self.init_bkg = init_bkg
+        self.seed = seed
+        self.chains = chains
+        self.sampler = sampler
+        self.walkers = walkers
+        self.thin = thin
+        self.target_ess = target_ess
+        self.max_rhat = max_rhat
+        self.max_seconds = max_seconds
+        self.export = export
+        self.warm_start = warm_start
+        self.use_cache = use_cache
+
+
+class GridQueryParams:
+    def __init__(
+            self,
+            step: float = Query(default=10.0, gt=0, description="Grid step along x and y in meters"),
+            y_extent: float = Query(default=200.0, gt=0, description="Grid extent on both sides of the road in meters"),
+            profile: bool = Query(default=False, description="Switch to True to profile activity and background instead of marginalising them"),
+            max_memory_mb: float = Query(default=GRID_MAX_MEMORY_MB, gt=0, description="Peak memory of the grid work arrays in MB"),
+            dataset_id: str | None = Query(default=None, description="Id of an uploaded survey to use instead of the generated data"),
+    ):
+        self.step = step
+        self.y_extent = y_extent
+        self.profile = profile
+        self.max_memory_mb = max_memory_mb
+        self.dataset_id = dataset_id
+
+
+class DatasetQueryParams:
+    def __init__(
+            self,
+            file_format: SurveyFormat | None = Query(default=None, description="Format of the uploaded log; by default taken from the file name"),
+            time_column: str = Query(default="time", description="Column of the timestamps, ISO 8601 or seconds since the epoch"),
+            lat_column: str = Query(default="lat", description="Column of the WGS84 latitudes in degrees"),
+            lon_column: str = Query(default="lon", description="Column of the WGS84 longitudes in degrees"),
+            counts_column: str = Query(default="counts", description="Column of the counts of every measurement"),
+            origin_lat: float | None = Query(default=None, ge=-90, le=90, description="Latitude of the origin of the local coordinates; by default the middle of the track"),
+            origin_lon: float | None = Query(default=None, ge=-180, le=180, description="Longitude of the origin of the local coordinates; by default the middle of the track"),
+    ):
+        self.file_format = file_format
+        self.time_column = time_column
+        self.lat_column = lat_column
+        self.lon_column = lon_column
+        self.counts_column = counts_column
+        self.origin_lat = origin_lat
+        self.origin_lon = origin_lon
+
+
+class StreamQueryParams:
+    def __init__(
+            self,
+            particles: int = Query(default=PF_PARTICLES, ge=100, description="Number of particles"),
+            x_min: float = Query(default=-300.0, description="Lower bound of the source x position along the road"),
+            x_max: float = Query(default=300.0, description="Upper bound of the source x position along the road"),
+            y_extent: float = Query(default=200.0, gt=0, description="Maximum distance of the source from the road in meters"),
+            seed: int | None = Query(default=None, description="Seed of the particle filter RNG"),
+    ):
+        self.particles = particles
+        self.x_min = x_min
+        self.x_max = x_max
+        self.y_extent = y_extent
+        self.seed = seed
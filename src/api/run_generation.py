@@ -1,3 +1,4 @@
+import asyncio
 import pandas as pd
 
 from typing import Any
@@ -5,12 +6,15 @@ from src.data_generators.angular_data_generator import AngularDataGenerator
 from src.data_generators.regular_data_generator import RegularDataGenerator
 from src.data_generators.velocity_data_generator import VelocityDataGenerator
 from src.data_generators.base_data_generator import BaseDataGenerator
-from src.presentation.plot_maker import PlotMaker
+from src.data_generators.sweep import ScenarioSweep, sweep_axis
+from src.presentation.renderer import plot_renderer
 from src.config import (
+    OUTPUT_DIR,
     NORMALIZED,
     IS_FIXED_DISTANCE,
     IS_POISSON
 )
+from src.tools.metrics import timed
 from src.utils import make_normalization
 
 
@@ -46,21 +50,25 @@ async def run_data_generation(**kwargs) -> dict[str, Any]:
 
 
 async def return_data_from_generator(data_generator: BaseDataGenerator) -> pd.DataFrame:
-    dataframe = await data_generator.generate_data()
-    if NORMALIZED:
-        dataframe = await make_normalization(dataframe)
+    with timed("generation", generator=type(data_generator).__name__):
+        dataframe = await data_generator.generate_data()
+        if NORMALIZED:
+            dataframe = await make_normalization(dataframe)
     return dataframe
 
 
 async def return_dataplot(dataframe: pd.DataFrame, **kwargs) -> dict[str, Any]:
-    plot_generator = PlotMaker(dataframe)
     if IS_POISSON:
-        fig = plot_generator.plot_poisson(
+        fig = await plot_renderer.render(
+            dataframe,
+            "plot_poisson",
             speed=kwargs["speed"],
             time=kwargs["time"]
         )
     else:
-        fig = plot_generator.plot_count_rate(
+        fig = await plot_renderer.render(
+            dataframe,
+            "plot_count_rate",
             normalized=NORMALIZED,
             dist_predefined=IS_FIXED_DISTANCE
         )
@@ -69,3 +77,37 @@ async def return_dataplot(dataframe: pd.DataFrame, **kwargs) -> dict[str, Any]:
         "data": dataframe
     }
 
+
+
+async def run_sweep(
+        activity: tuple[float, float, int],
+        src_x: tuple[float, float, int],
+        src_y: tuple[float, float, int],
+        speed: tuple[float, float, int],
+        time: tuple[float, float, int],
+        efficiency: tuple[float, float, int],
+        road_start: float,
+        num_points: int,
+        include_angles: bool,
+        file_format: str,
+        output_dir: str = OUTPUT_DIR,
+) -> str:
+    """
+    Generate the count-rate curves of all combinations of the swept parameters.
+    Every swept parameter is a (start, stop, num) tuple.
+    :return: path of the written Parquet or NPZ file, unique to this call
+    """
+    sweep = ScenarioSweep(
+        activity=sweep_axis(*activity),
+        src_x=sweep_axis(*src_x),
+        src_y=sweep_axis(*src_y),
+        speed=sweep_axis(*speed),
+        time=sweep_axis(*time),
+        efficiency=sweep_axis(*efficiency),
+        road_start=road_start,
+        num_points=num_points,
+        include_angles=include_angles,
+    )
+    loop = asyncio.get_running_loop()
+    with timed("generation", generator="sweep", scenarios=len(sweep)):
+        return await loop.run_in_executor(None, sweep.save, output_dir, file_format)
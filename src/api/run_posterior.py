@@ -0,0 +1,66 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+
+from functools import partial
+from time import time
+from typing import Any
+
+from src.analytics.diagnostics import PARAM_NAMES
+from src.analytics.distributions import PoissonLikelihood
+from src.analytics.grid_posterior import GridPosterior, default_grid
+from src.tools.datasets import SurveyDataset
+
+
+async def run_grid_posterior(
+        dataframe: pd.DataFrame | SurveyDataset,
+        step: float,
+        y_extent: float,
+        profile: bool,
+        max_memory_mb: float,
+) -> dict[str, Any]:
+    """
+    Evaluate the grid posterior in the default thread pool, so the event loop keeps serving other requests.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, partial(
+        grid_posterior,
+        dataframe=dataframe,
+        step=step,
+        y_extent=y_extent,
+        profile=profile,
+        max_memory_mb=max_memory_mb,
+    ))
+
+
+def grid_posterior(
+        dataframe: pd.DataFrame | SurveyDataset,
+        step: float,
+        y_extent: float,
+        profile: bool,
+        max_memory_mb: float,
+) -> dict[str, Any]:
+    likelihood = PoissonLikelihood.from_dataframe(dataframe)
+    x_grid, y_grid = default_grid(likelihood, step=step, y_extent=y_extent)
+
+    time_start = time()
+    result = GridPosterior(
+        likelihood,
+        x_grid,
+        y_grid,
+        profile=profile,
+        max_memory_mb=max_memory_mb
+    ).evaluate()
+    runtime = time() - time_start
+
+    return {
+        "x": result["x"].tolist(),
+        "y": result["y"].tolist(),
+        "position": np.round(result["position"], 8).tolist(),
+        "activity": result["activity"].tolist(),
+        "activity_density": result["activity_density"].tolist(),
+        "map": dict(zip(PARAM_NAMES, result["map"].tolist())),
+        "mean": dict(zip(PARAM_NAMES, result["mean"].tolist())),
+        "runtime": runtime,
+    }
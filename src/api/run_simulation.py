@@ -1,112 +1,380 @@
+import asyncio
+import json
 import warnings
 
 import numpy as np
 import pandas as pd
 
-from time import time
-from typing import Tuple
-from scipy.stats import uniform
+from functools import partial
+from time import perf_counter
+from typing import Callable, Tuple
 
-from src.analytics.distributions import calculate_posterior_log
-from src.presentation.plot_maker import PlotMaker
-from src.utils import make_points_grid
+from src.analytics.chain_store import ChainStore, PosteriorDraws
+from src.analytics.chains import chain_sampler, run_chains
+from src.analytics.convergence import StoppingRule
+from src.analytics.diagnostics import chain_diagnostics
+from src.analytics.distributions import PoissonLikelihood
+from src.analytics.laplace import LaplaceApproximation, MapSearchFailed, laplace_approximation
+from src.analytics.summary import posterior_summary
+from src.analytics.samplers import EnsembleSampler, initial_params, print_progress
+from src.api.models import SamplerType, PosteriorExport
+from src.config import OUTPUT_DIR, ENSEMBLE_WALKERS, CACHE, CHAIN_READ_DRAWS, DATASET_PLOT_POINTS
+from src.presentation.renderer import plot_renderer
+from src.tools.archive import Artifact, write_artifacts
+from src.tools.datasets import SurveyDataset
+from src.tools.logs import logger
+from src.tools.metrics import observe_sampler, timed
+from src.tools.posterior_export import export_posterior
 
 
-async def run_mcmc(
-        dataframe: pd.DataFrame,
+async def sample_posterior(
+        dataframe: pd.DataFrame | SurveyDataset,
         simnum: int,
         burn_in: int,
         init_params: Tuple[float, float, float, float] | None = None,
-):
-    mcmc_data = await get_data_from_mcmc(dataframe=dataframe, simnum=simnum, init_params=init_params)
-    mcmc_data_burn = mcmc_data[burn_in:, :]
-    points_ = await make_points_grid(mcmc_data_burn)
-    plot_maker = PlotMaker(data=dataframe)
-    mcmc_plot = plot_maker.plot_mcmc_sequence(burnin_data=mcmc_data_burn)
-    mcmc_posterior_act_plot = plot_maker.plot_activity_density(burnin_data=mcmc_data_burn)
-    mcmc_points_density = plot_maker.plot_points(points=points_)
+        seed: int | None = None,
+        chains: int = 1,
+        sampler: SamplerType = SamplerType.METROPOLIS,
+        walkers: int = ENSEMBLE_WALKERS,
+        thin: int = 1,
+        progress: Callable[[int], Callable] | None = None,
+        stopping: StoppingRule = StoppingRule(),
+        warm_start: bool = True,
+) -> tuple[PosteriorDraws, np.ndarray]:
+    """
+    Run the selected sampler; the burn-in is dropped and the rest thinned while the chains run.
+    The ``laplace`` sampler instead returns ``simnum`` independent draws of the Laplace approximation.
+    :param thin: keep every ``thin``-th post burn-in state
+    :param stopping: convergence criteria that may end the run before ``simnum`` iterations
+    :param warm_start: without ``init_params``, start from the MAP of a multi-start search and seed the
+    proposal covariance (mass matrix for NUTS) with its Laplace covariance
+    :param progress: optional factory returning the sampler callback of the given chain index;
+    by default the progress is logged
+    :return: post burn-in draws, walkers counting as chains, and the acceptance rate of every chain
+
+    Single-chain, ensemble and Laplace runs are synchronous and run in the default executor so the event
+    loop keeps serving other requests; several chains run in the shared chain pool.
+    """
+    loop = asyncio.get_running_loop()
+    with timed("inference", sampler=SamplerType(sampler).value, chains=chains, iterations=simnum, points=len(dataframe)):
+        if sampler == SamplerType.LAPLACE:
+            laplace_data, acceptance = await loop.run_in_executor(None, partial(
+                get_data_from_laplace, dataframe=dataframe, simnum=simnum, seed=seed, thin=thin
+            ))
+            return PosteriorDraws([laplace_data]), np.array([acceptance])
+        elif sampler == SamplerType.ENSEMBLE:
+            ensemble_data, acceptance = await loop.run_in_executor(None, partial(
+                get_data_from_ensemble,
+                dataframe=dataframe,
+                steps=simnum,
+                burn_in=burn_in,
+                walkers=walkers,
+                init_params=init_params,
+                seed=seed,
+                thin=thin,
+                stopping=stopping,
+                warm_start=warm_start,
+                callback=progress(0) if progress else None
+            ))
+            return PosteriorDraws([ensemble_data]), np.array([acceptance])
+        elif chains > 1:
+            return await get_data_from_chains(
+                dataframe=dataframe,
+                simnum=simnum,
+                burn_in=burn_in,
+                chains=chains,
+                init_params=init_params,
+                seed=seed,
+                thin=thin,
+                stopping=stopping,
+                sampler=SamplerType(sampler).value,
+                warm_start=warm_start,
+                callbacks=[progress(i) for i in range(chains)] if progress else None
+            )
+        else:
+            mcmc_data, acceptance = await loop.run_in_executor(None, partial(
+                get_data_from_mcmc,
+                dataframe=dataframe,
+                simnum=simnum,
+                burn_in=burn_in,
+                init_params=init_params,
+                seed=seed,
+                thin=thin,
+                stopping=stopping,
+                sampler=SamplerType(sampler).value,
+                warm_start=warm_start,
+                callback=progress(0) if progress else None
+            ))
+            return PosteriorDraws([mcmc_data]), np.array([acceptance])
 
+
+async def run_summary(
+        dataframe: pd.DataFrame | SurveyDataset,
+        simnum: int,
+        burn_in: int,
+        init_params: Tuple[float, float, float, float] | None = None,
+        seed: int | None = None,
+        chains: int = 1,
+        sampler: SamplerType = SamplerType.METROPOLIS,
+        walkers: int = ENSEMBLE_WALKERS,
+        thin: int = 1,
+        stopping: StoppingRule = StoppingRule(),
+        warm_start: bool = True,
+) -> dict:
+    """
+    Run the selected sampler and summarise the post burn-in draws, without plots or exports.
+    :return: JSON-serialisable posterior summary, with why and when every chain stopped
+    """
+    start = perf_counter()
+    posterior, acceptance = await sample_posterior(
+        dataframe,
+        simnum=simnum,
+        burn_in=burn_in,
+        init_params=init_params,
+        seed=seed,
+        chains=chains,
+        sampler=sampler,
+        walkers=walkers,
+        thin=thin,
+        stopping=stopping,
+        warm_start=warm_start
+    )
+    sampled = perf_counter()
+    try:
+        parameters = posterior_summary(posterior)
+    finally:
+        posterior.close()
+    summarised = perf_counter()
     return {
-        "mcmc_plot": mcmc_plot,
-        "act_density": mcmc_posterior_act_plot,
-        "plot_density": mcmc_points_density,
+        "sampler": SamplerType(sampler).value,
+        "chains": posterior.n_chains,
+        "draws_per_chain": posterior.draws_per_chain,
+        "thin": thin,
+        "acceptance_rate": float(acceptance.mean()),
+        "parameters": parameters,
+        "stopping": posterior.stopping,
+        "runtime": {
+            "sampling_s": sampled - start,
+            "summary_s": summarised - sampled,
+            "total_s": summarised - start,
+        },
     }
 
 
-async def get_data_from_mcmc(
-        dataframe: pd.DataFrame,
+async def run_mcmc(
+        dataframe: pd.DataFrame | SurveyDataset,
         simnum: int,
+        burn_in: int,
         init_params: Tuple[float, float, float, float] | None = None,
+        seed: int | None = None,
+        chains: int = 1,
+        sampler: SamplerType = SamplerType.METROPOLIS,
+        walkers: int = ENSEMBLE_WALKERS,
+        export: PosteriorExport = PosteriorExport.THINNED,
+        output_dir: str | None = OUTPUT_DIR,
+        progress: Callable[[int], Callable] | None = None,
+        thin: int = 1,
+        stopping: StoppingRule = StoppingRule(),
+        warm_start: bool = True,
 ):
-    warnings.filterwarnings('ignore')
+    """
+    Run the selected sampler, then plot and save the post burn-in draws.
+    Figures and diagnostics use at most ``CHAIN_READ_DRAWS`` evenly thinned draws per chain,
+    and the exports read the chain stores chunk by chunk.
+    :param progress: optional factory returning the sampler callback of the given chain index;
+    by default the progress is logged
+    :param output_dir: directory the results are written to; if None they are kept in memory
+    :return: dictionary of created files, or of (file name, content) pairs if ``output_dir`` is None; raw npy
+    and parquet exports are then spill files, which the caller removes with ``discard_artifacts``
+    """
+    posterior, _ = await sample_posterior(
+        dataframe,
+        simnum=simnum,
+        burn_in=burn_in,
+        init_params=init_params,
+        seed=seed,
+        chains=chains,
+        sampler=sampler,
+        walkers=walkers,
+        thin=thin,
+        progress=progress,
+        stopping=stopping,
+        warm_start=warm_start
+    )
 
-    sigma_mh = 0.01
-    beta_sigma = 1e-4
-    sigma = np.diag(np.ones(4) * 1000 ** 2)
-    estimated_mean = np.zeros(4)
-    estimated_sigma = np.zeros((4, 4))
-    lambda_vector = np.zeros((simnum, 4))
-    lambda_start_vector = np.zeros((simnum, 4))
-    accept = 0
-    count = 0
-    time_segment_start = time()
+    try:
+        mcmc_data_burn = posterior.flat()
+        plot_data = dataframe.to_frame(max_rows=DATASET_PLOT_POINTS) if isinstance(dataframe, SurveyDataset) else dataframe
+        figures = await plot_renderer.render_many(plot_data, {
+            "mcmc_plot": ("plot_mcmc_sequence", {"burnin_data": mcmc_data_burn}),
+            "act_density": ("plot_activity_density", {"burnin_data": mcmc_data_burn, "activity": CACHE.get("activity")}),
+            "plot_density": ("plot_points", {"points": mcmc_data_burn[:, :2]}),
+        })
+        artifacts = {
+            **figures,
+            "diagnostics": await diagnostics_artifact(posterior.chain_array(), posterior.stopping),
+        }
+        with timed("export", format=PosteriorExport(export).value):
+            artifacts["posterior"] = await export_posterior(posterior, PosteriorExport(export).value)
+    finally:
+        posterior.close()
+    if output_dir is None:
+        return artifacts
+    return write_artifacts(artifacts, output_dir)
 
+
+async def diagnostics_artifact(chain_draws: np.ndarray, stopping: list[dict] | None = None) -> Artifact:
+    """
+    Split-R-hat and effective sample size per parameter as a JSON document.
+    :param chain_draws: post burn-in draws of shape (n_chains, n_draws, 4)
+    :param stopping: convergence monitor reports of the run
+    :return: file name and content
+    """
+    diagnostics = {
+        "chains": chain_draws.shape[0],
+        "draws_per_chain": chain_draws.shape[1],
+        "parameters": chain_diagnostics(chain_draws),
+        "stopping": stopping or [],
+    }
+    return "mcmc_diagnostics.json", json.dumps(diagnostics, indent=4).encode()
+
+
+def starting_point(
+        likelihood: PoissonLikelihood,
+        init_params: Tuple[float, float, float, float] | None,
+        warm_start: bool,
+) -> tuple[np.ndarray, LaplaceApproximation | None]:
+    """
+    Starting parameters of the chains: ``init_params`` if given, else the MAP of the multi-start search
+    together with its Laplace approximation if ``warm_start``, else the highest-count heuristic.
+    A failed MAP search falls back to the highest-count heuristic as well.
+    """
     if init_params:
-        lambda_ = np.array([*init_params])
-    else:
-        df_index = np.argmax(dataframe.iloc[:, 2])
-        lambda_ = np.array([dataframe.iloc[df_index, 0], dataframe.iloc[df_index, 1], 100, np.mean(dataframe.iloc[:, 2])])
-
-    print(f"Data reconstruction in progress...")
-
-    for i in range(1, simnum + 1):
-        count += 1
-        lambda_start = lambda_.copy()
-        covariance = sigma_mh ** 2 * sigma
-        lambda_start[:4] = np.random.multivariate_normal(mean=lambda_[:4], cov=covariance, size=1)
-
-        if i % 1000 == 0:
-            dist_to_prop = np.sqrt((dataframe.iloc[:, 0] - lambda_start[0]) ** 2 + (dataframe.iloc[:, 1] - lambda_start[1]) ** 2)
-            closest_to_prop = np.argmin(dist_to_prop)
-            distance_to_x = lambda_start[0] - dataframe.iloc[closest_to_prop, 0]
-            distance_to_y = lambda_start[1] - dataframe.iloc[closest_to_prop, 1]
-            lambda_start[0] = lambda_start[0] - 2 * distance_to_x
-            lambda_start[1] = lambda_start[1] - 2 * distance_to_y
-
-        lambda_start_vector[i - 1, :] = lambda_start
-
-        random_uniforms = uniform.rvs()
-        p1 = await calculate_posterior_log(data=dataframe, lambda_params=lambda_start)
-        p2 = await calculate_posterior_log(data=dataframe, lambda_params=lambda_)
-        posterior = np.exp(p1 - p2)
-        accept_prob = np.min([1, posterior])
-
-        if random_uniforms < accept_prob:
-            lambda_ = lambda_start.copy()
-            accept += 1
-
-        lambda_vector[i - 1, :] = lambda_.copy()
-
-        w = 1 / i
-        estimated_mean = (1 - w) * estimated_mean + w * lambda_[:4]
-        estimated_sigma = (1 - w) * estimated_sigma + w * np.outer(lambda_[:4] - estimated_mean, lambda_[:4] - estimated_mean)
-
-        if i > 100:
-            sigma = np.diag(np.diag(estimated_sigma)) + np.eye(len(estimated_mean)) * beta_sigma
-
-        if i % 100 == 0:
-            if accept / count < 0.24:
-                sigma_mh = max(0.95, (1 - 5 / np.sqrt(i))) * sigma_mh
-            else:
-                sigma_mh = min(1.05, 1 + 5 / np.sqrt(i)) * sigma_mh
-            accept = 0
-            count = 0
-
-        if i % 1000 == 0:
-            time_segment_end = time()
-            time_difference = time_segment_end - time_segment_start
-            time_left = (simnum - i) / 1000
-            print(f"{100 * round(i / simnum, 2):.2f}% done. Segment duration: {time_difference:.2f} seconds. ETA in: {time_left * time_difference:.2f} seconds or {time_left * time_difference / 60:.2f} minutes.")
-            time_segment_start = time()
-
-    return lambda_vector
\ No newline at end of file
+        return np.array([*init_params]), None
+    if warm_start:
+        try:
+            with timed("initialisation", points=len(likelihood)):
+                laplace = laplace_approximation(likelihood)
+        except MapSearchFailed as e:
+            logger.warning("warm start failed, starting from the highest count", extra={"error": str(e)})
+        else:
+            return laplace.map_params, laplace
+    return initial_params(likelihood), None
+
+
+def get_data_from_laplace(
+        dataframe: pd.DataFrame | SurveyDataset,
+        simnum: int,
+        seed: int | None = None,
+        thin: int = 1,
+) -> tuple[ChainStore, float]:
+    """
+    Laplace-approximation-only answer: ``simnum`` independent draws of the Gaussian mixture around the
+    posterior modes, without MCMC, so there is no burn-in.
+    :raises MapSearchFailed: if the MAP search finds no mode to approximate
+    :return: store of the draws and an acceptance rate of 1
+    """
+    likelihood = PoissonLikelihood.from_dataframe(dataframe)
+    with timed("initialisation", points=len(likelihood)):
+        laplace = laplace_approximation(likelihood)
+    logger.info("laplace approximation", extra={"modes": laplace.summary()})
+
+    rng = np.random.default_rng(seed)
+    store = ChainStore(simnum, thin=thin)
+    for start in range(0, simnum, CHAIN_READ_DRAWS):
+        store.extend(laplace.sample(min(CHAIN_READ_DRAWS, simnum - start), rng))
+    return store, 1.0
+
+
+async def get_data_from_chains(
+        dataframe: pd.DataFrame | SurveyDataset,
+        simnum: int,
+        burn_in: int,
+        chains: int,
+        init_params: Tuple[float, float, float, float] | None = None,
+        seed: int | None = None,
+        callbacks: list[Callable] | None = None,
+        thin: int = 1,
+        stopping: StoppingRule = StoppingRule(),
+        sampler: str = "metropolis",
+        warm_start: bool = True,
+) -> tuple[PosteriorDraws, np.ndarray]:
+    loop = asyncio.get_running_loop()
+    likelihood = await loop.run_in_executor(None, PoissonLikelihood.from_dataframe, dataframe)
+    lambda_, laplace = await loop.run_in_executor(None, starting_point, likelihood, init_params, warm_start)
+
+    logger.info("data reconstruction started", extra={"sampler": sampler, "chains": chains, "iterations": simnum})
+    return await run_chains(
+        likelihood,
+        lambda_,
+        chains=chains,
+        simnum=simnum,
+        burn_in=burn_in,
+        seed=seed,
+        callbacks=callbacks,
+        thin=thin,
+        stopping=stopping,
+        sampler=sampler,
+        laplace=laplace
+    )
+
+
+def get_data_from_ensemble(
+        dataframe: pd.DataFrame | SurveyDataset,
+        steps: int,
+        burn_in: int,
+        walkers: int,
+        init_params: Tuple[float, float, float, float] | None = None,
+        seed: int | None = None,
+        callback: Callable | None = None,
+        thin: int = 1,
+        stopping: StoppingRule = StoppingRule(),
+        warm_start: bool = True,
+) -> tuple[ChainStore, float]:
+    """
+    Run the ensemble sampler.
+    :return: store of the post burn-in (walkers, 4) positions and the acceptance rate of the ensemble
+    """
+    likelihood = PoissonLikelihood.from_dataframe(dataframe)
+    lambda_, _ = starting_point(likelihood, init_params, warm_start)
+
+    sampler = EnsembleSampler(likelihood, init_params=lambda_, walkers=walkers, seed=seed, tune=burn_in)
+    logger.info("data reconstruction started", extra={"sampler": "ensemble", "walkers": walkers, "iterations": steps})
+    store = ChainStore(steps, burn_in=burn_in, thin=thin, shape=(walkers, 4))
+    monitor = stopping.monitor(store)
+    sampler.run(steps, callback=callback or print_progress(steps), store=store, monitor=monitor)
+    store.stopping = monitor.report()
+    observe_sampler("ensemble", **sampler.health)
+    return store, sampler.acceptance_rate
+
+
+def get_data_from_mcmc(
+        dataframe: pd.DataFrame | SurveyDataset,
+        simnum: int,
+        init_params: Tuple[float, float, float, float] | None = None,
+        seed: int | None = None,
+        callback: Callable | None = None,
+        burn_in: int = 0,
+        thin: int = 1,
+        stopping: StoppingRule = StoppingRule(),
+        sampler: str = "metropolis",
+        warm_start: bool = True,
+) -> tuple[ChainStore, float]:
+    """
+    Run a single Metropolis or NUTS chain.
+    :return: store of the post burn-in draws and the acceptance rate of the chain
+    """
+    warnings.filterwarnings('ignore')
+
+    likelihood = PoissonLikelihood.from_dataframe(dataframe)
+    lambda_, laplace = starting_point(likelihood, init_params, warm_start)
+
+    chain = chain_sampler(sampler, likelihood, lambda_, seed, burn_in, laplace)
+    logger.info("data reconstruction started", extra={"sampler": sampler, "chains": 1, "iterations": simnum})
+
+    store = ChainStore(simnum, burn_in=burn_in, thin=thin)
+    monitor = stopping.monitor(store)
+    chain.run(simnum, callback=callback or print_progress(simnum), store=store, monitor=monitor)
+    store.stopping = monitor.report()
+    observe_sampler(sampler, **chain.health)
+    return store, chain.acceptance_rate
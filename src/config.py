@@ -1,10 +1,9 @@
 import os
+from functools import cache
 from pathlib import Path
 from pydantic_settings import BaseSettings
 
 from nuclib.nuclides import Energy, BranchingRatio
-from src.tools.data_formatter import formatter
-from src.tools.interpolators import AttenuationInterpolator
 
 
 # common params
@@ -18,9 +17,6 @@ CACHE = {
 ATTENUATION_FILE = os.path.join(BASE_DIR, "nuclib", "attenuation_table.csv")
 EFF_FILE = os.path.join(BASE_DIR, "nuclib", "relative_efficiency_HPGe.csv")
 
-if not os.path.exists(OUTPUT_DIR):
-    os.mkdir(OUTPUT_DIR)
-
 # Distribution settings
 NORMALIZED = True
 IS_POISSON = True # Set this parameter to True if Poisson distribution is needed
@@ -46,10 +42,92 @@ src_y_probe = {i: dist for i, dist in enumerate(range(SRC_Y_MIN, SRC_Y_MAX, STEP
 # Detector params
 EFFICIENCY = 0.02  # from R. Finck calculations 0.00216
 
-attenuation_df = formatter.get_dataframe(ATTENUATION_FILE)
-attenuation_interpolator = AttenuationInterpolator(attenuation_df)
-
-mu_air = attenuation_interpolator.interpolate(SOURCE_ENERGY)  # mu_air = 0.0015
+# Plot rendering
+RENDER_WORKERS = 3  # size of the plot rendering process pool
+
+# Scenario sweep settings
+SWEEP_MAX_MEMORY_MB = 256  # peak size of the sweep work arrays
+SWEEP_MAX_SCENARIOS = 1_000_000
+SWEEP_MAX_VALUES = 100_000_000  # at most this many (scenario, point) values per sweep, 400 MB per float32 array
+
+# Likelihood evaluation
+LIKELIHOOD_CUTOFF = 1e-4  # measurements where the source adds less than this share of the background are taken as background only; 0 disables
+LIKELIHOOD_INDEX_MIN_POINTS = 10_000  # tracks shorter than this are evaluated in full, without the spatial index
+
+# MCMC settings
+MCMC_BLOCK_SIZE = 1000  # number of proposals and uniforms drawn from the RNG at once
+ENSEMBLE_WALKERS = 32  # default number of walkers of the ensemble sampler
+NUTS_MAX_TREE_DEPTH = 10  # at most 2 ** depth leapfrog steps per NUTS iteration
+NUTS_TARGET_ACCEPTANCE = 0.8  # acceptance statistic the NUTS step size is tuned towards
+
+# MAP initialisation and Laplace approximation
+MAP_PEAKS = 4  # highest-count measurement points the MAP candidates are placed around
+MAP_DISTANCES = (5, 20, 50, 100, 200)  # candidate source distances from those points on both sides of the road, in meters
+MAP_ACTIVITIES = (1, 10, 100, 1_000, 10_000)  # candidate activities in MBq
+MAP_STARTS = 8  # best candidates optimised locally, half on each side of the road
+
+# Convergence-driven stopping
+CONVERGENCE_CHECK_INTERVAL = 1000  # iterations between two convergence checks
+CONVERGENCE_MAX_BATCHES = 128  # batches of the batch-means estimator before neighbours are merged
+CONVERGENCE_MIN_BATCHES = 32  # batches required before the ESS and R-hat estimates are trusted
+CONVERGENCE_SEGMENTS = 4  # consecutive segments of every chain compared by the segment R-hat
+
+# Chain storage
+CHAIN_DIR = os.path.join(OUTPUT_DIR, 'chains')
+CHAIN_MEMORY_MB = 256  # chains larger than this are kept in a memory-mapped file
+CHAIN_READ_DRAWS = 100_000  # draws per chunk, and per chain for plots, quantiles and diagnostics
+
+# Posterior sample export
+POSTERIOR_THIN_POINTS = 5000  # points kept in the thinned GeoJSON
+POSTERIOR_HIST_BINS = 50  # bins per axis of the position histogram
+POSTERIOR_HPD_LEVELS = (0.5, 0.9)  # posterior mass of the exported HPD regions and summary HPD intervals
+SUMMARY_QUANTILES = (0.05, 0.25, 0.75, 0.95)  # quantiles reported by the posterior summary
+
+# Grid posterior settings
+GRID_MAX_MEMORY_MB = 256  # peak size of the grid work arrays
+
+# Particle filter settings
+PF_PARTICLES = 2000
+PF_CELL_SIZE = 10.0  # side of the finest cells the stream is aggregated on for the rejuvenation moves, in meters
+PF_OPENING = 5.0  # cells closer to a particle than this many cell sides are split into sub-cells, the finest into measurements
+PF_MAX_MEMORY_MB = 4  # size of the work arrays of one chunk of particles, small enough to stay in the CPU cache
+
+# Background simulation jobs
+JOBS_DIR = os.path.join(OUTPUT_DIR, 'jobs')
+JOB_WORKERS = 2  # size of the simulation process pool
+JOB_HISTORY = 100  # number of finished jobs kept with their results
+
+# Zip archives of the responses
+ARCHIVE_DEFLATE_LEVEL = 6  # zlib level of deflated members (CSV, JSON, GeoJSON)
+
+# Survey datasets uploaded for inference
+DATASETS_DIR = os.path.join(OUTPUT_DIR, 'datasets')
+DATASET_CHUNK_ROWS = 250_000  # rows parsed, validated and projected at once during ingestion
+DATASET_PLOT_POINTS = 5000  # evenly strided measurements of a stored survey shown in the figures
+
+# Result cache of /generate and /simulate artifacts
+RESULT_CACHE_DIR = os.path.join(OUTPUT_DIR, 'cache')
+RESULT_CACHE_MAX_BYTES = 512 * 2 ** 20
+
+# Logging and metrics
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)  # stage latency, seconds
+
+
+@cache
+def get_mu_air() -> float:
+    """
+    Attenuation coefficient of air at the source energy, read from the attenuation table on first use.
+    """
+    from src.tools.response_tables import response_tables
+    return response_tables.attenuation_coefficient(ATTENUATION_FILE, SOURCE_ENERGY)  # mu_air = 0.0015
+
+
+def __getattr__(name):
+    # ``mu_air`` used to be computed at import time; keep ``config.mu_air`` working without the import cost
+    if name == "mu_air":
+        return get_mu_air()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class ApiSettings(BaseSettings):
@@ -65,7 +143,4 @@ class ApiSettings(BaseSettings):
         case_sensitive = True
 
 
-settings = ApiSettings()
-
-# TODO: Create logger
 # TODO: Create error handlers
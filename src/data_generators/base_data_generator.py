@@ -1,12 +1,37 @@
+import numpy as np
+
 from abc import ABC, abstractmethod
 
 
 class BaseDataGenerator(ABC):
 
+    def __init__(self, seed: int | np.random.SeedSequence | None = None, replicates: int = 1):
+        self.rng = np.random.default_rng(seed)
+        self.replicates = replicates
+
     @abstractmethod
     async def generate_data(self):
         pass
 
-    @abstractmethod
-    async def get_from_poisson(self, *args):
-        pass
\ No newline at end of file
+    async def get_from_poisson(self, generated_data):
+        """
+        This function generates random numbers from a Poisson distribution with a mean of ``generated_data``.
+        The Poisson distribution models the probability of a given number of events occurring in a fixed interval of time or space,
+        given that these events occur with a known average rate.
+        All ``replicates`` tracks are drawn in a single call from the generator's seeded RNG.
+        :param generated_data: simulated from count rate model dataset
+        :return: array of poisson random count numbers, of shape (replicates, points) if more than one replicate is drawn
+        """
+        generated_data = np.asarray(generated_data, dtype=np.float64)
+        size = (self.replicates, generated_data.size) if self.replicates > 1 else None
+        return self.rng.poisson(generated_data, size=size).astype(np.float64)
+
+    async def get_poisson_columns(self, generated_data) -> dict[str, np.ndarray]:
+        """
+        Poisson data columns of the output dataframe: ``pois_data`` for the first replicate
+        and ``pois_data_<k>`` for the following ones.
+        """
+        pois_data = await self.get_from_poisson(generated_data)
+        if self.replicates == 1:
+            return {"pois_data": pois_data}
+        return {"pois_data" if k == 0 else f"pois_data_{k}": track for k, track in enumerate(pois_data)}
@@ -1,4 +1,3 @@
-import asyncio
 import numpy as np
 
 from src.data_generators.base_data_generator import BaseDataGenerator
@@ -7,7 +6,7 @@ from src.config import (
     BRANCH_RATIO,
     IS_FIXED_DISTANCE,
     src_y_probe,
-    mu_air,
+    get_mu_air,
     SRC_X,
     SRC_Y,
     EFFICIENCY,
@@ -18,6 +17,7 @@ from src.utils import create_dataframe
 
 class RegularDataGenerator(BaseDataGenerator):
     def __init__(self, **kwargs):
+        super().__init__(seed=kwargs.get("seed"), replicates=kwargs.get("replicates", 1))
         self.coordinates = kwargs["coordinates"]
         self.dist_predefined = IS_FIXED_DISTANCE
         self.activity = kwargs["activity"]
@@ -27,15 +27,16 @@ class RegularDataGenerator(BaseDataGenerator):
         self.eff = EFFICIENCY
 
     async def __get_dist_arrays(self):
-        jobs = []
-        for probe in src_y_probe.values():
-            jobs.append(asyncio.create_task(self.generate_count_rate(
-                self.coordinates[0],
-                self.coordinates[1],
-                src_y=probe,
-                activity=self.activity
-            )))
-        return await asyncio.gather(*jobs)
+        """
+        Count rates of all probed source distances in one broadcast, one row per ``src_y_probe`` value.
+        """
+        probes = np.array(list(src_y_probe.values()))[:, np.newaxis]
+        return await self.generate_count_rate(
+            self.coordinates[0],
+            self.coordinates[1],
+            src_y=probes,
+            activity=self.activity
+        )
 
     async def generate_data(self):
         data_dict = {'x': self.coordinates[0], 'y': self.coordinates[1]}
@@ -46,26 +47,13 @@ class RegularDataGenerator(BaseDataGenerator):
                 self.activity
             )
             data_dict["generic_count_rate"] = gen_data
-            data_dict["pois_data"] = await self.get_from_poisson(gen_data)
+            data_dict.update(await self.get_poisson_columns(gen_data))
         else:
             dist_dataset = await self.__get_dist_arrays()
             for i, item in enumerate(dist_dataset):
                 data_dict[f"generic_data_{src_y_probe[i]}"] = item
         return await create_dataframe(data_dict)
 
-    async def get_from_poisson(self, generated_data):
-        """
-        This function generates random numbers from a Poisson distribution with a mean of ``generated_data``.
-        The Poisson distribution models the probability of a given number of events occurring in a fixed interval of time or space,
-        given that these events occur with a known average rate.
-        :param generated_data: simulated from count rate model dataset
-        :return: array of poisson random count numbers
-        """
-        pois_data = np.zeros_like(generated_data)
-        for i in range(len(generated_data)):
-            pois_data[i] = np.random.poisson(generated_data[i], 1)[0]
-        return pois_data
-
     async def generate_count_rate(
             self,
             x_position,
@@ -74,5 +62,5 @@ class RegularDataGenerator(BaseDataGenerator):
             src_y=SRC_Y,
     ):
         dist = np.sqrt((x_position - self.src_x) ** 2 + (y_position - src_y) ** 2)
-        count_rate = (activity * SCALE * BRANCH_RATIO * self.eff * np.exp(-mu_air * dist)) / (4 * np.pi * dist ** 2)
+        count_rate = (activity * SCALE * BRANCH_RATIO * self.eff * np.exp(-get_mu_air() * dist)) / (4 * np.pi * dist ** 2)
         return np.round(count_rate, 2) + self.background
\ No newline at end of file
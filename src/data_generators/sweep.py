@@ -0,0 +1,173 @@
+import itertools
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from src.config import BKG_COUNT_RATE, EFF_FILE, SWEEP_MAX_MEMORY_MB
+from src.tools.response_tables import response_tables
+from src.utils import source_count_rate
+
+
+SCENARIO_COLUMNS = ("activity", "src_x", "src_y", "speed", "time", "efficiency")
+
+
+def sweep_axis(start: float, stop: float, num: int) -> np.ndarray:
+    """
+    Evenly spaced values of one swept parameter; ``num=1`` yields ``start`` only.
+    """
+    return np.linspace(start, stop, num) if num > 1 else np.array([start], dtype=np.float64)
+
+
+class ScenarioSweep:
+    """
+    Count-rate curves of many scenarios computed as one (scenarios x points) broadcast.
+
+    Scenarios are the cartesian product of the given axes. In every scenario the detector moves along
+    the road (y = 0) from ``road_start`` with a step of ``speed * time`` meters and measures ``num_points``
+    times; the expected counts of a measurement are the source count rate times the acquisition time
+    plus the background, as in ``VelocityDataGenerator``. With ``include_angles`` the angular relative
+    efficiency of the detector is applied as in ``AngularDataGenerator``. Scenarios are processed in
+    chunks so the work arrays stay under ``max_memory_mb``.
+    """
+
+    def __init__(
+            self,
+            activity: np.ndarray,
+            src_x: np.ndarray,
+            src_y: np.ndarray,
+            speed: np.ndarray,
+            time: np.ndarray,
+            efficiency: np.ndarray,
+            road_start: float = -300,
+            num_points: int = 100,
+            include_angles: bool = False,
+            max_memory_mb: float = SWEEP_MAX_MEMORY_MB,
+    ):
+        axes = [np.atleast_1d(np.asarray(a, dtype=np.float64)) for a in (activity, src_x, src_y, speed, time, efficiency)]
+        self.scenarios = pd.DataFrame(list(itertools.product(*axes)), columns=list(SCENARIO_COLUMNS))
+        self.road_start = road_start
+        self.num_points = num_points
+        self.include_angles = include_angles
+        self.max_memory_mb = max_memory_mb
+        self._efficiency_interpolator = response_tables.efficiency(EFF_FILE) if include_angles else None
+
+    def __len__(self) -> int:
+        return len(self.scenarios)
+
+    @property
+    def chunk_size(self) -> int:
+        """
+        Number of scenarios per chunk; about eight float64 (scenarios x points) work arrays are alive at once.
+        """
+        bytes_per_scenario = 8 * 8 * self.num_points
+        return max(1, int(self.max_memory_mb * 2 ** 20 // bytes_per_scenario))
+
+    def _positions(self, scenarios: pd.DataFrame) -> np.ndarray:
+        """
+        Detector x positions of the scenarios, shape (scenarios, num_points).
+        """
+        step = (scenarios["speed"].to_numpy() * scenarios["time"].to_numpy())[:, np.newaxis]
+        return self.road_start + step * np.arange(self.num_points)
+
+    def _evaluate_chunk(self, scenarios: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+        activity, src_x, src_y, time, efficiency = (
+            scenarios[column].to_numpy()[:, np.newaxis] for column in ("activity", "src_x", "src_y", "time", "efficiency")
+        )
+        x_position = self._positions(scenarios)
+        y_position = np.zeros_like(x_position)
+
+        dist = np.sqrt((x_position - src_x) ** 2 + (y_position - src_y) ** 2)
+        with np.errstate(divide="ignore"):
+            count_rate = source_count_rate(dist, activity, efficiency)
+        if self.include_angles:
+            # the detector always moves along +x, so the relative angle of ``calculate_angles``
+            # reduces to the direction of the source alone
+            angles = -np.arctan2(y_position - src_y, src_x - x_position) * (180 / np.pi)
+            count_rate *= self._efficiency_interpolator.interpolate(angles)
+        return x_position, np.round(count_rate * time, 2) + BKG_COUNT_RATE
+
+    def chunks(self):
+        """
+        Iterate over the sweep chunk by chunk.
+        :return: iterator of (first scenario index, x positions, expected counts), the arrays having
+        the shape (scenarios in chunk, num_points)
+        """
+        step = self.chunk_size
+        for start in range(0, len(self), step):
+            x_position, counts = self._evaluate_chunk(self.scenarios.iloc[start:start + step])
+            yield start, x_position, counts
+
+    def _write_npy_member(self, archive: zipfile.ZipFile, name: str, blocks) -> None:
+        """
+        Write a (scenarios x points) float32 array to ``archive`` as ``<name>.npy`` block by block.
+        """
+        header = {"descr": np.lib.format.dtype_to_descr(np.dtype(np.float32)), "fortran_order": False,
+                  "shape": (len(self), self.num_points)}
+        with archive.open(f"{name}.npy", "w", force_zip64=True) as member:
+            np.lib.format.write_array_header_2_0(member, header)
+            for block in blocks:
+                member.write(np.ascontiguousarray(block, dtype=np.float32).tobytes())
+
+    def to_npz(self, filename: str) -> str:
+        """
+        Save the sweep as NPZ with the scenario table as 1-D arrays and ``x`` and ``count_rate``
+        as (scenarios x points) float32 arrays. Both arrays are written chunk by chunk, so only one
+        chunk is held in memory; ``np.load`` reads the file as if written by ``np.savez``.
+        """
+        step = self.chunk_size
+        with zipfile.ZipFile(filename, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+            for column in SCENARIO_COLUMNS:
+                with archive.open(f"{column}.npy", "w", force_zip64=True) as member:
+                    np.lib.format.write_array(member, self.scenarios[column].to_numpy())
+            self._write_npy_member(archive, "x", (
+                self._positions(self.scenarios.iloc[start:start + step]) for start in range(0, len(self), step)
+            ))
+            self._write_npy_member(archive, "count_rate", (counts for _, _, counts in self.chunks()))
+        return filename
+
+    def to_parquet(self, filename: str) -> str:
+        """
+        Save the sweep as a long-format Parquet table with one row per (scenario, point),
+        written one chunk per row group.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for start, x_position, counts in self.chunks():
+                n_scenarios = counts.shape[0]
+                scenarios = self.scenarios.iloc[start:start + n_scenarios]
+                table = {
+                    "scenario": np.repeat(np.arange(start, start + n_scenarios), self.num_points),
+                    **{column: np.repeat(scenarios[column].to_numpy(), self.num_points) for column in SCENARIO_COLUMNS},
+                    "point": np.tile(np.arange(self.num_points), n_scenarios),
+                    "x": x_position.ravel().astype(np.float32),
+                    "count_rate": counts.ravel().astype(np.float32),
+                }
+                batch = pa.table(table)
+                if writer is None:
+                    writer = pq.ParquetWriter(filename, batch.schema)
+                writer.write_table(batch)
+        finally:
+            if writer is not None:
+                writer.close()
+        return filename
+
+    def save(self, output_dir: str, file_format: str) -> str:
+        """
+        Save the sweep to a file of its own in ``output_dir``, so concurrent sweeps never share a path;
+        the caller removes the file once it is served.
+        """
+        fd, filename = tempfile.mkstemp(dir=output_dir, prefix="sweep_", suffix=f".{file_format}")
+        os.close(fd)
+        try:
+            if file_format == "parquet":
+                return self.to_parquet(filename)
+            return self.to_npz(filename)
+        except BaseException:
+            os.remove(filename)
+            raise
@@ -1,8 +1,9 @@
+import io
 import os
 import pandas as pd
 import seaborn as sns
 
-from matplotlib import pyplot as plt
+from matplotlib.figure import Figure
 from dataclasses import dataclass
 from src.utils import mean_count_rate
 from src.config import OUTPUT_DIR, STEP, SRC_Y, CACHE
@@ -38,11 +39,18 @@ LEGEND = True
 
 @dataclass
 class PlotMaker:
+    """
+    Renders the figures with the object-oriented Agg API: every figure is a standalone ``Figure``
+    with no ``pyplot`` state, so several PlotMakers can render at the same time in different processes.
+    """
     data: pd.DataFrame | pd.Series
     output_file: str = None
+    output_dir: str = OUTPUT_DIR
+    buffer: io.BytesIO | None = None  # if given, figures are saved into it instead of ``output_file``
 
     def plot_count_rate(self, **kwargs) -> str:
-        figure, ax = plt.subplots(figsize=(16, 6))
+        figure = Figure(figsize=(16, 6))
+        ax = figure.subplots()
         x = self.data["x"]
         dist_predefined = kwargs["dist_predefined"]
         normalized = kwargs["normalized"]
@@ -53,53 +61,53 @@ class PlotMaker:
         if dist_predefined and not normalized:
             title = f"Count rate with predefined distance of {SRC_Y} meters"
             filename = "default_plot_non_normalized.png"
-            self.output_file = os.path.join(OUTPUT_DIR, filename)
+            self.output_file = os.path.join(self.output_dir, filename)
             y = self.data["generic_count_rate"]
 
             self.__set_ax_params(ax, title)
             ax.plot(x, y, lw=2, color="red")
 
-            plt.legend(legend, frameon=False, prop=LEGEND_PARAMS)
-            plt.savefig(self.output_file)
+            ax.legend(legend, frameon=False, prop=LEGEND_PARAMS)
+            self.__save(figure)
         if dist_predefined and normalized:
             title = f"Count rate with predefined distance of {SRC_Y} meters (Normalized)"
             filename = "default_plot_normalized.png"
-            self.output_file = os.path.join(OUTPUT_DIR, filename)
+            self.output_file = os.path.join(self.output_dir, filename)
             y = self.data["generic_count_rate_n"]
 
             self.__set_ax_params(ax, title)
             ax.plot(x, y, lw=2, color="red")
 
-            plt.legend(legend, frameon=False, prop=LEGEND_PARAMS)
-            plt.savefig(self.output_file)
+            ax.legend(legend, frameon=False, prop=LEGEND_PARAMS)
+            self.__save(figure)
         if not dist_predefined and not normalized:
             title = f"Count Rate vs. Distance (Source to detector distance step: {STEP} m.)"
             filename = "default_multiplot_non_normalized.png"
-            self.output_file = os.path.join(OUTPUT_DIR, filename)
+            self.output_file = os.path.join(self.output_dir, filename)
 
             self.__set_ax_params(ax, title)
             for column in columns:
                 ax.plot(self.data["x"], self.data[column], lw=2)
 
-            plt.legend(columns, frameon=False, prop=LEGEND_PARAMS)
-            plt.savefig(self.output_file)
+            ax.legend(columns, frameon=False, prop=LEGEND_PARAMS)
+            self.__save(figure)
         if not dist_predefined and normalized:
             title = f"Normalized count rate vs. Distance (Source to detector distance step: {STEP} m.)"
             filename = "default_multiplot_normalized.png"
-            self.output_file = os.path.join(OUTPUT_DIR, filename)
+            self.output_file = os.path.join(self.output_dir, filename)
 
             self.__set_ax_params(ax, title)
             for column in columns_norm:
                 ax.plot(x, self.data[column], lw=2)
 
-            plt.legend(columns_norm, frameon=False, prop=LEGEND_PARAMS)
-            plt.savefig(self.output_file)
+            ax.legend(columns_norm, frameon=False, prop=LEGEND_PARAMS)
+            self.__save(figure)
 
-        plt.close(figure)
         return self.output_file
 
     def plot_poisson(self, **kwargs) -> str:
-        figure, ax = plt.subplots(figsize=(16, 6))
+        figure = Figure(figsize=(16, 6))
+        ax = figure.subplots()
         x = self.data["x"]
         y = self.data["pois_data"]
         legend = ["Count rate"]
@@ -110,22 +118,22 @@ class PlotMaker:
             title = f"Poisson distribution for count rate (Speed: {kwargs['speed']} m per sec, Acquisition time: {kwargs['time']} sec)"
 
         filename = "poisson_plot.png"
-        self.output_file = os.path.join(OUTPUT_DIR, filename)
+        self.output_file = os.path.join(self.output_dir, filename)
         self.__set_ax_params(ax, title)
         ax.plot(x, y, lw=2, color="red")
 
-        plt.legend(legend, frameon=False, prop=LEGEND_PARAMS)
-        plt.savefig(self.output_file)
-        plt.close(figure)
+        ax.legend(legend, frameon=False, prop=LEGEND_PARAMS)
+        self.__save(figure)
         return self.output_file
 
     def plot_mcmc_sequence(self, **kwargs) -> str:
-        figure, ax = plt.subplots(figsize=(10, 6))
+        figure = Figure(figsize=(10, 6))
+        ax = figure.subplots()
         legend = ["Measurement Points", "MC simulated CPS"]
         title = "Fit of the peak in measurement time-series"
         filename = "mcmc_sequence_plot.png"
         ax.scatter(self.data.index, self.data['pois_data'], label='Measurement data', alpha=0.5)
-        self.output_file = os.path.join(OUTPUT_DIR, filename)
+        self.output_file = os.path.join(self.output_dir, filename)
         self.__set_ax_params(ax, title, labels={
             "x": "Measurement points along the road",
             "y": "Count rate, cps",
@@ -146,13 +154,13 @@ class PlotMaker:
             )
             ax.plot(green_line, linewidth=2, color=(0, 1, 0, 0.2))
 
-        plt.legend(legend, frameon=False, prop=LEGEND_PARAMS)
-        plt.savefig(self.output_file)
-        plt.close(figure)
+        ax.legend(legend, frameon=False, prop=LEGEND_PARAMS)
+        self.__save(figure)
         return self.output_file
 
     def plot_activity_density(self, **kwargs) -> str:
-        figure, ax = plt.subplots(figsize=(10, 6))
+        figure = Figure(figsize=(10, 6))
+        ax = figure.subplots()
         legend = ["Activity density", "Source activity"]
         title = "Posterior distribution of source activity"
         filename = "mcmc_activity_density.png"
@@ -162,21 +170,21 @@ class PlotMaker:
         else:
             raise KeyError
 
-        sns.kdeplot(res_burnin[:, 2], fill=True, color="b")
-        self.output_file = os.path.join(OUTPUT_DIR, filename)
+        sns.kdeplot(res_burnin[:, 2], fill=True, color="b", ax=ax)
+        self.output_file = os.path.join(self.output_dir, filename)
 
         self.__set_ax_params(ax, title, labels={
             "x": "Estimated activity, MBq",
             "y": "Density",
         })
-        plt.axvline(CACHE.get("activity"), color='r', ls='--')
-        plt.legend(legend, frameon=False, prop=LEGEND_PARAMS)
-        plt.savefig(self.output_file)
-        plt.close(figure)
+        ax.axvline(kwargs.get("activity", CACHE.get("activity")), color='r', ls='--')
+        ax.legend(legend, frameon=False, prop=LEGEND_PARAMS)
+        self.__save(figure)
         return self.output_file
 
     def plot_points(self, **kwargs) -> str:
-        figure, ax = plt.subplots(figsize=(10, 8))
+        figure = Figure(figsize=(10, 8))
+        ax = figure.subplots()
         title = "Posterior distribution for source position"
         filename = "mcmc_points.png"
 
@@ -185,26 +193,27 @@ class PlotMaker:
         else:
             raise KeyError
 
-        x = points.geometry.x
-        y = points.geometry.y
-        points_df = pd.DataFrame(zip(x, y), columns=['x', 'y'])
-
-        x_lim = points_df["x"].min(), points_df["x"].max()
-        y_lim = points_df["y"].min(), points_df["y"].max()
+        x = points[:, 0]
+        y = points[:, 1]
 
         hb = ax.hexbin(x, y, gridsize=35, bins='log', cmap='magma')
         cb = figure.colorbar(hb, ax=ax, label='Counts')
 
-        self.output_file = os.path.join(OUTPUT_DIR, filename)
+        self.output_file = os.path.join(self.output_dir, filename)
         self.__set_ax_params(ax, title, labels={
             "x": "x coordinate (m)",
             "y": "y coordinate (m)",
         })
-        plt.axhline(y=0, color='k', linestyle='-')
-        plt.savefig(self.output_file)
-        plt.close(figure)
+        ax.axhline(y=0, color='k', linestyle='-')
+        self.__save(figure)
         return self.output_file
 
+    def __save(self, figure: Figure) -> None:
+        if self.buffer is None:
+            figure.savefig(self.output_file)
+        else:
+            figure.savefig(self.buffer, format="png")
+
     @staticmethod
     def __set_ax_params(axes, title: str, labels: dict = None) -> None:
         """
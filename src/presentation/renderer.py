@@ -0,0 +1,83 @@
+import asyncio
+import io
+import multiprocessing
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+from src.config import RENDER_WORKERS
+from src.tools.metrics import timed
+
+
+def _warm_up() -> None:
+    """
+    Pool initializer: import the plotting stack once per worker instead of on its first figure.
+    """
+    import src.presentation.plot_maker
+
+
+def render_figure(data, method: str, kwargs: dict[str, Any]) -> tuple[str, bytes]:
+    """
+    Render one figure with a fresh ``PlotMaker`` into memory; runs inside a pool worker.
+    :param method: name of the ``PlotMaker`` plotting method
+    :return: file name and PNG content of the figure
+    """
+    from src.presentation.plot_maker import PlotMaker
+
+    plot_maker = PlotMaker(data=data, buffer=io.BytesIO())
+    filename = getattr(plot_maker, method)(**kwargs)
+    return os.path.basename(filename), plot_maker.buffer.getvalue()
+
+
+class PlotRenderer:
+    """
+    Renders figures into PNG bytes in a process pool off the event loop, several figures of a response
+    concurrently. Inside a pool worker, e.g. a background simulation job, figures are rendered
+    in the worker itself instead of spawning a nested pool.
+    """
+
+    def __init__(self, max_workers: int = RENDER_WORKERS):
+        self.max_workers = max_workers
+        self._pool: ProcessPoolExecutor | None = None
+
+    def start(self) -> ProcessPoolExecutor:
+        """
+        Start the pool ahead of the first request; workers import the plotting stack in the background.
+        """
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_warm_up)
+            for _ in range(self.max_workers):
+                self._pool.submit(int)
+        return self._pool
+
+    async def _render(self, data, method: str, kwargs: dict[str, Any]) -> tuple[str, bytes]:
+        if multiprocessing.parent_process() is not None:
+            return render_figure(data, method, kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.start(), render_figure, data, method, kwargs)
+
+    async def render(self, data, method: str, **kwargs) -> tuple[str, bytes]:
+        """
+        :return: file name and PNG content of the figure
+        """
+        with timed("rendering", figures=1):
+            return await self._render(data, method, kwargs)
+
+    async def render_many(self, data, figures: dict[str, tuple[str, dict[str, Any]]]) -> dict[str, tuple[str, bytes]]:
+        """
+        Render several figures of the same data concurrently.
+        :param figures: figure name to (``PlotMaker`` method name, method keyword arguments)
+        :return: figure name to (file name, PNG content)
+        """
+        with timed("rendering", figures=len(figures)):
+            rendered = await asyncio.gather(*(self._render(data, method, kwargs) for method, kwargs in figures.values()))
+        return dict(zip(figures, rendered))
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+
+plot_renderer = PlotRenderer()
@@ -0,0 +1,123 @@
+import os
+import shutil
+import zipfile
+
+from typing import Iterator
+
+from src.config import ARCHIVE_DEFLATE_LEVEL
+
+# an artifact kept in memory: archive member name and content
+Artifact = tuple[str, bytes]
+
+# formats that are compressed already and are stored as is
+STORED_SUFFIXES = (".png", ".jpg", ".zip", ".gz", ".npz", ".parquet")
+
+
+class _ChunkSink:
+    """
+    Write-only, non-seekable file object collecting what ``ZipFile`` writes until it is drained.
+    """
+
+    def __init__(self):
+        self.chunks: list[bytes] = []
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def stream_zip(
+        members: dict[str, bytes | str],
+        compresslevel: int = ARCHIVE_DEFLATE_LEVEL,
+        chunk_size: int = 2 ** 16,
+) -> Iterator[bytes]:
+    """
+    Build a zip archive incrementally and yield it chunk by chunk, without a file on disk.
+    Already compressed formats are stored, everything else is deflated at ``compresslevel``.
+    :param members: archive member name to its content, or to the path of a file to read it from
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compresslevel=compresslevel) as archive:
+        for arcname, content in members.items():
+            stored = arcname.lower().endswith(STORED_SUFFIXES)
+            archive.compression = zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED
+            with archive.open(arcname, "w") as member:
+                if isinstance(content, bytes):
+                    for start in range(0, len(content), chunk_size):
+                        member.write(content[start:start + chunk_size])
+                        yield sink.drain()
+                else:
+                    with open(content, "rb") as f:
+                        for block in iter(lambda: f.read(chunk_size), b""):
+                            member.write(block)
+                            yield sink.drain()
+            yield sink.drain()
+    yield sink.drain()
+
+
+def archive_members(artifacts: dict[str, Artifact | str]) -> dict[str, bytes | str]:
+    """
+    Archive members of in-memory artifacts and/or artifact files, keyed by member name.
+    """
+    members = {}
+    for artifact in artifacts.values():
+        if isinstance(artifact, tuple):
+            members[artifact[0]] = artifact[1]
+        else:
+            members[os.path.basename(artifact)] = artifact
+    return members
+
+
+def archive_name(artifacts: dict[str, Artifact | str]) -> str:
+    """
+    Download name of the archive: the name of its first member with a ``.zip`` extension.
+    """
+    first = next(iter(archive_members(artifacts)))
+    return f"{os.path.splitext(first)[0]}.zip"
+
+
+def write_artifacts(artifacts: dict[str, Artifact | str], output_dir: str) -> dict[str, str]:
+    """
+    Write in-memory artifacts to ``output_dir`` and move file artifacts there.
+    :return: artifact key to file path
+    """
+    paths = {}
+    for key, artifact in artifacts.items():
+        if isinstance(artifact, tuple):
+            filename, content = artifact
+            paths[key] = os.path.join(output_dir, filename)
+            with open(paths[key], "wb") as f:
+                f.write(content)
+        else:
+            paths[key] = shutil.move(artifact, os.path.join(output_dir, os.path.basename(artifact)))
+            _remove_empty_dir(os.path.dirname(artifact))
+    return paths
+
+
+def discard_artifacts(artifacts: dict[str, Artifact | str]) -> None:
+    """
+    Remove the files of file artifacts, and their spill directories once empty.
+    Only for artifacts produced by the request itself, never for result cache entries.
+    """
+    for artifact in artifacts.values():
+        if isinstance(artifact, str):
+            try:
+                os.remove(artifact)
+            except FileNotFoundError:
+                pass
+            _remove_empty_dir(os.path.dirname(artifact))
+
+
+def _remove_empty_dir(directory: str) -> None:
+    try:
+        os.rmdir(directory)
+    except OSError:
+        pass
@@ -1,31 +1,124 @@
-import csv
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
 import pandas as pd
 
 
+CACHE_SUFFIX = ".npy"
+META_SUFFIX = ".meta.json"
+
+
 class DataFormatter:
+    """
+    Loader of numeric CSV tables.
+
+    A table is parsed once with the vectorised pandas reader and validated, then stored next to the source
+    as a float64 ``.npy`` sidecar (``<file>.npy`` plus ``<file>.meta.json`` with the headers and the source
+    fingerprint). Later loads memory-map the sidecar as long as the source size and mtime, or failing that its
+    SHA-256, are unchanged.
+    """
+
+    def __init__(self, use_cache: bool = True):
+        self.use_cache = use_cache
 
     @staticmethod
-    def __csv_to_dict(filename):
+    def _fingerprint(filename: str) -> dict:
+        stat = os.stat(filename)
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    @staticmethod
+    def _sha256(filename: str) -> str:
+        digest = hashlib.sha256()
+        with open(filename, "rb") as f:
+            for block in iter(lambda: f.read(2 ** 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _parse(filename: str) -> tuple[list[str], np.ndarray]:
         """
-        Transform the data from csv file to dictionary with headers as keys.
-        :return: dictionary with headers as keys or ValueError
+        Parse and validate the table.
+        :return: headers and a C-contiguous (rows x columns) float64 array
+        :raise ValueError: if the table is empty, has duplicate headers or non-numeric or missing cells
         """
-
         with open(filename, newline='') as csvfile:
-            reader = csv.reader(csvfile, delimiter=',')
-            headers = [header.strip() for header in next(reader)]
-            data_dict = {header: [] for header in headers}
-            for row in reader:
-                for i, value in enumerate(row):
-                    try:
-                        data_dict[headers[i]].append(float(value))
-                    except ValueError as err:
-                        return err
-        return data_dict
+            headers = [header.strip() for header in csvfile.readline().split(",")]
+        if len(set(headers)) != len(headers):
+            raise ValueError(f"{filename}: duplicate column headers {headers}")
+
+        try:
+            data = pd.read_csv(filename, skipinitialspace=True, dtype=np.float64)
+        except ValueError:
+            # locate the offending cell for the error message
+            data = pd.read_csv(filename, skipinitialspace=True, dtype=str, keep_default_na=False)
+            data = data.apply(lambda column: pd.to_numeric(column.str.strip(), errors="coerce"))
+        if data.empty:
+            raise ValueError(f"{filename}: the table has no rows")
+
+        values = data.to_numpy(dtype=np.float64)
+        bad = np.isnan(values)
+        if bad.any():
+            row, column = np.argwhere(bad)[0]
+            raise ValueError(f"{filename}: missing or non-numeric value in column {headers[column]!r}, row {row + 2}")
+        return headers, np.ascontiguousarray(values)
+
+    def _load_cached(self, filename: str) -> tuple[list[str], np.ndarray] | None:
+        cache_file, meta_file = filename + CACHE_SUFFIX, filename + META_SUFFIX
+        try:
+            with open(meta_file) as f:
+                meta = json.load(f)
+            fingerprint = self._fingerprint(filename)
+            if {k: meta[k] for k in fingerprint} != fingerprint:
+                if meta["sha256"] != self._sha256(filename):
+                    return None
+                meta.update(fingerprint)
+                self._write_meta(meta_file, meta)
+            return meta["headers"], np.load(cache_file, mmap_mode="r")
+        except (OSError, ValueError, KeyError):
+            return None
+
+    @staticmethod
+    def _write_meta(meta_file: str, meta: dict) -> None:
+        fd, temp = tempfile.mkstemp(dir=os.path.dirname(meta_file), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(meta, f)
+        os.replace(temp, meta_file)
+
+    def _write_cache(self, filename: str, headers: list[str], array: np.ndarray) -> None:
+        """
+        Write the sidecar atomically so concurrent workers never map a partial file; a read-only
+        location simply leaves the table uncached.
+        """
+        try:
+            fd, temp = tempfile.mkstemp(dir=os.path.dirname(filename), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, array)
+            os.replace(temp, filename + CACHE_SUFFIX)
+            meta = {"headers": headers, "sha256": self._sha256(filename), **self._fingerprint(filename)}
+            self._write_meta(filename + META_SUFFIX, meta)
+        except OSError:
+            pass
+
+    def get_array(self, filename: str) -> tuple[list[str], np.ndarray]:
+        """
+        :return: column headers and the (rows x columns) float64 table, memory-mapped read-only when cached
+        """
+        if self.use_cache:
+            cached = self._load_cached(filename)
+            if cached is not None:
+                return cached
+
+        headers, array = self._parse(filename)
+        if self.use_cache:
+            self._write_cache(filename, headers, array)
+        return headers, array
 
     def get_dataframe(self, filename):
-        data = self.__csv_to_dict(filename)
-        return pd.DataFrame(data=data)
+        headers, array = self.get_array(filename)
+        return pd.DataFrame(array, columns=headers, copy=False)
 
 
 formatter = DataFormatter()
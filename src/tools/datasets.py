@@ -0,0 +1,298 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from contextlib import ExitStack
+from dataclasses import dataclass, asdict
+from typing import BinaryIO, Iterator
+
+from src.config import DATASETS_DIR, DATASET_CHUNK_ROWS
+from src.tools.metrics import timed
+
+
+METADATA = "metadata.json"
+# stored columns and their dtypes; the names are those of the generated data, so a survey can stand in for it
+COLUMNS = {
+    "time": np.float64,  # seconds since the first measurement; float32 would lose sub-second steps on long surveys
+    "x": np.float32,  # meters east of the origin, less the offset of the metadata
+    "y": np.float32,  # meters north of the origin, less the offset of the metadata
+    "pois_data": np.int32,  # counts of the measurement
+}
+WGS84_A = 6_378_137.0  # semi-major axis in meters
+WGS84_E2 = 6.694379990141317e-3  # first eccentricity squared
+_DATASET_ID = re.compile(r"[0-9a-f]{32}")
+
+
+@dataclass(frozen=True)
+class SurveySchema:
+    """
+    Column names of a survey log: timestamp (ISO 8601 or seconds since the epoch), WGS84 latitude and
+    longitude in degrees and the counts of every measurement.
+    """
+    time: str = "time"
+    lat: str = "lat"
+    lon: str = "lon"
+    counts: str = "counts"
+
+    @property
+    def columns(self) -> list[str]:
+        return [self.time, self.lat, self.lon, self.counts]
+
+
+def _ecef(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    lat, lon = np.radians(lat), np.radians(lon)
+    prime_vertical = WGS84_A / np.sqrt(1 - WGS84_E2 * np.sin(lat) ** 2)
+    return np.stack([
+        prime_vertical * np.cos(lat) * np.cos(lon),
+        prime_vertical * np.cos(lat) * np.sin(lon),
+        prime_vertical * (1 - WGS84_E2) * np.sin(lat),
+    ])
+
+
+def project_local(lat: np.ndarray, lon: np.ndarray, origin_lat: float, origin_lon: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    East and north offsets in meters of WGS84 positions from the origin, on the plane tangent to the
+    ellipsoid at the origin (ECEF to ENU); distances are shortened by a few millimeters at 10 km.
+    """
+    offset = _ecef(np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64)) - _ecef(np.float64(origin_lat), np.float64(origin_lon))[:, np.newaxis]
+    phi, lam = np.radians(origin_lat), np.radians(origin_lon)
+    east = -np.sin(lam) * offset[0] + np.cos(lam) * offset[1]
+    north = -np.sin(phi) * np.cos(lam) * offset[0] - np.sin(phi) * np.sin(lam) * offset[1] + np.cos(phi) * offset[2]
+    return east, north
+
+
+def read_chunks(source: str | BinaryIO, file_format: str, schema: SurveySchema, chunk_rows: int = DATASET_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Stream the schema columns of a CSV or Parquet log ``chunk_rows`` rows at a time.
+    Parquet requires pyarrow; an ImportError is raised if it is missing.
+    """
+    if file_format == "csv":
+        reader = pd.read_csv(source, usecols=lambda column: column in schema.columns, chunksize=chunk_rows)
+        with reader:
+            for chunk in reader:
+                _check_columns(chunk.columns, schema)
+                yield chunk
+    elif file_format == "parquet":
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(source)
+        _check_columns(parquet_file.schema_arrow.names, schema)
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=schema.columns):
+            yield batch.to_pandas()
+    else:
+        raise ValueError(f"Unsupported survey format {file_format!r}, expected 'csv' or 'parquet'")
+
+
+def _check_columns(columns, schema: SurveySchema) -> None:
+    missing = [column for column in schema.columns if column not in columns]
+    if missing:
+        raise ValueError(f"Missing survey columns: {', '.join(missing)}")
+
+
+def _numeric(chunk: pd.DataFrame, column: str, offset: int) -> np.ndarray:
+    values = pd.to_numeric(chunk[column], errors="coerce").to_numpy(dtype=np.float64)
+    _require(np.isfinite(values), column, "is not a finite number", offset)
+    return values
+
+
+def _seconds(chunk: pd.DataFrame, column: str, offset: int) -> np.ndarray:
+    """
+    Timestamps as seconds since the epoch: numeric columns are taken as such, others are parsed as dates.
+    """
+    if pd.api.types.is_numeric_dtype(chunk[column]):
+        return _numeric(chunk, column, offset)
+    stamps = pd.to_datetime(chunk[column], utc=True, errors="coerce")
+    _require(stamps.notna().to_numpy(), column, "is not a timestamp", offset)
+    return ((stamps - pd.Timestamp(0, tz="UTC")) / pd.Timedelta(seconds=1)).to_numpy(dtype=np.float64)
+
+
+def _require(valid: np.ndarray, column: str, problem: str, offset: int) -> None:
+    if not valid.all():
+        raise ValueError(f"Column {column!r} {problem} at row {offset + int(np.argmin(valid)) + 1}")
+
+
+class SurveyDataset:
+    """
+    Read-only stored survey. Every column is a memory-mapped array indexed like a dataframe column
+    (``dataset["x"]``), so a request only reads the pages it uses; a pickled dataset only carries its
+    path, so it is cheap to hand to job and rendering workers.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, METADATA)) as f:
+            self.metadata = json.load(f)
+        self._columns: dict[str, np.ndarray] = {}
+
+    def __reduce__(self):
+        return SurveyDataset, (self.path,)
+
+    def __len__(self) -> int:
+        return self.metadata["rows"]
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        if column not in self._columns:
+            # the dtype recorded at ingestion, so datasets stored with an older column layout stay readable
+            dtype = self.metadata.get("columns", {}).get(column, COLUMNS[column])
+            self._columns[column] = np.memmap(
+                os.path.join(self.path, f"{column}.bin"), dtype=dtype, mode="r", shape=(len(self),)
+            )
+        return self._columns[column]
+
+    @property
+    def dataset_id(self) -> str:
+        return self.metadata["dataset_id"]
+
+    def to_frame(self, max_rows: int | None = None) -> pd.DataFrame:
+        """
+        The columns as a dataframe, evenly strided down to at most ``max_rows`` rows; the index keeps
+        the row numbers of the survey.
+        """
+        stride = 1 if max_rows is None else max(1, -(-len(self) // max_rows))
+        return pd.DataFrame(
+            {column: np.asarray(self[column][::stride]) for column in COLUMNS},
+            index=np.arange(0, len(self), stride),
+        )
+
+
+class DatasetStore:
+    """
+    Directory of ingested surveys, one sub-directory per dataset id with a raw binary file per column
+    and a metadata manifest. Datasets are written into a staging directory and moved into place once
+    complete, so a failed upload leaves nothing behind.
+    """
+
+    def __init__(self, datasets_dir: str = DATASETS_DIR, chunk_rows: int = DATASET_CHUNK_ROWS):
+        self.datasets_dir = datasets_dir
+        self.chunk_rows = chunk_rows
+
+    def path(self, dataset_id: str) -> str:
+        """
+        :raise KeyError: if no such dataset is stored
+        """
+        path = os.path.join(self.datasets_dir, dataset_id)
+        if not _DATASET_ID.fullmatch(dataset_id) or not os.path.exists(os.path.join(path, METADATA)):
+            raise KeyError(dataset_id)
+        return path
+
+    def open(self, dataset_id: str) -> SurveyDataset:
+        return SurveyDataset(self.path(dataset_id))
+
+    def metadata(self) -> list[dict]:
+        """
+        Metadata of every stored dataset, oldest first.
+        """
+        if not os.path.isdir(self.datasets_dir):
+            return []
+        found = []
+        for dataset_id in os.listdir(self.datasets_dir):
+            manifest = os.path.join(self.datasets_dir, dataset_id, METADATA)
+            if _DATASET_ID.fullmatch(dataset_id) and os.path.exists(manifest):
+                with open(manifest) as f:
+                    found.append(json.load(f))
+        return sorted(found, key=lambda metadata: metadata["created"])
+
+    def delete(self, dataset_id: str) -> None:
+        shutil.rmtree(self.path(dataset_id))
+
+    def ingest(
+            self,
+            source: str | BinaryIO,
+            file_format: str,
+            schema: SurveySchema = SurveySchema(),
+            origin: tuple[float, float] | None = None,
+            name: str | None = None,
+    ) -> dict:
+        """
+        Parse, validate and project a survey log chunk by chunk and append every chunk to the column files,
+        so memory stays bounded by ``chunk_rows`` whatever the length of the survey. Timestamps must not
+        decrease, positions must be valid WGS84 coordinates and counts non-negative integers.
+        :param origin: latitude and longitude of the origin of the local coordinates; by default the plane
+        is tangent at the first measurement and the coordinates are then shifted so that the middle of the
+        track is at (0, 0), where the source prior is centred
+        :raise ValueError: if the log does not match the schema, naming the first invalid row
+        :return: metadata of the stored dataset
+        """
+        dataset_id = uuid.uuid4().hex
+        os.makedirs(self.datasets_dir, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=self.datasets_dir)
+        rows, start, last_time, counts_total = 0, None, -np.inf, 0
+        recentre = origin is None
+        low, high = np.full(2, np.inf), np.full(2, -np.inf)
+        try:
+            with ExitStack() as stack:
+                files = {column: stack.enter_context(open(os.path.join(staging, f"{column}.bin"), "wb")) for column in COLUMNS}
+                with timed("ingestion", format=file_format):
+                    for chunk in read_chunks(source, file_format, schema, self.chunk_rows):
+                        if chunk.empty:
+                            continue
+                        seconds = _seconds(chunk, schema.time, rows)
+                        lat, lon = _numeric(chunk, schema.lat, rows), _numeric(chunk, schema.lon, rows)
+                        counts = _numeric(chunk, schema.counts, rows)
+                        _require((np.abs(lat) <= 90) & (np.abs(lon) <= 180), f"{schema.lat}/{schema.lon}", "is out of range", rows)
+                        _require((counts >= 0) & (counts == np.round(counts)) & (counts <= np.iinfo(np.int32).max),
+                                 schema.counts, "is not a non-negative integer", rows)
+                        _require(np.diff(seconds, prepend=last_time) >= 0, schema.time, "decreases", rows)
+
+                        if start is None:
+                            start = seconds[0]
+                            origin = origin or (float(lat[0]), float(lon[0]))
+                        x, y = project_local(lat, lon, *origin)
+                        for column, values in (("time", seconds - start), ("x", x), ("y", y), ("pois_data", counts)):
+                            values.astype(COLUMNS[column]).tofile(files[column])
+
+                        low = np.minimum(low, [x.min(), y.min()])
+                        high = np.maximum(high, [x.max(), y.max()])
+                        counts_total += int(counts.sum())
+                        last_time = seconds[-1]
+                        rows += len(chunk)
+            if rows == 0:
+                raise ValueError("The survey has no measurements")
+
+            offset = (low + high) / 2 if recentre else np.zeros(2)
+            if recentre:
+                self._shift(staging, rows, offset)
+                low, high = low - offset, high - offset
+            metadata = {
+                "dataset_id": dataset_id,
+                "name": name,
+                "format": file_format,
+                "rows": rows,
+                "created": pd.Timestamp.now(tz="UTC").isoformat(),
+                "start_time": pd.Timestamp(start, unit="s", tz="UTC").isoformat(),
+                "duration_s": float(last_time - start),
+                "origin": {"lat": origin[0], "lon": origin[1]},
+                "offset": {"x": float(offset[0]), "y": float(offset[1])},
+                "bounds": {"x_min": float(low[0]), "x_max": float(high[0]), "y_min": float(low[1]), "y_max": float(high[1])},
+                "counts_total": counts_total,
+                "schema": asdict(schema),
+                "columns": {column: np.dtype(dtype).name for column, dtype in COLUMNS.items()},
+                "size_bytes": sum(os.path.getsize(os.path.join(staging, f"{column}.bin")) for column in COLUMNS),
+            }
+            with open(os.path.join(staging, METADATA), "w") as f:
+                json.dump(metadata, f)
+            os.replace(staging, os.path.join(self.datasets_dir, dataset_id))
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return metadata
+
+    def _shift(self, path: str, rows: int, offset: np.ndarray) -> None:
+        """
+        Subtract ``offset`` from the stored x and y columns in place, chunk by chunk.
+        """
+        for column, shift in zip(("x", "y"), offset):
+            values = np.memmap(os.path.join(path, f"{column}.bin"), dtype=COLUMNS[column], mode="r+", shape=(rows,))
+            for i in range(0, rows, self.chunk_rows):
+                values[i:i + self.chunk_rows] -= np.float32(shift)
+            values.flush()
+            del values
+
+
+dataset_store = DatasetStore()
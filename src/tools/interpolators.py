@@ -1,31 +1,59 @@
+import numpy as np
 import pandas as pd
 
-from scipy.interpolate import interp1d
 from src.tools.base_interpolator import BaseInterpolator
 
 
 class Interpolator(BaseInterpolator):
+    """
+    Linear interpolant of the ``x_column`` -> ``y_column`` table, built once from the dataframe.
+    Tables on a uniform grid are evaluated by direct index arithmetic, other tables by a prebuilt ``interp1d``.
+    """
+    x_column: str = None
+    y_column: str = None
 
     def __init__(self, data: pd.DataFrame):
         self.data = data
+        if self.x_column is None:
+            return
+
+        x = data[self.x_column].to_numpy(dtype=np.float64)
+        y = data[self.y_column].to_numpy(dtype=np.float64)
+        order = np.argsort(x, kind="stable")
+        self._x, self._y = x[order], y[order]
+        steps = np.diff(self._x)
+        self._uniform = self._x.size > 1 and np.allclose(steps, steps[0])
+        self._function = None
+        if not self._uniform:
+            from scipy.interpolate import interp1d
+            self._function = interp1d(self._x, self._y)
+
+    def _evaluate(self, values) -> np.ndarray:
+        if not self._uniform:
+            return self._function(values)
+
+        values = np.asarray(values, dtype=np.float64)
+        if np.any((values < self._x[0]) | (values > self._x[-1])):
+            raise ValueError("A value in x_new is out of the interpolation range.")
+        position = (values - self._x[0]) / (self._x[1] - self._x[0])
+        index = np.clip(position.astype(np.intp), 0, self._x.size - 2)
+        return self._y[index] + (position - index) * (self._y[index + 1] - self._y[index])
 
     def interpolate(self, x: pd.Series) -> pd.Series:
         pass
 
 
 class AttenuationInterpolator(Interpolator):
+    x_column = "energy_mev"
+    y_column = "mu"
 
     def interpolate(self, *args, scaling_factor=1000) -> float:
-        x = self.data["energy_mev"].to_numpy()
-        y = self.data["mu"].to_numpy()
-        f = interp1d(x, y)
-        return f(args[0] / scaling_factor)
+        return self._evaluate(args[0] / scaling_factor)
 
 
 class EfficiencyInterpolator(Interpolator):
+    x_column = "Angle"
+    y_column = "E_rel_662_80"
 
     def interpolate(self, *args, scaling_factor=1000) -> float:
-        x = self.data["Angle"].to_numpy()
-        y = self.data["E_rel_662_80"].to_numpy()
-        f = interp1d(x, y)
-        return f(args[0])
+        return self._evaluate(args[0])
@@ -0,0 +1,45 @@
+import json
+import logging
+import sys
+
+from datetime import datetime, timezone
+
+from src.config import LOG_LEVEL
+
+# attributes every LogRecord has; anything else was passed through ``extra`` and is emitted as a field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line with the timestamp, level, logger, message and the ``extra`` fields.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update({k: v for k, v in vars(record).items() if k not in _RECORD_ATTRIBUTES})
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def get_logger(level: str = LOG_LEVEL) -> logging.Logger:
+    """
+    Application logger writing structured lines to stderr; the handler is attached only once.
+    """
+    logger = logging.getLogger("gamma_analytics")
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(JsonFormatter())
+        logger.addHandler(handler)
+        logger.setLevel(level)
+        logger.propagate = False
+    return logger
+
+
+logger = get_logger()
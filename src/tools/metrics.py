@@ -0,0 +1,247 @@
+import math
+import threading
+
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Callable, Iterable, Iterator
+
+from src.config import STAGE_BUCKETS
+from src.tools.logs import logger
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Metric:
+    """
+    Base of the metric types: one value per combination of label values.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values: dict[tuple[str, ...], object] = {}
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, dict(zip(self.labels, key)), value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{name}{_format_labels(labels)} {_format_value(value)}" for name, labels, value in self.samples()]
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    """
+    Cumulative-bucket histogram in the Prometheus layout: ``_bucket``, ``_sum`` and ``_count`` series.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: tuple[float, ...], labels: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        for _, labels, (counts, total) in super().samples():
+            for bound, count in zip(self.buckets, counts):
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, count
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, counts[-1]
+
+
+class CallbackMetric(Metric):
+    """
+    Metric read from the application state at scrape time, e.g. the cache hit count.
+    """
+
+    def __init__(self, name: str, documentation: str, kind: str, read: Callable[[], float]):
+        super().__init__(name, documentation)
+        self.kind = kind
+        self.read = read
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        yield self.name, {}, self.read()
+
+
+class MetricsRegistry:
+    """
+    Metrics of this process, rendered in the Prometheus text exposition format.
+    """
+
+    def __init__(self):
+        self.metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, buckets: tuple[float, ...], labels: tuple[str, ...] = ()) -> Histogram:
+        return self.register(Histogram(name, documentation, buckets, labels))
+
+    def callback(self, name: str, documentation: str, kind: str, read: Callable[[], float]) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, kind, read))
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+metrics = MetricsRegistry()
+
+stage_seconds = metrics.histogram(
+    "gamma_stage_duration_seconds",
+    "Latency of the ingestion, generation, initialisation, inference, rendering, export and archiving stages",
+    buckets=STAGE_BUCKETS,
+    labels=("stage",),
+)
+mcmc_iterations = metrics.counter(
+    "gamma_mcmc_iterations_total", "MCMC iterations run in this process", labels=("sampler",)
+)
+mcmc_iterations_per_second = metrics.histogram(
+    "gamma_mcmc_iterations_per_second",
+    "Iterations per second of every chain",
+    buckets=(100, 300, 1_000, 3_000, 10_000, 30_000, 100_000),
+    labels=("sampler",),
+)
+mcmc_acceptance_rate = metrics.histogram(
+    "gamma_mcmc_acceptance_rate",
+    "Acceptance rate of every chain",
+    buckets=(0.05, 0.1, 0.15, 0.2, 0.25, 0.3, 0.4, 0.5, 0.7),
+    labels=("sampler",),
+)
+mcmc_sigma_mh = metrics.histogram(
+    "gamma_mcmc_sigma_mh",
+    "Adapted proposal scale sigma_mh of every Metropolis chain at the end of the run",
+    buckets=(1e-4, 1e-3, 1e-2, 0.1, 0.3, 1, 3, 10),
+    labels=("sampler",),
+)
+mcmc_step_size = metrics.histogram(
+    "gamma_mcmc_step_size",
+    "Adapted leapfrog step size of every NUTS chain at the end of the run",
+    buckets=(1e-3, 1e-2, 0.05, 0.1, 0.2, 0.5, 1),
+    labels=("sampler",),
+)
+mcmc_divergences = metrics.counter(
+    "gamma_mcmc_divergences_total", "Divergent NUTS trajectories in this process", labels=("sampler",)
+)
+
+
+@contextmanager
+def timed(stage: str, **fields) -> Iterator[None]:
+    """
+    Observe the duration of the block as ``stage`` and log it with ``fields``.
+    """
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = perf_counter() - start
+        stage_seconds.observe(elapsed, stage=stage)
+        logger.info("stage finished", extra={"stage": stage, "duration_s": round(elapsed, 6), **fields})
+
+
+def timed_iter(stage: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Pass ``chunks`` through, observing the time spent producing them, not the time the consumer
+    spends between chunks, as ``stage``.
+    """
+    elapsed = 0.0
+    size = 0
+    iterator = iter(chunks)
+    while True:
+        start = perf_counter()
+        chunk = next(iterator, None)
+        elapsed += perf_counter() - start
+        if chunk is None:
+            break
+        size += len(chunk)
+        yield chunk
+    stage_seconds.observe(elapsed, stage=stage)
+    logger.info("stage finished", extra={"stage": stage, "duration_s": round(elapsed, 6), "bytes": size})
+
+
+def observe_sampler(
+        sampler: str,
+        iterations: int,
+        seconds: float,
+        acceptance_rate: float,
+        sigma_mh: float | None = None,
+        step_size: float | None = None,
+        divergences: int | None = None,
+) -> None:
+    """
+    Record the health of a finished chain.
+    """
+    mcmc_iterations.inc(iterations, sampler=sampler)
+    mcmc_iterations_per_second.observe(iterations / max(seconds, 1e-9), sampler=sampler)
+    mcmc_acceptance_rate.observe(acceptance_rate, sampler=sampler)
+    if sigma_mh is not None:
+        mcmc_sigma_mh.observe(sigma_mh, sampler=sampler)
+    if step_size is not None:
+        mcmc_step_size.observe(step_size, sampler=sampler)
+    if divergences is not None:
+        mcmc_divergences.inc(divergences, sampler=sampler)
+    logger.info("chain finished", extra={
+        "sampler": sampler,
+        "iterations": iterations,
+        "iterations_per_second": round(iterations / max(seconds, 1e-9), 1),
+        "acceptance_rate": round(acceptance_rate, 4),
+        "sigma_mh": sigma_mh,
+        "step_size": step_size,
+        "divergences": divergences,
+    })
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from src.analytics.chain_store import PosteriorDraws
+from src.analytics.diagnostics import PARAM_NAMES
+from src.tools.archive import Artifact
+from src.config import CHAIN_DIR, POSTERIOR_THIN_POINTS, POSTERIOR_HIST_BINS, POSTERIOR_HPD_LEVELS
+
+
+def thin(draws: np.ndarray, max_points: int = POSTERIOR_THIN_POINTS) -> np.ndarray:
+    """
+    Every k-th draw so that at most ``max_points`` remain.
+    """
+    step = max(1, -(-len(draws) // max_points))
+    return draws[::step]
+
+
+def _feature_collection(features: list[dict]) -> dict:
+    return {"type": "FeatureCollection", "features": features}
+
+
+def _json_artifact(filename: str, data: dict) -> Artifact:
+    return filename, json.dumps(data).encode()
+
+
+def spill_file(filename: str, directory: str = CHAIN_DIR) -> str:
+    """
+    Path of ``filename`` in a fresh spill directory under ``directory``, so raw exports of long runs
+    are written to disk instead of memory; ``discard_artifacts`` removes it once it is served.
+    """
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(tempfile.mkdtemp(dir=directory, prefix="export_"), filename)
+
+
+def histogram(posterior: PosteriorDraws, bins: int = POSTERIOR_HIST_BINS) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    2-D histogram of the source positions normalised to a probability mass per cell,
+    accumulated chunk by chunk over the range recorded by the chain stores.
+    :return: mass of shape (x bins, y bins) and the x and y bin edges
+    """
+    minimum, maximum = posterior.minimum, posterior.maximum
+    extent = [[minimum[0], maximum[0]], [minimum[1], maximum[1]]]
+    for axis in extent:
+        if axis[0] == axis[1]:
+            axis[0], axis[1] = axis[0] - 0.5, axis[1] + 0.5
+    x_edges = np.linspace(*extent[0], bins + 1)
+    y_edges = np.linspace(*extent[1], bins + 1)
+    counts = np.zeros((bins, bins))
+    for chunk in posterior.chunks():
+        counts += np.histogram2d(chunk[:, 0], chunk[:, 1], bins=(x_edges, y_edges))[0]
+    return counts / counts.sum(), x_edges, y_edges
+
+
+def hpd_threshold(mass: np.ndarray, level: float) -> float:
+    """
+    Smallest cell mass of the highest posterior density region holding ``level`` of the total mass.
+    """
+    ordered = np.sort(mass.ravel())[::-1]
+    index = np.searchsorted(np.cumsum(ordered), level)
+    return ordered[min(index, ordered.size - 1)]
+
+
+def export_thinned_geojson(posterior: PosteriorDraws, max_points: int = POSTERIOR_THIN_POINTS) -> Artifact:
+    """
+    Thinned posterior samples as GeoJSON points carrying the activity and background of the draw.
+    """
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [x, y]},
+            "properties": {"activity": activity, "background": background},
+        }
+        for x, y, activity, background in thin(posterior.flat(max_points), max_points).tolist()
+    ]
+    return _json_artifact("source_points.geojson", _feature_collection(features))
+
+
+def export_histogram_geojson(posterior: PosteriorDraws, bins: int = POSTERIOR_HIST_BINS) -> Artifact:
+    """
+    Non-empty cells of the 2-D position histogram as GeoJSON polygons with their posterior mass.
+    """
+    mass, x_edges, y_edges = histogram(posterior, bins)
+    features = []
+    for i, j in zip(*np.nonzero(mass)):
+        x0, x1, y0, y1 = x_edges[i], x_edges[i + 1], y_edges[j], y_edges[j + 1]
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Polygon", "coordinates": [[[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]]},
+            "properties": {"mass": float(mass[i, j])},
+        })
+    return _json_artifact("source_histogram.geojson", _feature_collection(features))
+
+
+def export_hpd_geojson(
+        posterior: PosteriorDraws,
+        levels: tuple[float, ...] = POSTERIOR_HPD_LEVELS,
+        bins: int = POSTERIOR_HIST_BINS,
+) -> Artifact:
+    """
+    Highest posterior density regions of the source position as GeoJSON (multi)polygons, one per level.
+    Each region is the union of the histogram cells above the level's mass threshold.
+    """
+    from shapely import box, unary_union
+    from shapely.geometry import mapping
+
+    mass, x_edges, y_edges = histogram(posterior, bins)
+    features = []
+    for level in levels:
+        cells = np.argwhere(mass >= hpd_threshold(mass, level))
+        region = unary_union([box(x_edges[i], y_edges[j], x_edges[i + 1], y_edges[j + 1]) for i, j in cells])
+        features.append({"type": "Feature", "geometry": mapping(region), "properties": {"level": level}})
+    return _json_artifact("source_hpd.geojson", _feature_collection(features))
+
+
+def export_npy(posterior: PosteriorDraws) -> str:
+    """
+    Raw post burn-in draws as a float32 (draws x 4) NPY array, converted chunk by chunk into a spill file.
+    :return: path of the file
+    """
+    filename = spill_file("posterior_samples.npy")
+    header = {"descr": np.lib.format.dtype_to_descr(np.dtype(np.float32)), "fortran_order": False, "shape": (len(posterior), 4)}
+    try:
+        with open(filename, "wb") as f:
+            np.lib.format.write_array_header_1_0(f, header)
+            for chunk in posterior.chunks():
+                f.write(chunk.astype(np.float32).tobytes())
+    except BaseException:
+        shutil.rmtree(os.path.dirname(filename), ignore_errors=True)
+        raise
+    return filename
+
+
+def export_parquet(posterior: PosteriorDraws) -> str:
+    """
+    Raw post burn-in draws as a float32 Parquet table with one column per parameter, one row group per chunk,
+    written into a spill file.
+    :return: path of the file
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(name, pa.float32()) for name in PARAM_NAMES])
+    filename = spill_file("posterior_samples.parquet")
+    try:
+        with pq.ParquetWriter(filename, schema) as writer:
+            for chunk in posterior.chunks():
+                columns = chunk.astype(np.float32).T
+                writer.write_table(pa.Table.from_arrays(list(columns), schema=schema))
+    except BaseException:
+        shutil.rmtree(os.path.dirname(filename), ignore_errors=True)
+        raise
+    return filename
+
+
+EXPORTERS = {
+    "thinned": export_thinned_geojson,
+    "histogram": export_histogram_geojson,
+    "hpd": export_hpd_geojson,
+    "npy": export_npy,
+    "parquet": export_parquet,
+}
+
+
+async def export_posterior(posterior: PosteriorDraws, export_format: str) -> Artifact | str:
+    """
+    Serialise the post burn-in draws in the requested format in the default executor.
+    :param posterior: chain stores of the run
+    :param export_format: one of ``EXPORTERS``
+    :return: file name and content of the GeoJSON exports; path of the spill file of the raw draws
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, EXPORTERS[export_format], posterior)
@@ -0,0 +1,51 @@
+from src.tools.data_formatter import formatter
+from src.tools.interpolators import AttenuationInterpolator, EfficiencyInterpolator
+
+
+class ResponseTables:
+    """
+    Process-wide registry of the nuclib response tables.
+
+    Every table file is read once, its interpolant is built once, and attenuation coefficients
+    are memoised per (file, energy), so generators, the sweep engine and the likelihood share them.
+    """
+
+    def __init__(self):
+        self._efficiency: dict[str, EfficiencyInterpolator] = {}
+        self._attenuation: dict[str, AttenuationInterpolator] = {}
+        self._coefficients: dict[tuple[str, float], float] = {}
+
+    def efficiency(self, filename: str) -> EfficiencyInterpolator:
+        """
+        Relative angular efficiency interpolant of the detector table in ``filename``.
+        """
+        if filename not in self._efficiency:
+            self._efficiency[filename] = EfficiencyInterpolator(formatter.get_dataframe(filename))
+        return self._efficiency[filename]
+
+    def attenuation(self, filename: str) -> AttenuationInterpolator:
+        """
+        Attenuation coefficient interpolant of the table in ``filename``.
+        """
+        if filename not in self._attenuation:
+            self._attenuation[filename] = AttenuationInterpolator(formatter.get_dataframe(filename))
+        return self._attenuation[filename]
+
+    def attenuation_coefficient(self, filename: str, energy: float) -> float:
+        """
+        :param filename: attenuation table
+        :param energy: photon energy in keV
+        :return: linear attenuation coefficient in 1/m
+        """
+        key = (filename, energy)
+        if key not in self._coefficients:
+            self._coefficients[key] = float(self.attenuation(filename).interpolate(energy))
+        return self._coefficients[key]
+
+    def clear(self) -> None:
+        self._efficiency.clear()
+        self._attenuation.clear()
+        self._coefficients.clear()
+
+
+response_tables = ResponseTables()
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from collections import Counter, OrderedDict
+from enum import Enum
+from typing import Any
+
+from src.config import RESULT_CACHE_DIR, RESULT_CACHE_MAX_BYTES
+from src.tools.archive import Artifact
+from src.tools.metrics import metrics
+
+
+MANIFEST = "manifest.json"
+KEY_VERSION = 2  # bump when the layout of cached entries changes
+
+
+class ResultCache:
+    """
+    Content-addressed, size-bounded cache of request artifacts on disk.
+
+    Entries are keyed by a hash of the request parameters and the input dataset; each entry is a
+    directory holding copies of the artifacts plus a manifest. The least recently used entries are
+    evicted once the total size exceeds ``max_bytes``; entries pinned while a response streams them
+    are skipped until released.
+    """
+
+    def __init__(self, cache_dir: str = RESULT_CACHE_DIR, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, int] | None = None
+        self._pins: Counter[str] = Counter()
+
+    @property
+    def entries(self) -> OrderedDict[str, int]:
+        """
+        LRU index of entry sizes in bytes, loaded from disk on first use.
+        """
+        if self._entries is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            found = []
+            for key in os.listdir(self.cache_dir):
+                manifest = os.path.join(self.cache_dir, key, MANIFEST)
+                if os.path.exists(manifest):
+                    with open(manifest) as f:
+                        found.append((os.path.getmtime(manifest), key, json.load(f)["size"]))
+            self._entries = OrderedDict((key, size) for _, key, size in sorted(found))
+        return self._entries
+
+    @property
+    def size(self) -> int:
+        return sum(self.entries.values())
+
+    @staticmethod
+    def key(namespace: str, params: dict[str, Any], dataset: str | None = None) -> str:
+        """
+        Hash of the request parameters and, if given, of the content of the dataset file.
+        """
+        digest = hashlib.sha256(f"{KEY_VERSION}:{namespace}".encode())
+        normalized = {k: v.value if isinstance(v, Enum) else v for k, v in params.items()}
+        digest.update(json.dumps(normalized, sort_keys=True, default=str).encode())
+        if dataset is not None:
+            with open(dataset, "rb") as f:
+                for block in iter(lambda: f.read(2 ** 20), b""):
+                    digest.update(block)
+        return digest.hexdigest()
+
+    def get(self, key: str, pin: bool = False) -> dict[str, str] | None:
+        """
+        :param pin: keep the entry from eviction until ``release`` is called, e.g. while its files are streamed
+        :return: artifact name to cached file path, or None on a miss
+        """
+        if key not in self.entries:
+            self.misses += 1
+            return None
+
+        entry_dir = os.path.join(self.cache_dir, key)
+        manifest = os.path.join(entry_dir, MANIFEST)
+        with open(manifest) as f:
+            files = json.load(f)["files"]
+        os.utime(manifest)
+        self.entries.move_to_end(key)
+        self.hits += 1
+        if pin:
+            self._pins[key] += 1
+        return {name: os.path.join(entry_dir, filename) for name, filename in files.items()}
+
+    def put(self, key: str, files: dict[str, str | Artifact]) -> dict[str, str]:
+        """
+        Store the artifacts in the cache and evict old entries if needed.
+        :param files: artifact name to file path, or to (file name, content) of an in-memory artifact
+        :return: artifact name to cached file path
+        """
+        entry_dir = os.path.join(self.cache_dir, key)
+        filenames = {
+            name: artifact[0] if isinstance(artifact, tuple) else os.path.basename(artifact)
+            for name, artifact in files.items()
+        }
+        if key not in self.entries:
+            staging = tempfile.mkdtemp(dir=self.cache_dir)
+            size = 0
+            for name, artifact in files.items():
+                target = os.path.join(staging, filenames[name])
+                if isinstance(artifact, tuple):
+                    with open(target, "wb") as f:
+                        f.write(artifact[1])
+                else:
+                    shutil.copyfile(artifact, target)
+                size += os.path.getsize(target)
+            with open(os.path.join(staging, MANIFEST), "w") as f:
+                json.dump({"size": size, "files": filenames}, f)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(staging, entry_dir)
+            self.entries[key] = size
+            self._evict(keep=key)
+        return {name: os.path.join(entry_dir, filename) for name, filename in filenames.items()}
+
+    def release(self, key: str) -> None:
+        """
+        Unpin an entry returned by ``get(key, pin=True)`` and evict what was kept over the budget meanwhile.
+        """
+        self._pins[key] -= 1
+        if self._pins[key] <= 0:
+            del self._pins[key]
+            self._evict()
+
+    def _evict(self, keep: str | None = None) -> None:
+        for key in list(self.entries):
+            if self.size <= self.max_bytes:
+                break
+            if key == keep or key in self._pins:
+                continue
+            del self.entries[key]
+            shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "entries": len(self.entries),
+            "size_bytes": self.size,
+            "max_bytes": self.max_bytes,
+        }
+
+
+result_cache = ResultCache()
+
+metrics.callback("gamma_result_cache_hits_total", "Result cache lookups that found an entry", "counter", lambda: result_cache.hits)
+metrics.callback("gamma_result_cache_misses_total", "Result cache lookups that found no entry", "counter", lambda: result_cache.misses)
+metrics.callback(
+    "gamma_result_cache_hit_ratio",
+    "Share of result cache lookups that found an entry",
+    "gauge",
+    lambda: result_cache.hits / max(result_cache.hits + result_cache.misses, 1),
+)
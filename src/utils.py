@@ -1,12 +1,8 @@
-import os
 import numpy as np
 import pandas as pd
-import geopandas as gpd
-import zipfile
 
 from typing import Tuple
-from geopandas import GeoDataFrame
-from src.config import SRC_Y, SRC_X, OUTPUT_DIR, EFFICIENCY, SCALE, BRANCH_RATIO, mu_air
+from src.config import SRC_Y, SRC_X, EFFICIENCY, SCALE, BRANCH_RATIO, get_mu_air
 
 
 async def generate_coordinates(distance: int) -> Tuple[np.ndarray, np.ndarray]:
@@ -61,17 +57,6 @@ async def create_dataframe(data: dict) -> pd.DataFrame:
     return pd.DataFrame(data)
 
 
-def zip_files(files: list[str]):
-    basename, _ = os.path.splitext(files[0])
-    zip_filename = f"{basename}.zip"
-    print(f"Creating {zip_filename}")
-
-    with zipfile.ZipFile(zip_filename, "w", zipfile.ZIP_DEFLATED) as zip_f:
-        for f in files:
-            zip_f.write(filename=f, arcname=os.path.basename(f))
-    return zip_filename
-
-
 async def make_normalization(data_to_normalize: pd.DataFrame):
     only_gen_data = data_to_normalize.iloc[:, 2::1]
     norm_data = only_gen_data.apply(lambda x: x / x.max(), axis=0)
@@ -80,12 +65,6 @@ async def make_normalization(data_to_normalize: pd.DataFrame):
     return pd.concat([data_to_normalize, norm_data], axis=1)
 
 
-async def make_points_grid(geodata_array: np.ndarray) -> GeoDataFrame:
-    points_gdf = gpd.GeoDataFrame(geometry=gpd.points_from_xy(geodata_array[:, 0], geodata_array[:, 1]))
-    points_gdf.to_file(os.path.join(OUTPUT_DIR, 'source_points.geojson'), driver='GeoJSON')
-    return points_gdf
-
-
 def mean_count_rate(
         x_position,
         y_position,
@@ -96,5 +75,17 @@ def mean_count_rate(
         det_eff=EFFICIENCY,
 ):
     dist = np.sqrt((x_position - src_x) ** 2 + (y_position - src_y) ** 2)
-    count_rate = (activity * SCALE * BRANCH_RATIO * det_eff * np.exp(-mu_air * dist)) / (4 * np.pi * dist ** 2)
-    return np.round(count_rate, 2) + bkg
\ No newline at end of file
+    count_rate = source_count_rate(dist, activity, det_eff)
+    return np.round(count_rate, 2) + bkg
+
+
+def source_count_rate(dist, activity, det_eff=EFFICIENCY):
+    """
+    Unrounded count rate produced by the source alone (no background) at the given distance.
+    Broadcasts over ``dist`` and ``activity``, so it can be evaluated for many points and sources at once.
+    :param dist: source to detector distance(s) in meters
+    :param activity: source activity performed in MBq
+    :param det_eff: detector efficiency
+    :return: count rate in cps
+    """
+    return (activity * SCALE * BRANCH_RATIO * det_eff * np.exp(-get_mu_air() * dist)) / (4 * np.pi * dist ** 2)
\ No newline at end of file
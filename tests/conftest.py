@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from src.analytics.distributions import PoissonLikelihood
+from src.config import BKG_COUNT_RATE
+from src.utils import source_count_rate
+
+SOURCE = np.array([0.0, 60.0, 100.0, BKG_COUNT_RATE])  # x, y, activity in MBq, background in cps
+
+
+def simulate_track(x: np.ndarray, source: np.ndarray = SOURCE, seed: int = 0) -> PoissonLikelihood:
+    """
+    Poisson counts along the road (y = 0) at the positions ``x`` for a source at ``source``.
+    """
+    y = np.zeros_like(x)
+    rate = source_count_rate(np.hypot(x - source[0], y - source[1]), source[2]) + source[3]
+    counts = np.random.default_rng(seed).poisson(rate).astype(np.float64)
+    return PoissonLikelihood(x, y, counts)
+
+
+@pytest.fixture(scope="session")
+def track() -> PoissonLikelihood:
+    return simulate_track(np.arange(-300.0, 301.0, 5.0))
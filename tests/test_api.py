@@ -0,0 +1,77 @@
+import pandas as pd
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.api import api
+from src.api.api import analytics_router
+from src.tools.result_cache import ResultCache
+
+
+@pytest.fixture(scope="module")
+def client() -> TestClient:
+    app = FastAPI()
+    app.include_router(analytics_router)
+    return TestClient(app)
+
+
+def test_ensemble_sampler_rejects_several_chains(client):
+    response = client.get("/simulate/summary", params={"sampler": "ensemble", "chains": 2})
+    assert response.status_code == 400
+    assert "walkers" in response.json()["detail"]
+
+
+@pytest.mark.parametrize("path", ["/simulate", "/simulate/summary", "/jobs/simulate"])
+def test_burn_in_must_leave_draws(client, path):
+    request = client.post if path.startswith("/jobs") else client.get
+    response = request(path, params={"sim_number": 1000, "burn_in": 1000})
+    assert response.status_code == 400
+    assert "burn_in" in response.json()["detail"]
+
+
+def test_stream_answers_every_message(client):
+    with client.websocket_connect("/stream", params={"particles": 200, "seed": 0}) as websocket:
+        websocket.send_json({"x": [0.0, 5.0], "y": [0.0, 0.0], "counts": [30, 28]})
+        assert websocket.receive_json()["n_points"] == 2
+        websocket.send_json({"x": [0.0], "y": [0.0]})
+        assert "error" in websocket.receive_json()
+
+
+@pytest.fixture
+def generated(monkeypatch, tmp_path, track):
+    """
+    Generated data and a result cache of their own in a temporary directory.
+    """
+    pd.DataFrame({"x": track.x, "y": track.y, "pois_data": track.counts}).to_csv(tmp_path / "generated_data.csv", index=False)
+    cache = ResultCache(cache_dir=str(tmp_path / "cache"))
+    monkeypatch.setattr(api, "OUTPUT_DIR", str(tmp_path))
+    monkeypatch.setattr(api, "result_cache", cache)
+    return cache
+
+
+def test_only_seeded_summaries_are_cached(client, generated):
+    params = {"sim_number": 2000, "burn_in": 500}
+    client.get("/simulate/summary", params=params)
+    assert len(generated.entries) == 0
+
+    first = client.get("/simulate/summary", params={**params, "seed": 1}).json()
+    second = client.get("/simulate/summary", params={**params, "seed": 1}).json()
+    assert generated.hits == 1
+    assert second["parameters"] == first["parameters"]
+    assert second["runtime"]["sampling_s"] == 0.0
+    assert second["runtime"]["total_s"] < first["runtime"]["total_s"]
+
+
+def test_summary_reports_every_chain_and_parameter(client, generated):
+    summary = client.get("/simulate/summary", params={"sim_number": 2000, "burn_in": 500, "chains": 2, "seed": 3}).json()
+    assert summary["chains"] == 2
+    assert summary["draws_per_chain"] == 1500
+    assert set(summary["parameters"]) == {"x", "y", "activity", "background"}
+    assert len(summary["stopping"]) == 2
+
+
+def test_metrics_are_exposed_for_prometheus(client):
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE gamma_stage_duration_seconds histogram" in response.text
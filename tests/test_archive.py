@@ -0,0 +1,45 @@
+import io
+import os
+import zipfile
+
+from src.tools.archive import archive_members, archive_name, discard_artifacts, stream_zip, write_artifacts
+
+
+def test_stream_zip_round_trip(tmp_path):
+    data = os.urandom(200_000)
+    path = tmp_path / "mcmc_points.png"
+    path.write_bytes(data[:70_000])
+    members = {"generated_data.csv": b"x,y\n" * 50_000, "samples.npy": data, "mcmc_points.png": str(path)}
+
+    chunks = list(stream_zip(members, chunk_size=2 ** 12))
+    assert len(chunks) > 1
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == list(members)
+        assert archive.read("generated_data.csv") == members["generated_data.csv"]
+        assert archive.read("samples.npy") == data
+        assert archive.read("mcmc_points.png") == data[:70_000]
+        assert archive.getinfo("generated_data.csv").compress_type == zipfile.ZIP_DEFLATED
+        assert archive.getinfo("mcmc_points.png").compress_type == zipfile.ZIP_STORED
+
+
+def test_archive_members_and_name(tmp_path):
+    artifacts = {"figure": ("poisson_plot.png", b"png"), "data": str(tmp_path / "generated_data.csv")}
+    assert archive_members(artifacts) == {"poisson_plot.png": b"png", "generated_data.csv": artifacts["data"]}
+    assert archive_name(artifacts) == "poisson_plot.zip"
+
+
+def test_file_artifacts_are_moved_and_discarded(tmp_path):
+    spill = tmp_path / "spill"
+    spill.mkdir()
+    (spill / "posterior_samples.npy").write_bytes(b"npy")
+    output = tmp_path / "output"
+    output.mkdir()
+
+    paths = write_artifacts({"diagnostics": ("mcmc_diagnostics.json", b"{}"), "posterior": str(spill / "posterior_samples.npy")}, str(output))
+    assert sorted(os.listdir(output)) == ["mcmc_diagnostics.json", "posterior_samples.npy"]
+    assert not spill.exists()
+
+    # in-memory artifacts are left alone, and directories that still hold files are kept
+    discard_artifacts({"diagnostics": ("mcmc_diagnostics.json", b"{}"), "posterior": paths["posterior"]})
+    assert os.listdir(output) == ["mcmc_diagnostics.json"]
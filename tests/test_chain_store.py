@@ -0,0 +1,65 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from src.analytics.chain_store import ChainStore, PosteriorDraws
+
+
+@pytest.fixture
+def states() -> np.ndarray:
+    return np.random.default_rng(0).normal(size=(5000, 4))
+
+
+@pytest.mark.parametrize("max_memory_mb", [64, 0])
+def test_append_and_extend_keep_the_same_thinned_draws(states, tmp_path, max_memory_mb):
+    appended = ChainStore(len(states), burn_in=1000, thin=3, max_memory_mb=max_memory_mb, directory=str(tmp_path))
+    extended = ChainStore(len(states), burn_in=1000, thin=3, max_memory_mb=max_memory_mb, directory=str(tmp_path))
+    for state in states:
+        appended.append(state)
+    for block in np.array_split(states, 7):
+        extended.extend(block)
+
+    expected = states[1000::3]
+    assert len(appended) == len(extended) == appended.capacity == len(expected)
+    np.testing.assert_array_equal(appended.draws, expected)
+    np.testing.assert_array_equal(extended.draws, expected)
+    assert (appended.path is not None) == (max_memory_mb == 0)
+
+
+def test_running_moments_match_numpy(states):
+    store = ChainStore(len(states))
+    store.extend(states)
+    np.testing.assert_allclose(store.mean, states.mean(axis=0))
+    np.testing.assert_allclose(store.variance, states.var(axis=0, ddof=1))
+    np.testing.assert_array_equal(store.minimum, states.min(axis=0))
+    np.testing.assert_array_equal(store.maximum, states.max(axis=0))
+
+
+def test_a_spilled_store_hands_its_file_to_the_unpickled_copy(states, tmp_path):
+    store = ChainStore(len(states), max_memory_mb=0, directory=str(tmp_path))
+    store.extend(states)
+    copy = pickle.loads(pickle.dumps(store))
+    del store
+
+    np.testing.assert_array_equal(copy.draws, states)
+    path = copy.path
+    copy.close()
+    assert not os.path.exists(path)
+
+
+def test_pooled_moments_count_walkers_as_chains(states):
+    walkers = ChainStore(1250, shape=(4, 4))
+    walkers.extend(states.reshape(1250, 4, 4))
+    single = ChainStore(len(states))
+    single.extend(states)
+    posterior = PosteriorDraws([walkers, single])
+
+    pooled = np.concatenate([states, states])
+    assert posterior.n_chains == 5
+    assert len(posterior) == len(pooled)
+    np.testing.assert_allclose(posterior.mean, pooled.mean(axis=0))
+    np.testing.assert_allclose(posterior.variance, pooled.var(axis=0, ddof=1))
+    assert posterior.chain_array(None).shape == (5, 1250, 4)
+    assert sum(len(chunk) for chunk in posterior.chunks(1000)) == len(pooled)
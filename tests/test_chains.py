@@ -0,0 +1,23 @@
+import asyncio
+
+import numpy as np
+
+from src.analytics.chains import dispersed_starts, run_chains
+from tests.conftest import SOURCE
+
+
+def test_dispersed_starts_keep_the_first_chain_and_alternate_sides():
+    starts = dispersed_starts(SOURCE, 5, np.random.default_rng(0))
+    np.testing.assert_array_equal(starts[0], SOURCE)
+    assert (np.sign(starts[1:, 1]) == [-1, 1, -1, 1]).all()
+    assert (starts[:, 2:] > 0).all()
+
+
+def test_a_fixed_seed_reproduces_every_chain(track):
+    first, acceptance = asyncio.run(run_chains(track, SOURCE, chains=2, simnum=1500, burn_in=500, seed=7))
+    second, _ = asyncio.run(run_chains(track, SOURCE, chains=2, simnum=1500, burn_in=500, seed=7))
+    assert first.n_chains == 2 and first.draws_per_chain == 1000
+    assert acceptance.shape == (2,)
+    np.testing.assert_array_equal(first.chain_array(), second.chain_array())
+    # chains get their own RNG streams
+    assert not np.array_equal(first.chain_array()[0], first.chain_array()[1])
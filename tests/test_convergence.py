@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from src.analytics.chain_store import ChainStore
+from src.analytics.convergence import BatchMeans, StoppingRule
+from src.analytics.samplers import MetropolisSampler
+from tests.conftest import SOURCE
+
+
+def ar1(n: int, rho: float, seed: int = 0) -> np.ndarray:
+    noise = np.random.default_rng(seed).normal(size=(n, 4))
+    chain = np.empty_like(noise)
+    chain[0] = noise[0]
+    for i in range(1, n):
+        chain[i] = rho * chain[i - 1] + np.sqrt(1 - rho ** 2) * noise[i]
+    return chain
+
+
+def test_ess_of_independent_draws_is_close_to_their_number():
+    estimator = BatchMeans()
+    estimator.extend(np.random.default_rng(0).normal(size=(20_000, 4)))
+    assert np.all(estimator.ess() > 0.6 * estimator.count)
+    np.testing.assert_allclose(estimator.rhat(), 1.0, atol=0.02)
+
+
+def test_ess_of_a_correlated_chain_follows_its_autocorrelation_time():
+    estimator = BatchMeans()
+    estimator.extend(ar1(50_000, rho=0.9))
+    expected = estimator.count * (1 - 0.9) / (1 + 0.9)
+    assert np.all((estimator.ess() > expected / 2) & (estimator.ess() < expected * 2))
+
+
+def test_blocks_of_any_size_give_the_same_estimates():
+    draws = ar1(10_000, rho=0.5)
+    whole, pieces = BatchMeans(max_batches=16), BatchMeans(max_batches=16)
+    whole.extend(draws)
+    for block in np.array_split(draws, 37):
+        pieces.extend(block)
+    assert (whole.batches, whole.batch_size) == (pieces.batches, pieces.batch_size)
+    np.testing.assert_allclose(pieces.ess(), whole.ess())
+
+
+def test_rhat_flags_a_drifting_chain():
+    draws = np.random.default_rng(1).normal(size=(8000, 4)) + np.linspace(0, 5, 8000)[:, np.newaxis]
+    estimator = BatchMeans()
+    estimator.extend(draws)
+    assert np.all(estimator.rhat() > 1.5)
+
+
+def test_split_shares_the_ess_target_between_chains():
+    rule = StoppingRule(target_ess=1000, max_rhat=1.01)
+    assert rule.split(4) == StoppingRule(target_ess=250, max_rhat=1.01)
+    assert rule.split(1) is rule
+
+
+@pytest.mark.parametrize("rule, reason", [
+    (StoppingRule(target_ess=5, interval=500), "target_ess"),
+    (StoppingRule(max_seconds=0, interval=500), "max_seconds"),
+    (StoppingRule(interval=500), "max_iterations"),
+])
+def test_monitor_ends_the_run_and_reports_why(track, rule, reason):
+    store = ChainStore(20_000)
+    monitor = rule.monitor(store)
+    MetropolisSampler(track, init_params=SOURCE, seed=1).run(20_000, store=store, monitor=monitor)
+
+    report = monitor.report()
+    assert report["reason"] == reason
+    assert report["iterations"] == len(store)
+    assert (len(store) < 20_000) == (reason != "max_iterations")
+    if reason == "target_ess":
+        assert min(report["ess"].values()) >= 5
@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+import pytest
+
+from src.tools.data_formatter import CACHE_SUFFIX, META_SUFFIX, DataFormatter
+
+
+@pytest.fixture
+def table(tmp_path) -> str:
+    filename = str(tmp_path / "table.csv")
+    with open(filename, "w") as f:
+        f.write("Angle, E_rel_662_80\n0, 1.0\n10, 0.9\n20, 0.7\n")
+    return filename
+
+
+def test_table_is_parsed_once_then_memory_mapped(table):
+    headers, array = DataFormatter().get_array(table)
+    assert headers == ["Angle", "E_rel_662_80"]
+    assert os.path.exists(table + CACHE_SUFFIX) and os.path.exists(table + META_SUFFIX)
+
+    cached_headers, cached = DataFormatter().get_array(table)
+    assert cached_headers == headers
+    assert isinstance(cached, np.memmap)
+    np.testing.assert_array_equal(cached, array)
+
+
+def test_a_changed_table_is_parsed_again(table):
+    DataFormatter().get_array(table)
+    with open(table, "a") as f:
+        f.write("30, 0.5\n")
+    _, array = DataFormatter().get_array(table)
+    assert array.shape == (4, 2)
+
+
+def test_a_touched_but_unchanged_table_keeps_its_sidecar(table):
+    DataFormatter().get_array(table)
+    stat = os.stat(table)
+    os.utime(table, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert isinstance(DataFormatter().get_array(table)[1], np.memmap)
+
+
+@pytest.mark.parametrize("content, message", [
+    ("a,a\n1,2\n", "duplicate"),
+    ("a,b\n", "no rows"),
+    ("a,b\n1,x\n", "column 'b', row 2"),
+])
+def test_invalid_tables_are_rejected(tmp_path, content, message):
+    filename = tmp_path / "bad.csv"
+    filename.write_text(content)
+    with pytest.raises(ValueError, match=message):
+        DataFormatter(use_cache=False).get_array(str(filename))
@@ -0,0 +1,57 @@
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.tools.datasets import DatasetStore
+
+
+def survey_csv(rows: int = 250, **overrides) -> io.BytesIO:
+    survey = pd.DataFrame({
+        "time": pd.date_range("2024-05-01T10:00:00Z", periods=rows, freq="s").strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "lat": 48.85 + np.arange(rows) * 1e-5,
+        "lon": np.full(rows, 2.35),
+        "counts": np.arange(rows) % 7,
+        **overrides,
+    })
+    return io.BytesIO(survey.to_csv(index=False).encode())
+
+
+@pytest.fixture
+def store(tmp_path) -> DatasetStore:
+    # small chunks so that every survey is ingested in several of them
+    return DatasetStore(datasets_dir=str(tmp_path / "datasets"), chunk_rows=64)
+
+
+def test_survey_is_ingested_in_chunks_and_centred(store):
+    metadata = store.ingest(survey_csv(), "csv", name="north track")
+    dataset = store.open(metadata["dataset_id"])
+
+    assert len(dataset) == metadata["rows"] == 250
+    np.testing.assert_array_equal(dataset["time"], np.arange(250))
+    np.testing.assert_array_equal(dataset["pois_data"], np.arange(250) % 7)
+    # about 1.11 m per 1e-5 degree of latitude, along the y axis
+    assert np.diff(dataset["y"]).mean() == pytest.approx(1.11, abs=0.01)
+    assert metadata["bounds"]["y_min"] == pytest.approx(-metadata["bounds"]["y_max"], abs=1e-3)
+    assert [item["name"] for item in store.metadata()] == ["north track"]
+    assert len(dataset.to_frame(max_rows=100)) == 84
+
+
+@pytest.mark.parametrize("overrides, message", [
+    ({"counts": [1.5] + [0] * 249}, "'counts' is not a non-negative integer at row 1"),
+    ({"lat": [48.85] * 200 + [95.0] * 50}, "'lat/lon' is out of range at row 201"),
+    ({"time": list(range(100, 0, -1)) + list(range(150))}, "'time' decreases at row 2"),
+])
+def test_invalid_rows_are_reported_and_nothing_is_stored(store, overrides, message):
+    with pytest.raises(ValueError, match=message):
+        store.ingest(survey_csv(**overrides), "csv")
+    assert os.listdir(store.datasets_dir) == []
+
+
+def test_deleted_dataset_is_gone(store):
+    dataset_id = store.ingest(survey_csv(), "csv")["dataset_id"]
+    store.delete(dataset_id)
+    with pytest.raises(KeyError):
+        store.open(dataset_id)
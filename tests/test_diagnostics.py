@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from src.analytics.diagnostics import chain_diagnostics, effective_sample_size, split_rhat
+
+
+def ar1_chains(phi: float, chains: int = 4, draws: int = 20_000, params: int = 2, seed: int = 0) -> np.ndarray:
+    """
+    Stationary AR(1) chains with unit marginal variance.
+    """
+    rng = np.random.default_rng(seed)
+    noise = rng.standard_normal((chains, draws, params)) * np.sqrt(1 - phi ** 2)
+    out = np.empty_like(noise)
+    out[:, 0] = rng.standard_normal((chains, params))
+    for t in range(1, draws):
+        out[:, t] = phi * out[:, t - 1] + noise[:, t]
+    return out
+
+
+def test_rhat_of_converged_chains_is_one():
+    chains = np.random.default_rng(1).standard_normal((4, 2000, 3))
+    np.testing.assert_allclose(split_rhat(chains), 1.0, atol=0.01)
+
+
+def test_rhat_detects_chains_in_different_places():
+    chains = np.random.default_rng(2).standard_normal((4, 2000, 1))
+    chains[0] += 2.0
+    assert split_rhat(chains)[0] > 1.1
+
+
+def test_rhat_detects_a_trend_within_a_chain():
+    # a single chain drifting from 0 to 3: its two halves disagree
+    chains = np.random.default_rng(3).standard_normal((1, 2000, 1)) + np.linspace(0, 3, 2000)[np.newaxis, :, np.newaxis]
+    assert split_rhat(chains)[0] > 1.1
+
+
+def test_ess_of_independent_draws_is_the_sample_size():
+    chains = np.random.default_rng(4).standard_normal((4, 5000, 2))
+    np.testing.assert_allclose(effective_sample_size(chains), 20_000, rtol=0.1)
+
+
+@pytest.mark.parametrize("phi", [0.5, 0.9])
+def test_ess_of_ar1_chains(phi):
+    chains = ar1_chains(phi)
+    expected = chains.shape[0] * chains.shape[1] * (1 - phi) / (1 + phi)
+    np.testing.assert_allclose(effective_sample_size(chains), expected, rtol=0.15)
+
+
+def test_chain_diagnostics_are_keyed_by_parameter():
+    diagnostics = chain_diagnostics(np.random.default_rng(5).standard_normal((2, 500, 4)))
+    assert list(diagnostics) == ["x", "y", "activity", "background"]
+    assert all(set(values) == {"r_hat", "ess"} for values in diagnostics.values())
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+from scipy.stats import poisson
+
+from src.analytics.distributions import PoissonLikelihood
+from src.utils import source_count_rate
+from tests.conftest import SOURCE, simulate_track
+
+PARAMS = np.array([
+    SOURCE,
+    [20.0, -45.0, 40.0, 8.0],
+    [-150.0, 10.0, 5000.0, 15.0],
+    [0.0, 60.0, -1.0, 10.0],  # negative activity
+    [3000.0, 0.0, 100.0, 10.0],  # beyond MAX_SOURCE_DISTANCE
+])
+
+
+def test_log_likelihood_matches_the_poisson_pmf(track):
+    for x, y, act, bkg in PARAMS[:3]:
+        rate = source_count_rate(np.hypot(track.x - x, track.y - y), act) + bkg
+        expected = poisson.logpmf(track.counts, rate).sum()
+        assert np.isclose(track.log_likelihood(np.array([x, y, act, bkg])), expected, rtol=1e-12)
+
+
+def test_batch_matches_scalar(track):
+    batch = track.log_likelihood_batch(PARAMS)
+    scalar = np.array([track.log_likelihood(params) for params in PARAMS])
+    np.testing.assert_allclose(batch, scalar, rtol=1e-12)
+    assert np.isneginf(batch[3:]).all()
+
+
+@pytest.mark.parametrize("params", PARAMS[:3])
+def test_gradient_matches_scalar_and_finite_differences(track, params):
+    value, gradient = track.log_likelihood_gradient(params)
+    assert value == pytest.approx(track.log_likelihood(params), rel=1e-12)
+
+    steps = np.array([1e-4, 1e-4, 1e-4 * params[2], 1e-6 * params[3]])
+    numeric = np.empty(4)
+    for i, h in enumerate(steps):
+        shift = np.zeros(4)
+        shift[i] = h
+        numeric[i] = (track.log_likelihood(params + shift) - track.log_likelihood(params - shift)) / (2 * h)
+    np.testing.assert_allclose(gradient, numeric, rtol=1e-5, atol=1e-6)
+
+
+def test_gradient_outside_support_is_zero(track):
+    value, gradient = track.log_likelihood_gradient(PARAMS[3])
+    assert value == -np.inf
+    assert not gradient.any()
+
+
+def test_cutoff_is_exact_on_short_tracks(track):
+    # the index is forced on, but the cutoff disc covers the whole short track
+    indexed = PoissonLikelihood(track.x, track.y, track.counts, index_min_points=0)
+    assert indexed.indexed
+    np.testing.assert_array_equal(indexed.log_likelihood_batch(PARAMS), track.log_likelihood_batch(PARAMS))
+    for params in PARAMS[:3]:
+        assert indexed.log_likelihood(params) == track.log_likelihood(params)
+
+
+def test_cutoff_matches_exact_on_long_tracks():
+    long_track = simulate_track(np.arange(-10_000.0, 10_000.0, 1.0), seed=1)
+    exact = PoissonLikelihood(long_track.x, long_track.y, long_track.counts, cutoff=0)
+    assert long_track.indexed and not exact.indexed
+
+    for params in PARAMS[:3]:
+        x, y, act, bkg = params
+        value, gradient = long_track.log_likelihood_gradient(params)
+        exact_value, exact_gradient = exact.log_likelihood_gradient(params)
+        assert value == pytest.approx(long_track.log_likelihood(params), rel=1e-12)
+
+        near = long_track._near(x, y, act, bkg)
+        if near is None:
+            assert value == exact_value
+            continue
+        # beyond the cutoff the source adds less than ``cutoff * bkg`` to the rate of every measurement
+        far = np.ones(len(long_track), dtype=bool)
+        far[near] = False
+        counts = long_track.counts[far]
+        bound = long_track.cutoff * np.maximum(counts, bkg).sum()
+        assert abs(value - exact_value) <= bound
+        assert abs(long_track.log_likelihood(params) - exact.log_likelihood(params)) <= bound
+        assert abs(long_track.log_likelihood_batch(params[np.newaxis])[0] - exact_value) <= bound
+        np.testing.assert_allclose(gradient[:2], exact_gradient[:2], atol=1e-3)
+        assert abs(gradient[2] - exact_gradient[2]) <= bound / act
+        assert abs(gradient[3] - exact_gradient[3]) <= long_track.cutoff * counts.sum() / bkg
+
+
+@pytest.mark.parametrize("along_y", [False, True])
+def test_indexed_batch_matches_scalar_on_long_tracks(along_y):
+    long_track = simulate_track(np.arange(-10_000.0, 10_000.0, 1.0), seed=2)
+    rng = np.random.default_rng(3)
+    params = np.column_stack([
+        rng.uniform(-1500, 1500, 200), rng.uniform(-300, 300, 200), rng.uniform(0, 5000, 200), rng.uniform(0, 20, 200),
+    ])
+    params[:5, 2] = 0.0  # no source: empty near-sets
+    params[5:10, 2] = 1e9  # discs covering the whole track
+    params[10, 3] = 0.0  # no background: the whole track
+    if along_y:
+        long_track = PoissonLikelihood(long_track.y, long_track.x, long_track.counts)
+        params[:, :2] = params[:, 1::-1]
+    assert long_track.indexed
+
+    batch = long_track.log_likelihood_batch(params)
+    scalar = np.array([long_track.log_likelihood(row) for row in params])
+    np.testing.assert_allclose(batch, scalar, rtol=1e-10)
@@ -0,0 +1,36 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from src.data_generators.angular_data_generator import AngularDataGenerator
+from src.data_generators.regular_data_generator import RegularDataGenerator
+from src.data_generators.velocity_data_generator import VelocityDataGenerator
+
+GENERATORS = [RegularDataGenerator, AngularDataGenerator, VelocityDataGenerator]
+
+
+def generate(generator_class, **kwargs):
+    x = np.arange(-100.0, 101.0)
+    kwargs = {
+        "coordinates": (x, np.zeros_like(x)), "activity": 100, "speed": 10.0, "road_span": -100,
+        "num_points": len(x), "time": 1.0, **kwargs,
+    }
+    return asyncio.run(generator_class(**kwargs).generate_data())
+
+
+@pytest.mark.parametrize("generator_class", GENERATORS)
+def test_a_fixed_seed_reproduces_the_counts(generator_class):
+    first, second = generate(generator_class, seed=5), generate(generator_class, seed=5)
+    np.testing.assert_array_equal(first["pois_data"], second["pois_data"])
+    assert not np.array_equal(first["pois_data"], generate(generator_class, seed=6)["pois_data"])
+
+
+@pytest.mark.parametrize("generator_class", GENERATORS)
+def test_replicates_are_independent_draws_of_the_same_rate(generator_class):
+    data = generate(generator_class, seed=5, replicates=3)
+    tracks = data[["pois_data", "pois_data_1", "pois_data_2"]].to_numpy()
+
+    np.testing.assert_array_equal(tracks, np.round(tracks))
+    assert not np.array_equal(tracks[:, 0], tracks[:, 1])
+    np.testing.assert_array_equal(data["pois_data"], generate(generator_class, seed=5, replicates=3)["pois_data"])
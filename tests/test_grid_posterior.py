@@ -0,0 +1,40 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.analytics.grid_posterior import GridPosterior, default_grid
+from src.api.run_posterior import run_grid_posterior
+from tests.conftest import SOURCE
+
+
+@pytest.fixture(scope="module")
+def grid(track) -> tuple[np.ndarray, np.ndarray]:
+    return default_grid(track, step=10.0, y_extent=200.0)
+
+
+def test_grid_posterior_locates_the_source(track, grid):
+    result = GridPosterior(track, *grid).evaluate()
+    assert result["position"].shape == (grid[1].size, grid[0].size)
+    assert result["position"].sum() == pytest.approx(1.0)
+    x, y, activity, background = result["map"]
+    assert abs(x - SOURCE[0]) < 20 and abs(abs(y) - SOURCE[1]) < 30
+    assert SOURCE[2] / 2 < activity < SOURCE[2] * 2
+    assert abs(background - SOURCE[3]) < 2
+
+
+def test_chunking_does_not_change_the_result(track, grid):
+    whole = GridPosterior(track, *grid).evaluate()
+    chunked = GridPosterior(track, *grid, max_memory_mb=0.01)
+    assert chunked.chunk_size < grid[0].size * grid[1].size
+    result = chunked.evaluate(activity_axis=whole["activity"])
+    np.testing.assert_allclose(result["position"], whole["position"], rtol=1e-9, atol=1e-15)
+    np.testing.assert_allclose(result["activity_density"], whole["activity_density"], rtol=1e-9)
+
+
+def test_run_grid_posterior_returns_json_ready_lists(track):
+    dataframe = pd.DataFrame({"x": track.x, "y": track.y, "pois_data": track.counts})
+    result = asyncio.run(run_grid_posterior(dataframe, step=20.0, y_extent=150.0, profile=True, max_memory_mb=64))
+    assert set(result) == {"x", "y", "position", "activity", "activity_density", "map", "mean", "runtime"}
+    assert isinstance(result["position"], list) and list(result["map"]) == ["x", "y", "activity", "background"]
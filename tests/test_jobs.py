@@ -0,0 +1,49 @@
+import os
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from src.api.jobs import ChainProgress, JobManager, JobProgress, JobStatus, SimulationCancelled
+
+
+class FakeSampler:
+    acceptance_rate = 0.25
+
+
+def test_chain_progress_publishes_the_chain_state():
+    shared = {}
+    progress = JobProgress(shared, threading.Event(), total=2000)(chain=1)
+    progress(FakeSampler(), 1000)
+
+    assert shared[1]["done"] == 1000
+    assert shared[1]["total"] == 2000
+    assert shared[1]["acceptance_rate"] == 0.25
+    assert shared[1]["iterations_per_second"] > 0
+
+
+def test_chain_progress_aborts_a_cancelled_run():
+    cancel_event = threading.Event()
+    progress = ChainProgress({}, cancel_event, chain=0, total=2000)
+    cancel_event.set()
+    with pytest.raises(SimulationCancelled):
+        progress(FakeSampler(), 1000)
+
+
+def test_job_manager_runs_a_simulation(track, tmp_path):
+    dataframe = pd.DataFrame({"x": track.x, "y": track.y, "pois_data": track.counts})
+    manager = JobManager(max_workers=1, history=4, jobs_dir=str(tmp_path))
+    try:
+        job_id = manager.submit(dataframe, {"simnum": 2000, "burn_in": 500, "seed": 1})
+        manager.get(job_id).future.result(timeout=300)
+        deadline = time.time() + 10
+        while manager.status(job_id)["status"] != JobStatus.DONE and time.time() < deadline:
+            time.sleep(0.05)
+
+        status = manager.status(job_id)
+        assert status["status"] == JobStatus.DONE
+        assert status["percent_complete"] == 100.0
+        assert all(os.path.exists(path) for path in manager.get(job_id).result.values())
+    finally:
+        manager.shutdown()
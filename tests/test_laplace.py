@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from src.analytics.distributions import PoissonLikelihood, to_unconstrained
+from src.analytics.laplace import LaplaceApproximation, MapSearchFailed, laplace_approximation
+from tests.conftest import SOURCE
+
+
+@pytest.fixture(scope="module")
+def laplace(track) -> LaplaceApproximation:
+    return laplace_approximation(track)
+
+
+def test_map_is_found_on_either_side_of_the_road(laplace):
+    x, y, activity, background = laplace.map_params
+    assert abs(x - SOURCE[0]) < 10
+    assert abs(abs(y) - SOURCE[1]) < 15
+    assert SOURCE[2] / 1.5 < activity < SOURCE[2] * 1.5
+    assert abs(background - SOURCE[3]) < 2
+    assert laplace.weights.sum() == pytest.approx(1.0)
+    assert np.all(np.diff(laplace.log_posteriors) <= 0)
+
+
+def test_mirror_modes_are_kept_apart(laplace):
+    # the road is straight, so the source is equally likely on both sides
+    assert len(laplace.modes) >= 2
+    assert np.sign(laplace.modes[0, 1]) != np.sign(laplace.modes[1, 1])
+
+
+def test_proposal_covariance_is_positive_definite(laplace):
+    assert np.all(np.linalg.eigvalsh(laplace.proposal_covariance) > 0)
+    np.testing.assert_allclose(laplace.inverse_mass, np.diag(laplace.covariances[0]))
+
+
+def test_sample_draws_from_the_mixture():
+    modes = to_unconstrained(np.array([[0.0, 60.0, 100.0, 3.0], [0.0, -60.0, 100.0, 3.0]]))
+    covariances = np.stack([np.diag([1.0, 1.0, 0.01, 0.01])] * 2)
+    approximation = LaplaceApproximation(modes, covariances, np.array([-10.0, -10.0]))
+    draws = approximation.sample(20_000, np.random.default_rng(0))
+
+    assert draws.shape == (20_000, 4)
+    assert np.mean(draws[:, 1] > 0) == pytest.approx(0.5, abs=0.02)
+    assert np.all(draws[:, 2:] > 0)
+    assert len(approximation.summary()) == 2
+
+
+def test_search_fails_without_a_finite_posterior():
+    x = np.arange(-50.0, 51.0, 5.0)
+    empty = PoissonLikelihood(x, np.zeros_like(x), np.full(x.shape, np.nan))
+    with pytest.raises(MapSearchFailed):
+        laplace_approximation(empty)
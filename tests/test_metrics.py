@@ -0,0 +1,67 @@
+import pytest
+
+from src.tools.metrics import MetricsRegistry, stage_seconds, timed, timed_iter
+
+
+@pytest.fixture
+def registry() -> MetricsRegistry:
+    return MetricsRegistry()
+
+
+def test_counter_and_gauge_render_in_the_text_format(registry):
+    requests = registry.counter("requests_total", "Requests", labels=("route",))
+    requests.inc(route="/simulate")
+    requests.inc(2, route="/simulate")
+    registry.gauge("queue_size", "Queued jobs").set(3)
+
+    assert registry.render() == (
+        "# HELP requests_total Requests\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{route="/simulate"} 3.0\n'
+        "# HELP queue_size Queued jobs\n"
+        "# TYPE queue_size gauge\n"
+        "queue_size 3.0\n"
+    )
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(1.0, 0.1))
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value)
+
+    samples = {(name, labels.get("le")): value for name, labels, value in latency.samples()}
+    assert samples[("latency_seconds_bucket", "0.1")] == 1
+    assert samples[("latency_seconds_bucket", "1.0")] == 2
+    assert samples[("latency_seconds_bucket", "+Inf")] == 3
+    assert samples[("latency_seconds_sum", None)] == pytest.approx(5.55)
+    assert samples[("latency_seconds_count", None)] == 3
+
+
+def test_labels_are_checked_and_escaped(registry):
+    errors = registry.counter("errors_total", "Errors", labels=("detail",))
+    with pytest.raises(ValueError):
+        errors.inc(route="/simulate")
+    errors.inc(detail='a "quoted"\nline')
+    assert 'errors_total{detail="a \\"quoted\\"\\nline"} 1.0' in errors.render()
+    with pytest.raises(ValueError):
+        registry.counter("errors_total", "Errors")
+
+
+def test_callback_metric_is_read_at_scrape_time(registry):
+    state = {"hits": 1}
+    registry.callback("hits_total", "Hits", "counter", lambda: state["hits"])
+    state["hits"] = 4
+    assert "hits_total 4.0" in registry.render()
+
+
+def stage_count(stage: str) -> int:
+    return next((value for name, labels, value in stage_seconds.samples()
+                 if name.endswith("_count") and labels["stage"] == stage), 0)
+
+
+def test_timed_blocks_and_iterators_observe_their_stage():
+    before = stage_count("test-stage")
+    with timed("test-stage"):
+        pass
+    assert b"".join(timed_iter("test-stage", [b"ab", b"c"])) == b"abc"
+    assert stage_count("test-stage") == before + 2
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from src.analytics.distributions import PoissonLikelihood
+from src.analytics.particle_filter import MeasurementCells, ParticleFilter
+from tests.conftest import SOURCE, simulate_track
+
+
+@pytest.fixture(scope="module")
+def long_track() -> PoissonLikelihood:
+    return simulate_track(np.arange(-2000.0, 2000.0, 1.0), seed=3)
+
+
+def test_stream_converges_towards_the_source(track):
+    particle_filter = ParticleFilter(particles=1000, seed=0)
+    for batch in np.array_split(np.arange(len(track)), 12):
+        summary = particle_filter.update(track.x[batch], track.y[batch], track.counts[batch])
+    assert summary["n_points"] == len(track)
+    assert abs(summary["mean"]["x"] - SOURCE[0]) < 20
+    assert abs(summary["mean"]["background"] - SOURCE[3]) < 3
+
+
+@pytest.mark.parametrize("message", [
+    ([1.0, 2.0], [0.0], [3.0]),
+    ([], [], []),
+    ([1.0], [0.0], [float("nan")]),
+    ([1.0], [0.0], [-1.0]),
+])
+def test_malformed_messages_leave_the_filter_unchanged(message):
+    particle_filter = ParticleFilter(particles=100, seed=1)
+    particle_filter.update([0.0], [0.0], [12.0])
+    weights = particle_filter.log_weights.copy()
+    with pytest.raises(ValueError):
+        particle_filter.update(*message)
+    assert particle_filter.n_points == 1
+    np.testing.assert_array_equal(particle_filter.log_weights, weights)
+
+
+def test_a_long_batch_is_tempered_instead_of_collapsing(long_track):
+    particle_filter = ParticleFilter(particles=500, x_range=(-500, 500), seed=2)
+    summary = particle_filter.update(long_track.x, long_track.y, long_track.counts)
+    assert summary["ess"] >= particle_filter.ess_threshold * particle_filter.particles
+    assert len(np.unique(particle_filter.state, axis=0)) > particle_filter.particles / 4
+    assert summary["std"]["activity"] > 1
+    assert abs(summary["mean"]["x"] - SOURCE[0]) < 10
+    assert SOURCE[2] / 1.5 < summary["mean"]["activity"] < SOURCE[2] * 1.5
+
+
+def test_cells_split_all_the_way_down_are_exact(long_track):
+    params = np.array([SOURCE, [300.0, -20.0, 1000.0, 5.0], [-1500.0, 80.0, 10.0, 12.0]])
+    exact = PoissonLikelihood(long_track.x, long_track.y, long_track.counts, cutoff=0)
+    expected = exact.log_likelihood_batch(params) + exact.log_factorial_sum
+    cells = MeasurementCells(long_track.x, long_track.y, long_track.counts, np.ones(len(long_track)), opening=1e9)
+    np.testing.assert_allclose(cells.log_likelihood(params), expected, rtol=1e-12)
+
+
+def test_cell_expansion_stays_close_to_the_exact_likelihood(long_track):
+    rng = np.random.default_rng(4)
+    params = np.column_stack([rng.normal(0, 20, 200), rng.choice([-1, 1], 200) * rng.uniform(10, 150, 200), rng.uniform(20, 500, 200), rng.normal(10, 1, 200)])
+    exact = PoissonLikelihood(long_track.x, long_track.y, long_track.counts, cutoff=0)
+    expected = exact.log_likelihood_batch(params) + exact.log_factorial_sum
+    cells = MeasurementCells(long_track.x, long_track.y, long_track.counts, np.ones(len(long_track)))
+    np.testing.assert_allclose(cells.log_likelihood(params), expected, rtol=1e-4, atol=0.5)
+
+
+def test_cell_weights_scale_the_likelihood(track):
+    params = np.array([SOURCE])
+    full = MeasurementCells(track.x, track.y, track.counts, np.ones(len(track)))
+    tempered = MeasurementCells(track.x, track.y, track.counts, np.full(len(track), 0.25))
+    np.testing.assert_allclose(tempered.log_likelihood(params), 0.25 * full.log_likelihood(params), rtol=1e-12)
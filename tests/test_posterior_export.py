@@ -0,0 +1,76 @@
+import asyncio
+import json
+import os
+
+import numpy as np
+import pytest
+
+from src.analytics.chain_store import PosteriorDraws
+from src.config import POSTERIOR_HPD_LEVELS
+from src.tools.archive import discard_artifacts
+from src.tools.posterior_export import export_posterior, hpd_threshold, thin
+
+
+@pytest.fixture
+def posterior() -> PosteriorDraws:
+    draws = np.random.default_rng(0).normal([0.0, 60.0, 100.0, 3.0], [5.0, 5.0, 10.0, 0.1], size=(2, 3000, 4))
+    posterior = PosteriorDraws.from_array(draws)
+    yield posterior
+    posterior.close()
+
+
+def export(posterior: PosteriorDraws, export_format: str):
+    return asyncio.run(export_posterior(posterior, export_format))
+
+
+def test_thin_keeps_at_most_max_points():
+    assert len(thin(np.arange(10_001), 1000)) <= 1000
+    assert len(thin(np.arange(10), 1000)) == 10
+
+
+def test_hpd_threshold_covers_the_level():
+    mass = np.array([[0.5, 0.2], [0.2, 0.1]])
+    assert mass[mass >= hpd_threshold(mass, 0.6)].sum() >= 0.6
+    assert hpd_threshold(mass, 0.5) == 0.5
+
+
+def test_thinned_points_carry_activity_and_background(posterior):
+    filename, content = export(posterior, "thinned")
+    features = json.loads(content)["features"]
+    assert filename == "source_points.geojson"
+    assert 0 < len(features) <= len(posterior)
+    assert set(features[0]["properties"]) == {"activity", "background"}
+
+
+def test_histogram_cells_hold_the_whole_mass(posterior):
+    _, content = export(posterior, "histogram")
+    masses = [feature["properties"]["mass"] for feature in json.loads(content)["features"]]
+    assert sum(masses) == pytest.approx(1.0)
+    assert min(masses) > 0
+
+
+def test_hpd_has_one_region_per_level(posterior):
+    pytest.importorskip("shapely")
+    _, content = export(posterior, "hpd")
+    levels = [feature["properties"]["level"] for feature in json.loads(content)["features"]]
+    assert levels == list(POSTERIOR_HPD_LEVELS)
+
+
+def test_npy_spill_file_holds_every_draw(posterior):
+    filename = export(posterior, "npy")
+    try:
+        np.testing.assert_array_equal(np.load(filename), posterior.flat(None).astype(np.float32))
+    finally:
+        discard_artifacts({"posterior": filename})
+    assert not os.path.exists(os.path.dirname(filename))
+
+
+def test_parquet_has_one_row_per_draw(posterior):
+    pq = pytest.importorskip("pyarrow.parquet")
+    filename = export(posterior, "parquet")
+    try:
+        table = pq.read_table(filename)
+        assert table.num_rows == len(posterior)
+        assert table.column_names == ["x", "y", "activity", "background"]
+    finally:
+        discard_artifacts({"posterior": filename})
@@ -0,0 +1,30 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.presentation.renderer import PlotRenderer
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+@pytest.fixture(scope="module")
+def renderer():
+    renderer = PlotRenderer(max_workers=2)
+    yield renderer
+    renderer.shutdown()
+
+
+def test_figures_are_rendered_in_memory_by_the_pool(renderer, track):
+    data = pd.DataFrame({"x": track.x, "y": track.y, "pois_data": track.counts})
+    points = np.random.default_rng(0).normal([0.0, 60.0], 5.0, size=(500, 2))
+    figures = asyncio.run(renderer.render_many(data, {
+        "first": ("plot_points", {"points": points}),
+        "second": ("plot_points", {"points": points[:100]}),
+    }))
+
+    assert list(figures) == ["first", "second"]
+    for filename, content in figures.values():
+        assert filename == "mcmc_points.png"
+        assert content.startswith(PNG_SIGNATURE)
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.interpolate import interp1d
+
+from src.tools import response_tables
+from src.tools.data_formatter import DataFormatter
+from src.tools.interpolators import EfficiencyInterpolator
+from src.tools.response_tables import ResponseTables
+
+
+@pytest.mark.parametrize("angles", [np.arange(0.0, 91.0, 10.0), np.array([0.0, 5.0, 20.0, 45.0, 90.0])])
+def test_interpolant_matches_interp1d(angles):
+    efficiency = np.cos(np.radians(angles)) + 0.1
+    interpolator = EfficiencyInterpolator(pd.DataFrame({"Angle": angles[::-1], "E_rel_662_80": efficiency[::-1]}))
+    values = np.linspace(0.0, 90.0, 37)
+    np.testing.assert_allclose(interpolator.interpolate(values), interp1d(angles, efficiency)(values))
+    with pytest.raises(ValueError):
+        interpolator.interpolate(np.array([91.0]))
+
+
+class CountingFormatter(DataFormatter):
+    reads = 0
+
+    def get_dataframe(self, filename):
+        self.reads += 1
+        return super().get_dataframe(filename)
+
+
+def test_tables_are_read_once_and_coefficients_memoised(tmp_path, monkeypatch):
+    table = str(tmp_path / "attenuation.csv")
+    pd.DataFrame({"energy_mev": [0.5, 0.6, 0.7], "mu": [0.011, 0.010, 0.009]}).to_csv(table, index=False)
+    formatter = CountingFormatter()
+    monkeypatch.setattr(response_tables, "formatter", formatter)
+
+    tables = ResponseTables()
+    assert tables.attenuation_coefficient(table, 662) == pytest.approx(0.009380)
+    assert tables.attenuation(table) is tables.attenuation(table)
+    tables.attenuation_coefficient(table, 662)
+    assert formatter.reads == 1
@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+from src.api.models import SamplerType
+from src.tools.result_cache import ResultCache
+
+
+@pytest.fixture
+def cache(tmp_path) -> ResultCache:
+    return ResultCache(cache_dir=str(tmp_path / "cache"), max_bytes=250)
+
+
+def test_key_ignores_parameter_order_and_enum_types():
+    assert ResultCache.key("simulate", {"a": 1, "b": 2}) == ResultCache.key("simulate", {"b": 2, "a": 1})
+    assert ResultCache.key("simulate", {"sampler": SamplerType.NUTS}) == ResultCache.key("simulate", {"sampler": "nuts"})
+
+
+def test_key_depends_on_namespace_parameters_and_dataset_content(tmp_path):
+    assert ResultCache.key("generate", {"a": 1}) != ResultCache.key("simulate", {"a": 1})
+    assert ResultCache.key("simulate", {"a": 1}) != ResultCache.key("simulate", {"a": 2})
+
+    dataset = tmp_path / "data.csv"
+    dataset.write_text("x,y\n1,2\n")
+    first = ResultCache.key("simulate", {"a": 1}, dataset=str(dataset))
+    assert first != ResultCache.key("simulate", {"a": 1})
+    assert first == ResultCache.key("simulate", {"a": 1}, dataset=str(dataset))
+    dataset.write_text("x,y\n1,3\n")
+    assert first != ResultCache.key("simulate", {"a": 1}, dataset=str(dataset))
+
+
+def test_put_and_get_in_memory_and_file_artifacts(cache, tmp_path):
+    source = tmp_path / "figure.png"
+    source.write_bytes(b"png")
+    stored = cache.put("k", {"data": ("data.csv", b"x,y\n"), "figure": str(source)})
+
+    assert cache.get("missing") is None
+    assert cache.get("k") == stored
+    with open(stored["data"], "rb") as f:
+        assert f.read() == b"x,y\n"
+    assert os.path.basename(stored["figure"]) == "figure.png"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entries_are_evicted(cache):
+    for key in ("a", "b"):
+        cache.put(key, {"data": ("data.bin", bytes(100))})
+    cache.get("a")  # "b" is now the least recently used entry
+    cache.put("c", {"data": ("data.bin", bytes(100))})
+
+    assert cache.size <= cache.max_bytes
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert not os.path.exists(os.path.join(cache.cache_dir, "b"))
+
+
+def test_an_entry_larger_than_the_cache_is_kept_alone(cache):
+    cache.put("a", {"data": ("data.bin", bytes(100))})
+    cache.put("big", {"data": ("data.bin", bytes(1000))})
+    assert list(cache.entries) == ["big"]
+
+
+def test_a_pinned_entry_outlives_eviction_until_released(cache):
+    cache.put("a", {"data": ("data.bin", bytes(100))})
+    served = cache.get("a", pin=True)
+    cache.put("b", {"data": ("data.bin", bytes(100))})
+    cache.put("c", {"data": ("data.bin", bytes(200))})
+
+    assert os.path.exists(served["data"])
+    assert "b" not in cache.entries
+    cache.release("a")
+    assert not os.path.exists(served["data"])
+    assert cache.size <= cache.max_bytes
+
+
+def test_index_is_reloaded_from_disk(cache):
+    cache.put("a", {"data": ("data.bin", bytes(10))})
+    reloaded = ResultCache(cache_dir=cache.cache_dir, max_bytes=cache.max_bytes)
+    assert reloaded.get("a") is not None
+    assert reloaded.size == 10
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from src.analytics.chain_store import ChainStore
+from src.analytics.distributions import posterior_log, posterior_log_batch
+from src.analytics.samplers import EnsembleSampler, MetropolisSampler, NutsSampler, initial_params
+from tests.conftest import SOURCE
+
+
+def assert_recovers_source(draws: np.ndarray) -> None:
+    """
+    Posterior means close to the simulated source; the side of the road is not identifiable, so |y| is compared.
+    """
+    x, distance, activity, background = draws[:, 0], np.abs(draws[:, 1]), draws[:, 2], draws[:, 3]
+    assert abs(x.mean() - SOURCE[0]) < 10
+    assert abs(distance.mean() - SOURCE[1]) < 15
+    assert SOURCE[2] / 1.5 < activity.mean() < SOURCE[2] * 1.5
+    assert abs(background.mean() - SOURCE[3]) < 2
+
+
+def test_nuts_recovers_a_known_source(track):
+    sampler = NutsSampler(track, init_params=initial_params(track), seed=1, tune=300)
+    draws = sampler.run(1300)[300:]
+    assert_recovers_source(draws)
+    assert sampler.health["divergences"] < 30
+    assert sampler.acceptance_rate > 0.5
+
+
+def test_metropolis_recovers_a_known_source(track):
+    sampler = MetropolisSampler(track, init_params=initial_params(track), seed=3)
+    draws = sampler.run(20_000)[5000:]
+    assert_recovers_source(draws)
+
+
+@pytest.mark.parametrize("sampler_class, kwargs", [(MetropolisSampler, {}), (EnsembleSampler, {}), (NutsSampler, {"tune": 500})])
+def test_run_fills_the_store_and_calls_back(track, sampler_class, kwargs):
+    sampler = sampler_class(track, init_params=SOURCE, seed=4, **kwargs)
+    calls = []
+    store = ChainStore(2500, burn_in=500, thin=2, shape=sampler.state_shape)
+    assert sampler.run(2500, callback=lambda s, done: calls.append(done), store=store) is store
+    assert calls == [1000, 2000]
+    assert len(store) == 1000
+    assert sampler.iteration == 2500 and sampler.seconds > 0
+
+
+def test_fixed_seed_reproduces_the_chain(track):
+    first = MetropolisSampler(track, init_params=SOURCE, seed=5).run(500)
+    second = MetropolisSampler(track, init_params=SOURCE, seed=5).run(500)
+    np.testing.assert_array_equal(first, second)
+
+
+def test_run_continues_the_chain_with_its_cached_state(track):
+    whole = MetropolisSampler(track, init_params=SOURCE, seed=6, block_size=64).run(500)
+    sampler = MetropolisSampler(track, init_params=SOURCE, seed=6, block_size=64)
+    parts = np.concatenate([sampler.run(300), sampler.run(200)])
+    np.testing.assert_array_equal(parts, whole)
+    assert sampler.log_posterior == posterior_log(track, sampler.state)
+
+
+def test_ensemble_recovers_a_known_source(track):
+    sampler = EnsembleSampler(track, init_params=initial_params(track), walkers=16, seed=2, tune=500)
+    positions = sampler.run(1500)
+    assert positions.shape == (1500, 16, 4)
+    assert_recovers_source(positions[500:].reshape(-1, 4))
+
+
+def test_ensemble_step_matches_the_batch_posterior(track):
+    sampler = EnsembleSampler(track, init_params=SOURCE, seed=7)
+    sampler.run(50)
+    np.testing.assert_allclose(sampler.log_posterior, posterior_log_batch(track, sampler.state), rtol=1e-12)
@@ -0,0 +1,36 @@
+import os
+
+import numpy as np
+import pytest
+
+from src.data_generators.sweep import ScenarioSweep
+
+
+@pytest.fixture
+def sweep() -> ScenarioSweep:
+    # a tiny memory budget forces one scenario per chunk
+    return ScenarioSweep(
+        activity=[10, 100], src_x=[0, 50], src_y=[60], speed=[10.0, 14.0], time=[1.0], efficiency=[0.02],
+        num_points=40, include_angles=True, max_memory_mb=0.001,
+    )
+
+
+def test_npz_written_in_chunks_matches_the_full_broadcast(sweep, tmp_path):
+    assert sweep.chunk_size < len(sweep)
+    x, counts = sweep._evaluate_chunk(sweep.scenarios)
+    with np.load(sweep.save(str(tmp_path), "npz")) as data:
+        np.testing.assert_array_equal(data["x"], x.astype(np.float32))
+        np.testing.assert_array_equal(data["count_rate"], counts.astype(np.float32))
+        np.testing.assert_array_equal(data["activity"], sweep.scenarios["activity"].to_numpy())
+
+
+def test_every_save_gets_its_own_file(sweep, tmp_path):
+    first, second = sweep.save(str(tmp_path), "npz"), sweep.save(str(tmp_path), "npz")
+    assert first != second
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(f) for f in (first, second))
+
+
+def test_parquet_has_one_row_per_scenario_point(sweep, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    table = pq.read_table(sweep.save(str(tmp_path), "parquet"))
+    assert table.num_rows == len(sweep) * sweep.num_points